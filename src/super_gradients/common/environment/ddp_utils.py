@@ -1,6 +1,10 @@
 import os
 import socket
+import time
+from contextlib import suppress
 from functools import wraps
+from pathlib import Path
+from typing import Callable, Union
 
 from super_gradients.common.environment.device_utils import device_config
 from super_gradients.common.environment.omegaconf_utils import register_hydra_resolvers
@@ -76,3 +80,64 @@ def find_free_port() -> int:
         sock.bind(("", 0))
         _ip, port = sock.getsockname()
     return port
+
+
+def build_file_once(file_path: Union[str, Path], build_fn: Callable[[Path], None], poll_interval: float = 1.0) -> None:
+    """Build a file exactly once, even when many processes (e.g. DDP ranks) ask for it at the same time.
+
+    The first process to acquire a lock file builds the file, while the other ones wait until it exists.
+    The file is built under a temporary name and then renamed, so a partially written file is never visible.
+    The lock does not rely on torch.distributed, so it can be used before the process group is initialized,
+    and it is released if its owner crashed (when both processes run on the same host).
+
+    :param file_path:       Path of the file to build
+    :param build_fn:        Function writing the file at the (temporary) path that it receives
+    :param poll_interval:   Time to wait between two checks, in seconds
+    """
+    file_path = Path(file_path)
+    lock_path = file_path.with_name(f"{file_path.name}.lock")
+    lock_owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    while not file_path.exists():
+        try:
+            lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _is_lock_stale(lock_path):
+                with suppress(FileNotFoundError):
+                    lock_path.unlink()
+            else:
+                time.sleep(poll_interval)
+            continue
+
+        try:
+            os.write(lock_fd, lock_owner.encode("utf-8"))
+            os.close(lock_fd)
+            if not file_path.exists():
+                tmp_file_path = file_path.with_name(f"{file_path.name}.tmp{os.getpid()}")
+                try:
+                    build_fn(tmp_file_path)
+                    os.replace(tmp_file_path, file_path)
+                finally:
+                    with suppress(FileNotFoundError):
+                        tmp_file_path.unlink()
+        finally:
+            with suppress(FileNotFoundError):
+                lock_path.unlink()
+
+
+def _is_lock_stale(lock_path: Path) -> bool:
+    """Check if a lock file was left by a process that does not exist anymore on this host."""
+    try:
+        hostname, pid = lock_path.read_text().rsplit(":", 1)
+        pid = int(pid)
+    except (OSError, ValueError):  # The lock was just released, or its owner did not write it yet
+        return False
+    if hostname != socket.gethostname():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
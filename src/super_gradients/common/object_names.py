@@ -46,6 +46,7 @@ class Transforms:
     SegColorJitter = "SegColorJitter"
     DetectionMosaic = "DetectionMosaic"
     DetectionRandomAffine = "DetectionRandomAffine"
+    DetectionMosaicAffine = "DetectionMosaicAffine"
     DetectionMixup = "DetectionMixup"
     DetectionHSV = "DetectionHSV"
     DetectionRGB2BGR = "DetectionRGB2BGR"
@@ -54,6 +55,11 @@ class Transforms:
     DetectionRescale = "DetectionRescale"
     DetectionPaddedRescale = "DetectionPaddedRescale"
     DetectionTargetsFormatTransform = "DetectionTargetsFormatTransform"
+    DetectionBatchRandomAffine = "DetectionBatchRandomAffine"
+    DetectionBatchMixup = "DetectionBatchMixup"
+    DetectionBatchHSV = "DetectionBatchHSV"
+    DetectionBatchHorizontalFlip = "DetectionBatchHorizontalFlip"
+    SegmentationBatchNormalize = "SegmentationBatchNormalize"
     RandomResizedCropAndInterpolation = "RandomResizedCropAndInterpolation"
     RandAugmentTransform = "RandAugmentTransform"
     Lighting = "Lighting"
@@ -128,6 +134,7 @@ class Callbacks:
     MODEL_CONVERSION_CHECK = "ModelConversionCheckCallback"
     EARLY_STOP = "EarlyStop"
     DETECTION_MULTISCALE_PREPREDICTION = "DetectionMultiscalePrePredictionCallback"
+    MIXUP_PREPREDICTION = "MixupPrePredictionCallback"
     YOLOX_TRAINING_STAGE_SWITCH = "YoloXTrainingStageSwitchCallback"
 
 
@@ -9,11 +9,14 @@ Papers:
     RandAugment: Practical automated data augmentation... - https://arxiv.org/abs/1909.13719
 
 """
+import math
 import random
 import re
-from typing import List
+from typing import List, Optional
 from PIL import Image, ImageOps, ImageEnhance
 import numpy as np
+import torch
+import torch.nn.functional as F
 
 
 _FILL = (128, 128, 128)
@@ -378,6 +381,7 @@ def rand_augment_ops(magnitude=10, hparams=None, transforms=None):
 class RandAugment:
     """
     Random auto augment class, will select auto augment transforms according to probability weights for each op
+    See TensorRandAugment for the same augmentation applied to batches of tensors.
     """
     def __init__(self, ops, num_layers=2, choice_weights=None):
         self.ops = ops
@@ -393,7 +397,7 @@ class RandAugment:
         return img
 
 
-def rand_augment_transform(config_str, crop_size: int, img_mean: List[float]):
+def rand_augment_transform(config_str, crop_size: int, img_mean: List[float], img_std: Optional[List[float]] = None):
     """
     Create a RandAugment transform
 
@@ -405,11 +409,17 @@ def rand_augment_transform(config_str, crop_size: int, img_mean: List[float]):
         'w' - integer probabiliy weight index (index of a set of weights to influence choice of op)
         'mstd' -  float std deviation of magnitude noise applied
         'inc' - integer (bool), use augmentations that increase in severity with magnitude (default: 0)
+        'tensor' - integer (bool), use the tensor backend (default: 0), i.e. return a TensorRandAugment applying the
+            augmentations to whole batches on their device, to be used as a batch transform (training_params.batch_transforms)
+            instead of a dataset transform
     Ex 'rand-m9-n3-mstd0.5' results in RandAugment with magnitude 9, num_layers 3, magnitude_std 0.5
     'rand-mstd1-w0' results in magnitude_std 1.0, weights 0, default magnitude of 10 and num_layers 2
+    'rand-m7-mstd0.5-tensor1' results in TensorRandAugment with magnitude 7, magnitude_std 0.5 and num_layers 2
 
     :param crop_size: The size of crop image
     :param img_mean:  Average per channel
+    :param img_std:   Standard deviation per channel, only used by the tensor backend: when set, the batches are expected to
+                      be normalized with img_mean and img_std (i.e. after Normalize), otherwise to be in [0, 255]
 
     :return: A PyTorch compatible Transform
     """
@@ -420,6 +430,7 @@ def rand_augment_transform(config_str, crop_size: int, img_mean: List[float]):
     num_layers = 2  # default to 2 ops per image
     weight_idx = None  # default to no probability weights for op choice
     transforms = _RAND_TRANSFORMS
+    use_tensor_backend = False
     config = config_str.split('-')
     for c in config:
         cs = re.split(r'(\d.*)', c)
@@ -438,8 +449,307 @@ def rand_augment_transform(config_str, crop_size: int, img_mean: List[float]):
             num_layers = int(val)
         elif key == 'w':
             weight_idx = int(val)
+        elif key == 'tensor':
+            use_tensor_backend = bool(int(val))
         else:
             assert False, 'Unknown RandAugment config section'
-    ra_ops = rand_augment_ops(magnitude=magnitude, hparams=hparams, transforms=transforms)
     choice_weights = None if weight_idx is None else _select_rand_weights(weight_idx)
+    if use_tensor_backend:
+        ra_ops = [TensorAugmentOp(name, prob=0.5, magnitude=magnitude, hparams=hparams) for name in transforms]
+        return TensorRandAugment(ra_ops, num_layers, choice_weights=choice_weights, img_mean=img_mean, img_std=img_std)
+    ra_ops = rand_augment_ops(magnitude=magnitude, hparams=hparams, transforms=transforms)
     return RandAugment(ra_ops, num_layers, choice_weights=choice_weights)
+
+
+# TENSOR BACKEND: THE SAME OPS APPLIED TO BATCHES OF FLOAT IMAGES OF SHAPE [N, 3, H, W] IN [0, 255], WITH ONE VALUE OF THE
+# ARGUMENTS PER IMAGE (TENSORS OF SHAPE [N])
+
+def _per_image(values: torch.Tensor) -> torch.Tensor:
+    return values.view(-1, 1, 1, 1)
+
+
+def _grayscale(images: torch.Tensor) -> torch.Tensor:
+    # ITU-R 601-2 luma transform, like PIL's convert('L')
+    return (0.299 * images[:, 0:1] + 0.587 * images[:, 1:2] + 0.114 * images[:, 2:3]).round()
+
+
+def _blend(degenerate: torch.Tensor, images: torch.Tensor, factor: torch.Tensor) -> torch.Tensor:
+    # like PIL's Image.blend, used by the ImageEnhance classes
+    return (degenerate + _per_image(factor) * (images - degenerate)).clamp(0, 255)
+
+
+def _affine_tensor(images: torch.Tensor, matrices: torch.Tensor, fill: torch.Tensor) -> torch.Tensor:
+    """
+    Batch equivalent of PIL's img.transform(img.size, Image.AFFINE, data) with bilinear interpolation
+    :param matrices:    Affine matrices of shape [N, 2, 3], mapping the output coordinates to the input coordinates (like data)
+    :param fill:        Value of every channel outside of the images
+    """
+    height, width = images.shape[-2:]
+    # PIL COORDINATES HAVE THEIR ORIGIN AT THE CORNER OF THE IMAGE LIKE THE NORMALIZED COORDINATES OF grid_sample WITH align_corners=False
+    to_normalized = torch.tensor([[2 / width, 0, -1], [0, 2 / height, -1], [0, 0, 1]], dtype=matrices.dtype, device=matrices.device)
+    full_matrices = torch.cat([matrices, torch.tensor([[[0, 0, 1]]], dtype=matrices.dtype, device=matrices.device).expand(len(matrices), 1, 3)], dim=1)
+    theta = (to_normalized @ full_matrices @ torch.linalg.inv(to_normalized))[:, :2]
+    grid = F.affine_grid(theta.to(images.dtype), list(images.shape), align_corners=False)
+    fill = fill.view(1, -1, 1, 1)
+    return F.grid_sample(images - fill, grid, mode='bilinear', padding_mode='zeros', align_corners=False) + fill
+
+
+def _affine_from_coefficients(a, b, c, d, e, f) -> torch.Tensor:
+    return torch.stack([torch.stack([a, b, c], dim=-1), torch.stack([d, e, f], dim=-1)], dim=1)
+
+
+def shear_x_tensor(images, factor, fill):
+    zeros, ones = torch.zeros_like(factor), torch.ones_like(factor)
+    return _affine_tensor(images, _affine_from_coefficients(ones, factor, zeros, zeros, ones, zeros), fill)
+
+
+def shear_y_tensor(images, factor, fill):
+    zeros, ones = torch.zeros_like(factor), torch.ones_like(factor)
+    return _affine_tensor(images, _affine_from_coefficients(ones, zeros, zeros, factor, ones, zeros), fill)
+
+
+def translate_x_rel_tensor(images, pct, fill):
+    return translate_x_abs_tensor(images, pct * images.shape[-1], fill)
+
+
+def translate_y_rel_tensor(images, pct, fill):
+    return translate_y_abs_tensor(images, pct * images.shape[-2], fill)
+
+
+def translate_x_abs_tensor(images, pixels, fill):
+    zeros, ones = torch.zeros_like(pixels), torch.ones_like(pixels)
+    return _affine_tensor(images, _affine_from_coefficients(ones, zeros, pixels, zeros, ones, zeros), fill)
+
+
+def translate_y_abs_tensor(images, pixels, fill):
+    zeros, ones = torch.zeros_like(pixels), torch.ones_like(pixels)
+    return _affine_tensor(images, _affine_from_coefficients(ones, zeros, zeros, zeros, ones, pixels), fill)
+
+
+def rotate_tensor(images, degrees, fill):
+    # COUNTER-CLOCKWISE ROTATION AROUND THE CENTER OF THE IMAGE, LIKE PIL'S img.rotate
+    height, width = images.shape[-2:]
+    angle = degrees * (math.pi / 180)
+    cos, sin = torch.cos(angle), torch.sin(angle)
+    center_x, center_y = width / 2, height / 2
+    matrices = _affine_from_coefficients(cos, -sin, center_x - cos * center_x + sin * center_y,
+                                         sin, cos, center_y - sin * center_x - cos * center_y)
+    return _affine_tensor(images, matrices, fill)
+
+
+def auto_contrast_tensor(images, **__):
+    low, high = images.amin(dim=(2, 3), keepdim=True), images.amax(dim=(2, 3), keepdim=True)
+    scale = 255 / (high - low).clamp(min=1)
+    return torch.where(high > low, ((images - low) * scale).floor().clamp(0, 255), images)
+
+
+def invert_tensor(images, **__):
+    return 255 - images
+
+
+def equalize_tensor(images, **__):
+    n_images, n_channels = images.shape[:2]
+    values = images.round().long().flatten(2)
+    # HISTOGRAM OF EVERY CHANNEL OF EVERY IMAGE
+    offsets = 256 * torch.arange(n_images * n_channels, device=images.device).view(n_images, n_channels, 1)
+    histograms = torch.bincount((values + offsets).flatten(), minlength=n_images * n_channels * 256).view(n_images, n_channels, 256)
+    # SAME LOOKUP TABLES AS PIL'S ImageOps.equalize
+    last_counts = histograms.gather(2, values.amax(dim=2, keepdim=True))
+    steps = (values.shape[2] - last_counts) // 255
+    cumulative = torch.cumsum(histograms, dim=2) - histograms
+    luts = torch.where(steps > 0, (steps // 2 + cumulative) // steps.clamp(min=1), torch.arange(256, device=images.device))
+    return luts.gather(2, values).view_as(images).to(images.dtype)
+
+
+def solarize_tensor(images, thresh, **__):
+    return torch.where(images >= _per_image(thresh), 255 - images, images)
+
+
+def solarize_add_tensor(images, add, thresh=128, **__):
+    return torch.where(images < thresh, (images + _per_image(add)).clamp(max=255), images)
+
+
+def posterize_tensor(images, bits_to_keep, **__):
+    step = _per_image(2 ** (8 - bits_to_keep.clamp(max=8)))
+    return (images.round() / step).floor() * step
+
+
+def contrast_tensor(images, factor, **__):
+    mean = (_grayscale(images).mean(dim=(1, 2, 3), keepdim=True) + 0.5).floor()
+    return _blend(mean, images, factor)
+
+
+def color_tensor(images, factor, **__):
+    return _blend(_grayscale(images), images, factor)
+
+
+def brightness_tensor(images, factor, **__):
+    return _blend(torch.zeros_like(images), images, factor)
+
+
+def sharpness_tensor(images, factor, **__):
+    # DEGENERATE IMAGE: PIL'S SMOOTH FILTER, THAT KEEPS THE BORDERS OF THE IMAGE
+    kernel = torch.tensor([[1., 1., 1.], [1., 5., 1.], [1., 1., 1.]], dtype=images.dtype, device=images.device) / 13
+    n_channels = images.shape[1]
+    degenerate = images.clone()
+    degenerate[:, :, 1:-1, 1:-1] = F.conv2d(images, kernel.expand(n_channels, 1, 3, 3), groups=n_channels).round()
+    return _blend(degenerate, images, factor)
+
+
+def _randomly_negate_tensor(values: torch.Tensor) -> torch.Tensor:
+    """With 50% prob, negate every value"""
+    return torch.where(torch.rand_like(values) > 0.5, -values, values)
+
+
+# SAME ARGUMENTS AS LEVEL_TO_ARG, FOR A TENSOR OF MAGNITUDES
+TENSOR_LEVEL_TO_ARG = {
+    'AutoContrast': None,
+    'Equalize': None,
+    'Invert': None,
+    'Rotate': lambda level, _hparams: (_randomly_negate_tensor(level / _MAX_MAGNITUDE * 30.),),
+    'Posterize': lambda level, _hparams: ((level / _MAX_MAGNITUDE * 4).floor(),),
+    'PosterizeIncreasing': lambda level, _hparams: (4 - (level / _MAX_MAGNITUDE * 4).floor(),),
+    'PosterizeOriginal': lambda level, _hparams: ((level / _MAX_MAGNITUDE * 4).floor() + 4,),
+    'Solarize': lambda level, _hparams: ((level / _MAX_MAGNITUDE * 256).floor(),),
+    'SolarizeIncreasing': lambda level, _hparams: (256 - (level / _MAX_MAGNITUDE * 256).floor(),),
+    'SolarizeAdd': lambda level, _hparams: ((level / _MAX_MAGNITUDE * 110).floor(),),
+    'Color': lambda level, _hparams: (level / _MAX_MAGNITUDE * 1.8 + 0.1,),
+    'ColorIncreasing': lambda level, _hparams: (1.0 + _randomly_negate_tensor(level / _MAX_MAGNITUDE * .9),),
+    'Contrast': lambda level, _hparams: (level / _MAX_MAGNITUDE * 1.8 + 0.1,),
+    'ContrastIncreasing': lambda level, _hparams: (1.0 + _randomly_negate_tensor(level / _MAX_MAGNITUDE * .9),),
+    'Brightness': lambda level, _hparams: (level / _MAX_MAGNITUDE * 1.8 + 0.1,),
+    'BrightnessIncreasing': lambda level, _hparams: (1.0 + _randomly_negate_tensor(level / _MAX_MAGNITUDE * .9),),
+    'Sharpness': lambda level, _hparams: (level / _MAX_MAGNITUDE * 1.8 + 0.1,),
+    'SharpnessIncreasing': lambda level, _hparams: (1.0 + _randomly_negate_tensor(level / _MAX_MAGNITUDE * .9),),
+    'ShearX': lambda level, _hparams: (_randomly_negate_tensor(level / _MAX_MAGNITUDE * 0.3),),
+    'ShearY': lambda level, _hparams: (_randomly_negate_tensor(level / _MAX_MAGNITUDE * 0.3),),
+    'TranslateX': lambda level, hparams: (_randomly_negate_tensor(level / _MAX_MAGNITUDE * float(hparams['translate_const'])),),
+    'TranslateY': lambda level, hparams: (_randomly_negate_tensor(level / _MAX_MAGNITUDE * float(hparams['translate_const'])),),
+    'TranslateXRel': lambda level, hparams: (_randomly_negate_tensor(level / _MAX_MAGNITUDE * hparams.get('translate_pct', 0.45)),),
+    'TranslateYRel': lambda level, hparams: (_randomly_negate_tensor(level / _MAX_MAGNITUDE * hparams.get('translate_pct', 0.45)),),
+}
+
+
+TENSOR_NAME_TO_OP = {
+    'AutoContrast': auto_contrast_tensor,
+    'Equalize': equalize_tensor,
+    'Invert': invert_tensor,
+    'Rotate': rotate_tensor,
+    'Posterize': posterize_tensor,
+    'PosterizeIncreasing': posterize_tensor,
+    'PosterizeOriginal': posterize_tensor,
+    'Solarize': solarize_tensor,
+    'SolarizeIncreasing': solarize_tensor,
+    'SolarizeAdd': solarize_add_tensor,
+    'Color': color_tensor,
+    'ColorIncreasing': color_tensor,
+    'Contrast': contrast_tensor,
+    'ContrastIncreasing': contrast_tensor,
+    'Brightness': brightness_tensor,
+    'BrightnessIncreasing': brightness_tensor,
+    'Sharpness': sharpness_tensor,
+    'SharpnessIncreasing': sharpness_tensor,
+    'ShearX': shear_x_tensor,
+    'ShearY': shear_y_tensor,
+    'TranslateX': translate_x_abs_tensor,
+    'TranslateY': translate_y_abs_tensor,
+    'TranslateXRel': translate_x_rel_tensor,
+    'TranslateYRel': translate_y_rel_tensor,
+}
+
+
+class TensorAugmentOp:
+    """
+    single auto augment operation applied to a batch of images, with a random magnitude (and sign) for every image
+    """
+    def __init__(self, name, prob=0.5, magnitude=10, hparams=None):
+        hparams = hparams or _HPARAMS_DEFAULT
+        self.name = name
+        self.aug_fn = TENSOR_NAME_TO_OP[name]
+        self.level_fn = TENSOR_LEVEL_TO_ARG[name]
+        self.prob = prob
+        self.magnitude = magnitude
+        self.hparams = hparams.copy()
+        self.fill = hparams['img_mean'] if 'img_mean' in hparams else _FILL
+
+        # If magnitude_std is > 0, introduce some randomness
+        self.magnitude_std = self.hparams.get('magnitude_std', 0)
+
+    def __call__(self, images: torch.Tensor) -> torch.Tensor:
+        """
+        :param images:  Float images of shape [N, 3, H, W] in [0, 255]
+        :return:        Images, augmented with probability prob
+        """
+        # THE RANDOM PARAMETERS ARE DRAWN ON CPU AND MOVED TO THE DEVICE, WHICH DOES NOT WAIT FOR THE DEVICE
+        indexes = torch.nonzero(torch.rand(len(images)) <= self.prob).squeeze(1) if self.prob < 1.0 else torch.arange(len(images))
+        if len(indexes) == 0:
+            return images
+        magnitude = torch.full((len(indexes),), float(self.magnitude), dtype=torch.float64)
+        if self.magnitude_std == float('inf'):
+            magnitude = torch.rand(len(indexes), dtype=torch.float64) * self.magnitude
+        elif self.magnitude_std > 0:
+            magnitude = magnitude + torch.randn(len(indexes), dtype=torch.float64) * self.magnitude_std
+        magnitude = magnitude.clamp(0, _MAX_MAGNITUDE)  # clip to valid range
+        level_args = self.level_fn(magnitude, self.hparams) if self.level_fn is not None else tuple()
+        level_args = [arg.to(device=images.device, dtype=images.dtype) for arg in level_args]
+
+        fill = torch.tensor(self.fill, dtype=images.dtype, device=images.device)
+        indexes = indexes.to(images.device)
+        images[indexes] = self.aug_fn(images[indexes], *level_args, fill=fill)
+        return images
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(name={self.name}, prob={self.prob}, magnitude={self.magnitude})'
+
+
+class TensorRandAugment:
+    """
+    Tensor backend of RandAugment, applied to whole batches on their device (CPU or GPU) as a batch transform
+     (see training_params.batch_transforms): every image of the batch gets its own ops and magnitudes.
+    """
+    def __init__(self, ops: List[TensorAugmentOp], num_layers=2, choice_weights=None, img_mean: Optional[List[float]] = None,
+                 img_std: Optional[List[float]] = None):
+        """
+        :param ops:             Ops to choose from
+        :param num_layers:      Number of ops applied to every image
+        :param choice_weights:  Probability of every op, or None to choose them uniformly (with replacement)
+        :param img_mean:        Average per channel, used with img_std
+        :param img_std:         Standard deviation per channel. When set, the images are expected to be normalized with
+                                img_mean and img_std, otherwise to be in [0, 255] (uint8 or float)
+        """
+        self.ops = ops
+        self.num_layers = num_layers
+        self.choice_weights = choice_weights
+        self.img_mean = img_mean
+        self.img_std = img_std
+
+    def __call__(self, images: torch.Tensor, targets=None):
+        """
+        :param images:  Images of shape [B, 3, H, W]
+        :param targets: Targets, returned as they are
+        :return:        Augmented images (with the type and the normalization of the input images), targets
+        """
+        pixels = images.to(dtype=torch.float32, copy=True)
+        if self.img_std is not None:
+            mean = torch.tensor(self.img_mean, dtype=pixels.dtype, device=pixels.device).view(1, -1, 1, 1) * 255
+            std = torch.tensor(self.img_std, dtype=pixels.dtype, device=pixels.device).view(1, -1, 1, 1) * 255
+            pixels = (pixels * std + mean).clamp(0, 255)
+
+        # OPS OF EVERY IMAGE, DRAWN ON CPU (no replacement when using weighted choice)
+        weights = torch.ones(len(self.ops)) if self.choice_weights is None else torch.as_tensor(self.choice_weights, dtype=torch.float64)
+        ops_indexes = torch.multinomial(weights.expand(len(pixels), -1), self.num_layers, replacement=self.choice_weights is None)
+        for layer in range(self.num_layers):
+            for op_index, op in enumerate(self.ops):
+                indexes = torch.nonzero(ops_indexes[:, layer] == op_index).squeeze(1)
+                if len(indexes) > 0:
+                    indexes = indexes.to(pixels.device)
+                    pixels[indexes] = op(pixels[indexes])
+
+        if self.img_std is not None:
+            return ((pixels - mean) / std).to(images.dtype), targets
+        if not images.is_floating_point():
+            pixels = pixels.round()
+        return pixels.to(images.dtype), targets
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(ops={self.ops}, num_layers={self.num_layers}, choice_weights={self.choice_weights})'
@@ -1,10 +1,12 @@
 import copy
+import multiprocessing
 import os
 import random
 import uuid
 from abc import ABC, abstractmethod
 from multiprocessing import Value, Lock
-from typing import List
+from multiprocessing.pool import ThreadPool
+from typing import List, Callable, Iterator, Any
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -25,6 +27,40 @@ from super_gradients.training.utils.detection_utils import DetectionVisualizatio
 from super_gradients.training.utils.distributed_training_utils import get_local_rank, get_world_size
 from super_gradients.training.utils.utils import AverageMeter
 
+# Function shared with a pool of forked processes (see imap_in_workers)
+_FN_FOR_WORKERS = None
+
+
+def _call_fn_in_worker(index: int) -> Any:
+    return _FN_FOR_WORKERS(index)
+
+
+def imap_in_workers(fn: Callable[[int], Any], n_items: int, num_workers: int) -> Iterator[Any]:
+    """Call a function on every index in range(n_items) with a pool of workers, and iterate over the results in order.
+    Processes are used when the platform supports fork (the workers then inherit the function and everything it refers to,
+    such as a dataset, so it does not need to be pickled), threads otherwise.
+
+    :param fn:          Function taking a single index as argument. Its outputs are sent back to the main process, so they should be small.
+    :param n_items:     Number of indexes to call the function on
+    :param num_workers: Number of workers
+    :return:            Iterator over the outputs of the function
+    """
+    global _FN_FOR_WORKERS
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        _FN_FOR_WORKERS = fn
+        pool, pool_fn = multiprocessing.get_context("fork").Pool(num_workers), _call_fn_in_worker
+    else:
+        pool, pool_fn = ThreadPool(num_workers), fn
+
+    try:
+        chunksize = max(1, min(256, n_items // (4 * num_workers)))
+        # imap preserves the order of the indexes, so the outputs are deterministic
+        yield from pool.imap(pool_fn, range(n_items), chunksize=chunksize)
+    finally:
+        pool.terminate()
+        _FN_FOR_WORKERS = None
+
 
 def get_mean_and_std_torch(data_dir=None, dataloader=None, num_workers=4, RandomResizeSize=224):
     """
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import pickle
+import shutil
+from collections.abc import Sequence
+from numbers import Number
+from pathlib import Path
+from typing import List, Dict, Union, Any, Iterable, Iterator
+
+import numpy as np
+
+from super_gradients.common.abstractions.abstract_logger import get_logger
+
+logger = get_logger(__name__)
+
+ANNOTATIONS_CACHE_VERSION = 2
+OFFSETS_SUFFIX = ".offsets.npy"
+METADATA_FILE = "metadata.pkl"
+
+
+def hash_annotations_cache_key(key_items: Iterable[Any], source_files: Iterable[str]) -> str:
+    """Hash the parameters and the content of the files that define the annotations of a dataset.
+
+    :param key_items:       Parameters that have an impact on the annotations (class_inclusion_list, input_dim, ...)
+    :param source_files:    Files from which the annotations are parsed (annotation json, label files, ...)
+    :return:                Hexadecimal hash
+    """
+    cache_hash = hashlib.sha256()
+    cache_hash.update(str(ANNOTATIONS_CACHE_VERSION).encode("utf-8"))
+    for item in key_items:
+        cache_hash.update(str(item).encode("utf-8"))
+    for source_file in source_files:
+        cache_hash.update(str(source_file).encode("utf-8"))
+        with open(source_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                cache_hash.update(chunk)
+    return cache_hash.hexdigest()
+
+
+class ColumnarAnnotations(Sequence):
+    """Compact, array-backed storage of the annotations of a dataset.
+
+    Instead of a list of dicts holding many small objects, every field is stored in a single column:
+        - "ragged":  Arrays with the same trailing shape (target, crowd_target, ...) are concatenated, with the offsets of every annotation.
+        - "string":  Strings (img_path, ...) are packed into a single utf-8 buffer, with the offsets of every annotation.
+        - "fixed":   Tuples/lists of numbers of constant length (resized_img_shape, ...) are stacked into a 2D array.
+        - "scalar":  Numbers are stored in a 1D array.
+        - "object":  Any other field is kept as a list of python objects.
+
+    Reading the columns does not touch the refcount of per-annotation python objects, so the memory pages are not duplicated
+    by copy-on-write in forked dataloader workers, and the columns can be memory-mapped from disk (see save and load).
+
+    Indexing returns a dict with the same fields and types as the original annotation (and slicing a list of such dicts).
+    Arrays are views over the columns, so they should be copied before being modified.
+    """
+
+    def __init__(self, n_annotations: int, fields: List[str], columns: Dict[str, Dict[str, Any]]):
+        """
+        :param n_annotations:   Number of annotations
+        :param fields:          Name of the fields, in order
+        :param columns:         Mapping of every field to its column, a dict including the "kind" of the column and its data
+        """
+        self.n_annotations = n_annotations
+        self.fields = fields
+        self.columns = columns
+
+    @classmethod
+    def from_annotations(cls, annotations: List[Dict[str, Any]]) -> "ColumnarAnnotations":
+        """Build the columns from a list of annotations that all have the same fields.
+
+        :param annotations: List of annotations
+        :return:            ColumnarAnnotations
+        """
+        fields = list(annotations[0].keys()) if len(annotations) else []
+        columns = {field: _build_column([annotation[field] for annotation in annotations]) for field in fields}
+        return cls(n_annotations=len(annotations), fields=fields, columns=columns)
+
+    def __len__(self) -> int:
+        return self.n_annotations
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(self.n_annotations)[index]]
+        index = range(self.n_annotations)[index]  # Support negative indexes and raise IndexError when out of range
+        return {field: self.get_field(index, field) for field in self.fields}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.n_annotations):
+            yield self[index]
+
+    def get_field(self, index: int, field: str) -> Any:
+        """Get a single field of an annotation, without building the whole annotation.
+
+        :param index:   Index of the annotation
+        :param field:   Name of the field
+        :return:        Value of the field for this annotation
+        """
+        column = self.columns[field]
+        kind = column["kind"]
+        if kind == "ragged":
+            start, end = column["offsets"][index], column["offsets"][index + 1]
+            return column["values"][start:end]
+        elif kind == "string":
+            start, end = column["offsets"][index], column["offsets"][index + 1]
+            return column["values"][start:end].tobytes().decode("utf-8")
+        elif kind == "fixed":
+            return column["container"](column["values"][index].tolist())
+        elif kind == "scalar":
+            return column["values"][index].item()
+        else:
+            return column["values"][index]
+
+    def save(self, cache_path: Union[str, Path]) -> None:
+        """Save the columns in a directory, from which they can later be memory-mapped with ColumnarAnnotations.load.
+        The directory is first written under a temporary name and then renamed, so that a partially written cache is never loaded.
+
+        :param cache_path:  Path of the cache directory
+        """
+        cache_path = Path(cache_path)
+        tmp_cache_path = cache_path.with_name(f"{cache_path.name}.tmp{os.getpid()}")
+        tmp_cache_path.mkdir(parents=True, exist_ok=True)
+
+        metadata_columns = {}
+        for field, column in self.columns.items():
+            if column["kind"] == "object":
+                metadata_columns[field] = column
+                continue
+            np.save(str(tmp_cache_path / f"{field}.npy"), column["values"])
+            if "offsets" in column:
+                np.save(str(tmp_cache_path / f"{field}{OFFSETS_SUFFIX}"), column["offsets"])
+            metadata_columns[field] = {key: value for key, value in column.items() if key not in ("values", "offsets")}
+
+        with open(tmp_cache_path / METADATA_FILE, "wb") as f:
+            pickle.dump({"n_annotations": self.n_annotations, "fields": self.fields, "columns": metadata_columns}, f)
+
+        try:
+            tmp_cache_path.rename(cache_path)
+        except OSError:
+            # Another process already saved the same cache in the meantime
+            shutil.rmtree(tmp_cache_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, cache_path: Union[str, Path]) -> "ColumnarAnnotations":
+        """Load the columns saved with ColumnarAnnotations.save.
+        The columns are memory-mapped in read-only mode, so the pages are shared between all the processes that load the same cache
+        (e.g. DDP ranks and dataloader workers).
+
+        :param cache_path:  Path of the cache directory
+        :return:            ColumnarAnnotations
+        """
+        cache_path = Path(cache_path)
+        with open(cache_path / METADATA_FILE, "rb") as f:
+            metadata = pickle.load(f)
+
+        columns = metadata["columns"]
+        for field, column in columns.items():
+            if column["kind"] == "object":
+                continue
+            column["values"] = _load_memmap(cache_path / f"{field}.npy")
+            offsets_path = cache_path / f"{field}{OFFSETS_SUFFIX}"
+            if offsets_path.exists():
+                column["offsets"] = _load_memmap(offsets_path)
+        return cls(n_annotations=metadata["n_annotations"], fields=metadata["fields"], columns=columns)
+
+
+def _load_memmap(path: Path) -> np.ndarray:
+    """Load a .npy file memory-mapped in read-only mode, as a regular np.ndarray view."""
+    try:
+        return np.load(str(path), mmap_mode="r").view(np.ndarray)
+    except ValueError:  # Arrays without any element cannot be memory-mapped
+        return np.load(str(path))
+
+
+def _build_column(values: List[Any]) -> Dict[str, Any]:
+    """Build the most compact column that can represent all the values of a field.
+
+    :param values:  Value of the field for every annotation
+    :return:        Column, a dict including the "kind" of the column and its data
+    """
+    if len(values) == 0:
+        return {"kind": "object", "values": values}
+
+    if all(isinstance(value, np.ndarray) and value.ndim >= 1 and value.dtype != object for value in values):
+        if len(set(value.shape[1:] for value in values)) == 1:
+            offsets = np.cumsum([0] + [len(value) for value in values], dtype=np.int64)
+            return {"kind": "ragged", "values": np.concatenate(values, axis=0), "offsets": offsets}
+
+    if all(isinstance(value, str) for value in values):
+        encoded_values = [value.encode("utf-8") for value in values]
+        offsets = np.cumsum([0] + [len(value) for value in encoded_values], dtype=np.int64)
+        return {"kind": "string", "values": np.frombuffer(b"".join(encoded_values), dtype=np.uint8), "offsets": offsets}
+
+    if all(_is_number(value) for value in values):
+        return {"kind": "scalar", "values": np.array(values)}
+
+    container = type(values[0])
+    if container in (tuple, list) and all(type(value) is container and all(_is_number(v) for v in value) for value in values):
+        if len(set(len(value) for value in values)) == 1:
+            return {"kind": "fixed", "values": np.array(values), "container": container}
+
+    return {"kind": "object", "values": values}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (Number, np.number)) and not isinstance(value, (bool, np.bool_))
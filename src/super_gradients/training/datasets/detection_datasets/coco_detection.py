@@ -1,5 +1,6 @@
 import copy
 import os
+from typing import Optional
 
 import cv2
 import numpy as np
@@ -8,6 +9,7 @@ from pycocotools.coco import COCO
 from super_gradients.common.abstractions.abstract_logger import get_logger
 from super_gradients.training.datasets.datasets_conf import COCO_DETECTION_CLASSES_LIST
 from super_gradients.training.datasets.detection_datasets.detection_dataset import DetectionDataset
+from super_gradients.training.datasets.lazy_coco import LazyCOCO, get_field_values
 from super_gradients.training.exceptions.dataset_exceptions import DatasetValidationException, ParameterMismatchException
 from super_gradients.training.utils.detection_utils import DetectionTargetsFormat
 
@@ -50,6 +52,8 @@ class COCODetectionDataset(DetectionDataset):
         subdir: str = "images/train2017",
         tight_box_rotation: bool = False,
         with_crowd: bool = True,
+        lazy_coco: bool = False,
+        coco_sidecar_dir: Optional[str] = None,
         *args,
         **kwargs,
     ):
@@ -59,6 +63,10 @@ class COCODetectionDataset(DetectionDataset):
         :param tight_box_rotation:  bool, whether to use of segmentation maps convex hull as target_seg
                                     (check get_sample docs).
         :param with_crowd: Add the crowd groundtruths to __getitem__
+        :param lazy_coco:           If True, the json is loaded with LazyCOCO instead of pycocotools.COCO, which is faster and uses less memory
+                                    on large annotation files: only the fields and indexes used by the dataset are built.
+        :param coco_sidecar_dir:    If not None, the json parsed by LazyCOCO is saved in this directory, and memory-mapped by the next runs
+                                    (and the other DDP ranks) instead of being parsed again. Implies lazy_coco=True.
 
         kwargs:
             all_classes_list: all classes list, default is COCO_DETECTION_CLASSES_LIST.
@@ -67,6 +75,8 @@ class COCODetectionDataset(DetectionDataset):
         self.json_file = json_file
         self.tight_box_rotation = tight_box_rotation
         self.with_crowd = with_crowd
+        self.lazy_coco = lazy_coco or coco_sidecar_dir is not None
+        self.coco_sidecar_dir = coco_sidecar_dir
 
         target_fields = ["target", "crowd_target"] if self.with_crowd else ["target"]
         kwargs["target_fields"] = target_fields
@@ -97,13 +107,80 @@ class COCODetectionDataset(DetectionDataset):
         self.original_classes = list([category["name"] for category in self.coco.loadCats(self.class_ids)])
         self.classes = copy.deepcopy(self.original_classes)
         self.sample_id_to_coco_id = self.coco.getImgIds()
+        self._parse_coco_annotations()
         return len(self.sample_id_to_coco_id)
 
+    def _parse_coco_annotations(self) -> None:
+        """Parse all the annotations of the COCO json at once into numpy arrays, sorted by sample_id, so that _load_annotation only has to slice them.
+        The bboxes are clipped to their image, the empty ones are dropped, and the category ids are replaced by their index in self.class_ids.
+        The crowd and non-crowd annotations are stored separately, in XYXY_LABEL format, with the offsets of every sample_id:
+        the targets of sample_id i are self._coco_targets[self._coco_targets_offsets[i]: self._coco_targets_offsets[i + 1]].
+        """
+        if len(self.sample_id_to_coco_id) == 0:
+            return
+
+        coco_annotations = self.coco.dataset.get("annotations", [])
+        coco_image_ids = get_field_values(coco_annotations, "image_id", dtype=np.int64)
+        category_ids = get_field_values(coco_annotations, "category_id", dtype=np.int64)
+        is_crowd = get_field_values(coco_annotations, "iscrowd", dtype=np.int64)
+        areas = get_field_values(coco_annotations, "area", dtype=np.float64)
+        bboxes = get_field_values(coco_annotations, "bbox", dtype=np.float64).reshape(len(coco_annotations), 4)
+
+        # Sample id of every annotation (-1 if its image is not in the dataset)
+        coco_ids = np.array(self.sample_id_to_coco_id, dtype=np.int64)
+        sorted_sample_ids = np.argsort(coco_ids, kind="stable")
+        sorted_positions = np.minimum(np.searchsorted(coco_ids[sorted_sample_ids], coco_image_ids), len(coco_ids) - 1)
+        sample_ids = sorted_sample_ids[sorted_positions]
+        sample_ids[coco_ids[sample_ids] != coco_image_ids] = -1
+
+        # Position of every sample in the images of the json (the last one wins if many images have the same id, like with COCO.imgs)
+        coco_images = self.coco.dataset["images"]
+        image_ids = get_field_values(coco_images, "id", dtype=np.int64)
+        image_ids_sorting = np.argsort(image_ids, kind="stable")
+        self._coco_img_positions = image_ids_sorting[np.searchsorted(image_ids[image_ids_sorting], coco_ids, side="right") - 1]
+        self._coco_img_heights = get_field_values(coco_images, "height", dtype=np.int64)[self._coco_img_positions]
+        self._coco_img_widths = get_field_values(coco_images, "width", dtype=np.int64)[self._coco_img_positions]
+
+        # Clip the bboxes to their image
+        heights, widths = self._coco_img_heights[sample_ids], self._coco_img_widths[sample_ids]
+        x1 = np.maximum(0, bboxes[:, 0])
+        y1 = np.maximum(0, bboxes[:, 1])
+        x2 = np.minimum(widths, x1 + np.maximum(0, bboxes[:, 2]))
+        y2 = np.minimum(heights, y1 + np.maximum(0, bboxes[:, 3]))
+        is_valid = (sample_ids >= 0) & (areas > 0) & (x2 >= x1) & (y2 >= y1)
+
+        class_ids = np.array(self.class_ids, dtype=np.int64)
+        cls = np.searchsorted(class_ids, category_ids)
+        unknown_categories = is_valid & (class_ids[np.minimum(cls, len(class_ids) - 1)] != category_ids)
+        if unknown_categories.any():
+            raise DatasetValidationException(f"Annotations refer to categories that are not in the COCO json: {set(category_ids[unknown_categories].tolist())}")
+
+        targets = np.stack([x1, y1, x2, y2, cls.astype(np.float64)], axis=1)
+        for name, annotations_mask in (("targets", is_valid & (is_crowd == 0)), ("crowd_targets", is_valid & (is_crowd == 1))):
+            # Stable sort, so that the annotations of an image keep the order of the json (like with COCO.getAnnIds)
+            annotation_indexes = np.flatnonzero(annotations_mask)
+            annotation_indexes = annotation_indexes[np.argsort(sample_ids[annotation_indexes], kind="stable")]
+            n_targets_per_sample = np.bincount(sample_ids[annotation_indexes], minlength=len(coco_ids))
+            setattr(self, f"_coco_{name}", targets[annotation_indexes])
+            setattr(self, f"_coco_{name}_offsets", np.concatenate([[0], np.cumsum(n_targets_per_sample)]))
+            setattr(self, f"_coco_{name}_annotation_indexes", annotation_indexes)
+
+    def _get_annotations_cache_key_items(self) -> list:
+        return super()._get_annotations_cache_key_items() + [self.json_file, self.subdir, self.tight_box_rotation]
+
+    def _get_annotations_source_files(self) -> list:
+        return [os.path.join(self.data_dir, "annotations", self.json_file)]
+
     def _init_coco(self) -> COCO:
         annotation_file_path = os.path.join(self.data_dir, "annotations", self.json_file)
         if not os.path.exists(annotation_file_path):
             raise ValueError("Could not find annotation file under " + str(annotation_file_path))
 
+        if self.lazy_coco:
+            annotation_fields = ["id", "image_id", "category_id", "iscrowd", "area", "bbox"] + (["segmentation"] if self.tight_box_rotation else [])
+            keep_fields = {"images": ["id", "width", "height", "file_name"], "annotations": annotation_fields}
+            return LazyCOCO(annotation_file_path, sidecar_dir=self.coco_sidecar_dir, keep_fields=keep_fields)
+
         coco = COCO(annotation_file_path)
         remove_useless_info(coco, self.tight_box_rotation)
         return coco
@@ -123,50 +200,29 @@ class COCODetectionDataset(DetectionDataset):
 
         img_id = self.sample_id_to_coco_id[sample_id]
 
-        img_metadata = self.coco.loadImgs(img_id)[0]
+        img_metadata = self.coco.dataset["images"][int(self._coco_img_positions[sample_id])]
         width = img_metadata["width"]
         height = img_metadata["height"]
 
-        img_annotation_ids = self.coco.getAnnIds(imgIds=[int(img_id)])
-        img_annotations = self.coco.loadAnns(img_annotation_ids)
-
-        cleaned_annotations = []
-        for annotation in img_annotations:
-            x1 = np.max((0, annotation["bbox"][0]))
-            y1 = np.max((0, annotation["bbox"][1]))
-            x2 = np.min((width, x1 + np.max((0, annotation["bbox"][2]))))
-            y2 = np.min((height, y1 + np.max((0, annotation["bbox"][3]))))
-            if annotation["area"] > 0 and x2 >= x1 and y2 >= y1:
-                annotation["clean_bbox"] = [x1, y1, x2, y2]
-                cleaned_annotations.append(annotation)
+        targets_start, targets_end = self._coco_targets_offsets[sample_id], self._coco_targets_offsets[sample_id + 1]
+        target = self._coco_targets[targets_start:targets_end].copy()
+        crowd_targets_start, crowd_targets_end = self._coco_crowd_targets_offsets[sample_id], self._coco_crowd_targets_offsets[sample_id + 1]
+        crowd_target = self._coco_crowd_targets[crowd_targets_start:crowd_targets_end].copy()
 
-        non_crowd_annotations = [annotation for annotation in cleaned_annotations if annotation["iscrowd"] == 0]
-
-        target = np.zeros((len(non_crowd_annotations), 5))
         num_seg_values = 98 if self.tight_box_rotation else 0
-        target_segmentation = np.ones((len(non_crowd_annotations), num_seg_values))
+        target_segmentation = np.ones((len(target), num_seg_values))
         target_segmentation.fill(np.nan)
-        for ix, annotation in enumerate(non_crowd_annotations):
-            cls = self.class_ids.index(annotation["category_id"])
-            target[ix, 0:4] = annotation["clean_bbox"]
-            target[ix, 4] = cls
-            if self.tight_box_rotation:
+        if self.tight_box_rotation:
+            for ix, annotation_index in enumerate(self._coco_targets_annotation_indexes[targets_start:targets_end]):
+                annotation = self.coco.dataset["annotations"][annotation_index]
                 seg_points = [j for i in annotation.get("segmentation", []) for j in i]
                 if seg_points:
-                    seg_points_c = np.array(seg_points).reshape((-1, 2)).astype(np.int)
+                    seg_points_c = np.array(seg_points).reshape((-1, 2)).astype(int)
                     seg_points_convex = cv2.convexHull(seg_points_c).ravel()
                 else:
                     seg_points_convex = []
                 target_segmentation[ix, : len(seg_points_convex)] = seg_points_convex
 
-        crowd_annotations = [annotation for annotation in cleaned_annotations if annotation["iscrowd"] == 1]
-
-        crowd_target = np.zeros((len(crowd_annotations), 5))
-        for ix, annotation in enumerate(crowd_annotations):
-            cls = self.class_ids.index(annotation["category_id"])
-            crowd_target[ix, 0:4] = annotation["clean_bbox"]
-            crowd_target[ix, 4] = cls
-
         r = min(self.input_dim[0] / height, self.input_dim[1] / width)
         target[:, :4] *= r
         crowd_target[:, :4] *= r
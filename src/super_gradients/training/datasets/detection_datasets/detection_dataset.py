@@ -1,7 +1,6 @@
 import collections
 import os
-from typing import List, Dict, Union, Any, Optional, Tuple
-from multiprocessing.pool import ThreadPool
+from typing import List, Dict, Union, Any, Optional, Tuple, Iterator
 import random
 import cv2
 import matplotlib.pyplot as plt
@@ -14,12 +13,16 @@ from tqdm import tqdm
 from torch.utils.data import Dataset
 
 from super_gradients.common.decorators.factory_decorator import resolve_param
+from super_gradients.common.environment.ddp_utils import build_file_once
 from super_gradients.training.utils.detection_utils import get_cls_posx_in_target, DetectionTargetsFormat
 from super_gradients.common.abstractions.abstract_logger import get_logger
 from super_gradients.training.transforms.transforms import DetectionTransform, DetectionTargetsFormatTransform
 from super_gradients.training.exceptions.dataset_exceptions import EmptyDatasetException, DatasetValidationException
 from super_gradients.common.factories.list_factory import ListFactory
 from super_gradients.common.factories.transforms_factory import TransformsFactory
+from super_gradients.training.datasets.datasets_utils import imap_in_workers
+from super_gradients.training.datasets.image_cache import CompressedImageCache
+from super_gradients.training.datasets.detection_datasets.annotations_cache import hash_annotations_cache_key, ColumnarAnnotations
 
 logger = get_logger(__name__)
 
@@ -78,6 +81,12 @@ class DetectionDataset(Dataset):
         ignore_empty_annotations: bool = True,
         target_fields: List[str] = None,
         output_fields: List[str] = None,
+        num_annotation_workers: int = 0,
+        annotations_cache_dir: Optional[str] = None,
+        cache_num_workers: Optional[int] = None,
+        cache_variable_size: bool = False,
+        cache_compression: Optional[str] = None,
+        cache_ram_size_mb: float = 0,
     ):
         """Detection dataset.
 
@@ -100,6 +109,18 @@ class DetectionDataset(Dataset):
                                                 It has to include at least "target" but can include other.
         :paran output_fields:                   Fields that will be outputed by __getitem__.
                                                 It has to include at least "image" and "target" but can include other.
+        :param num_annotation_workers:          Number of workers used to load the annotations in parallel (0 to load them in the main process).
+                                                Processes are used when the platform supports fork, threads otherwise.
+        :param annotations_cache_dir:           If not None, the loaded annotations are saved in this directory, and memory-mapped
+                                                by the next runs (and the other DDP ranks) instead of being parsed again.
+                                                The cache is keyed by the content of the annotation files and by the dataset params.
+        :param cache_num_workers:               Number of workers used to build the images cache (0 to build it in the main process).
+                                                Processes are used when the platform supports fork, threads otherwise. Default to min(8, cpu_count).
+        :param cache_variable_size:             If True, the cached images are packed one after the other instead of being padded to input_dim,
+                                                so that small images do not take a full input_dim slot on disk and in RAM.
+        :param cache_compression:               If not None, the cached images are compressed on disk with this compression ("zlib", "lz4" or "zstd"),
+                                                and only the most recently used ones are kept decompressed in RAM (see CompressedImageCache).
+        :param cache_ram_size_mb:               Maximum size of the decompressed images kept in RAM by every process when cache_compression is set, in MB.
         """
         super().__init__()
 
@@ -129,17 +150,32 @@ class DetectionDataset(Dataset):
             wrong_classes = set(self.classes) - set(all_classes_list)
             raise DatasetValidationException(f"class_inclusion_list includes classes that are not in all_classes_list: {wrong_classes}")
 
+        # Lookup table mapping every cls_id in all_classes_list to its cls_id in class_inclusion_list, or -1 if the class is excluded
+        self._class_inclusion_lut = np.full(len(all_classes_list), -1, dtype=np.int64)
+        for included_cls_id, cls_name in enumerate(self.class_inclusion_list or []):
+            self._class_inclusion_lut[all_classes_list.index(cls_name)] = included_cls_id
+
         self.ignore_empty_annotations = ignore_empty_annotations
         self.target_fields = target_fields or ["target"]
         if "target" not in self.target_fields:
             raise KeyError('"target" is expected to be in the fields to subclass but it was not included')
 
         self._required_annotation_fields = {"target", "img_path", "resized_img_shape"}
+        self.num_annotation_workers = num_annotation_workers
+        self.annotations_cache_dir = annotations_cache_dir
         self.annotations = self._cache_annotations()
 
         self.cache = cache
         self.cache_dir = cache_dir
-        self.cached_imgs_padded = self._cache_images() if self.cache else None
+        self.cache_num_workers = min(8, os.cpu_count()) if cache_num_workers is None else cache_num_workers
+        self.cache_variable_size = cache_variable_size
+        self.cache_compression = cache_compression
+        self.cache_ram_size_mb = cache_ram_size_mb
+        self.compressed_imgs_cache = self._cache_compressed_images() if self.cache and self.cache_compression is not None else None
+        self.cached_imgs_offsets = self._get_cached_imgs_offsets() if self.cache and self.cache_variable_size and self.cache_compression is None else None
+        cached_imgs = self._cache_images() if self.cache and self.cache_compression is None else None
+        self.cached_imgs_padded = None if self.cache_variable_size else cached_imgs
+        self.cached_imgs_packed = cached_imgs if self.cache_variable_size else None
 
         self.transforms = transforms
 
@@ -162,29 +198,73 @@ class DetectionDataset(Dataset):
         """
         raise NotImplementedError
 
-    def _cache_annotations(self) -> List[Dict[str, Union[np.ndarray, Any]]]:
+    def _get_annotations_cache_key_items(self) -> List[Any]:
+        """Parameters that have an impact on the annotations, used to identify the annotations cache.
+        Datasets that have additional parameters modifying the annotations should extend this list.
+
+        :return: List of values that can be converted to str
+        """
+        return [
+            type(self).__name__,
+            self.data_dir,
+            self.n_available_samples,
+            self.input_dim,
+            self.all_classes_list,
+            self.class_inclusion_list,
+            self.ignore_empty_annotations,
+            self.max_num_samples,
+            self.target_fields,
+        ]
+
+    def _get_annotations_source_files(self) -> List[str]:
+        """Files from which the annotations are parsed. Their content is hashed to identify the annotations cache.
+        Datasets should override this method so that the cache is invalidated when the annotation files change.
+
+        :return: List of file paths
+        """
+        return []
+
+    def _cache_annotations(self) -> ColumnarAnnotations:
         """Load all the annotations to memory to avoid opening files back and forth.
+        The annotations are stored in columns (see ColumnarAnnotations) to limit the memory used by every dataloader worker.
+        If annotations_cache_dir is set, the annotations are loaded from (or saved to) the annotations cache.
+        :return: Annotations, that can be indexed like a list of dicts
+        """
+        if self.annotations_cache_dir is None:
+            return ColumnarAnnotations.from_annotations(self._load_annotations())
+
+        source_files = self._get_annotations_source_files()
+        if len(source_files) == 0:
+            logger.warning(
+                f"{type(self).__name__} does not define _get_annotations_source_files, so the annotations cache only depends on the dataset params. "
+                f"Please delete {self.annotations_cache_dir} if your annotations changed."
+            )
+        cache_hash = hash_annotations_cache_key(key_items=self._get_annotations_cache_key_items(), source_files=source_files)
+        cache_path = Path(self.annotations_cache_dir) / f"annotations_cache_{cache_hash}"
+
+        if not cache_path.exists():
+            logger.info(f"Saving the annotations cache to {cache_path}")
+            ColumnarAnnotations.from_annotations(self._load_annotations()).save(cache_path)
+        else:
+            logger.info(f"Loading the annotations cache from {cache_path}")
+        return ColumnarAnnotations.load(cache_path)
+
+    def _load_annotations(self) -> List[Dict[str, Union[np.ndarray, Any]]]:
+        """Load all the annotations, in order of sample_id, subclass them and drop the empty ones if required.
         :return: List of annotations
         """
         annotations = []
-        for sample_id, img_id in enumerate(tqdm(range(self.n_available_samples), desc="Caching annotations")):
+        loaded_annotations = self._iterate_sub_classed_annotations(self._iterate_loaded_annotations())
+        for img_annotation in tqdm(loaded_annotations, total=self.n_available_samples, desc="Caching annotations"):
 
             if self.max_num_samples is not None and len(annotations) >= self.max_num_samples:
                 break
 
-            img_annotation = self._load_annotation(img_id)
-            if not self._required_annotation_fields.issubset(set(img_annotation.keys())):
-                raise KeyError(
-                    f"_load_annotation is expected to return at least the fields {self._required_annotation_fields} " f"but got {set(img_annotation.keys())}"
-                )
-
-            if self.class_inclusion_list is not None:
-                img_annotation = self._sub_class_annotation(img_annotation)
-
             is_annotation_empty = all(len(img_annotation[field]) == 0 for field in self.target_fields)
             if self.ignore_empty_annotations and is_annotation_empty:
                 continue
             annotations.append(img_annotation)
+        loaded_annotations.close()
 
         if len(annotations) == 0:
             raise EmptyDatasetException(
@@ -192,16 +272,83 @@ class DetectionDataset(Dataset):
             )
         return annotations
 
-    def _sub_class_annotation(self, annotation: dict) -> Union[dict, None]:
-        """Subclass every field listed in self.target_fields. It could be targets, crowd_targets, ...
-
-        :param annotation: Dict representing the annotation of a specific image
-        :return:           Subclassed annotation if non empty after subclassing, otherwise None
+    def _iterate_loaded_annotations(self) -> Iterator[Dict[str, Union[np.ndarray, Any]]]:
+        """Iterate over the annotations of every sample_id, in order. The annotations are loaded by a pool of workers if num_annotation_workers > 0.
+        :return: Iterator over the annotations returned by _load_annotation
+        """
+        if self.num_annotation_workers <= 0:
+            for sample_id in range(self.n_available_samples):
+                yield self._load_annotation(sample_id)
+        else:
+            yield from imap_in_workers(self._load_annotation, n_items=self.n_available_samples, num_workers=self.num_annotation_workers)
+
+    def _iterate_sub_classed_annotations(
+        self, loaded_annotations: Iterator[Dict[str, Union[np.ndarray, Any]]], chunk_size: int = 1024
+    ) -> Iterator[Dict[str, Union[np.ndarray, Any]]]:
+        """Check the fields of the loaded annotations and, if class_inclusion_list is set, subclass them by chunks (see _sub_class_annotations).
+        :param loaded_annotations:  Iterator over the annotations returned by _load_annotation
+        :param chunk_size:          Number of annotations subclassed at once
+        :return:                    Iterator over the (subclassed) annotations, in the same order
+        """
+        chunk = []
+        try:
+            for img_annotation in loaded_annotations:
+                if not self._required_annotation_fields.issubset(set(img_annotation.keys())):
+                    raise KeyError(
+                        f"_load_annotation is expected to return at least the fields {self._required_annotation_fields} "
+                        f"but got {set(img_annotation.keys())}"
+                    )
+                if self.class_inclusion_list is None:
+                    yield img_annotation
+                    continue
+
+                chunk.append(img_annotation)
+                if len(chunk) == chunk_size:
+                    yield from self._sub_class_annotations(chunk)
+                    chunk = []
+            yield from self._sub_class_annotations(chunk)
+        finally:
+            loaded_annotations.close()
+
+    def _sub_class_annotations(self, annotations: List[dict]) -> List[dict]:
+        """Subclass every field listed in self.target_fields, for many annotations at once.
+        The targets of all the annotations are remapped together, which avoids running many numpy operations on tiny arrays.
+
+        :param annotations: List of annotations
+        :return:            Subclassed annotations
         """
         cls_posx = get_cls_posx_in_target(self.original_target_format)
         for field in self.target_fields:
-            annotation[field] = self._sub_class_target(targets=annotation[field], cls_posx=cls_posx)
-        return annotation
+            sub_classed_targets = self._sub_class_targets(targets_list=[annotation[field] for annotation in annotations], cls_posx=cls_posx)
+            for annotation, targets in zip(annotations, sub_classed_targets):
+                annotation[field] = targets
+        return annotations
+
+    def _sub_class_targets(self, targets_list: List[np.ndarray], cls_posx: int) -> List[np.ndarray]:
+        """Subclass the targets of many images at once. Equivalent to calling _sub_class_target on every targets array.
+
+        :param targets_list:    Target arrays to subclass, each of shape [n_targets, 5]
+        :param cls_posx:        Position of the class id in a bbox
+        :return:                Subclassed target arrays
+        """
+        non_empty_targets = [targets for targets in targets_list if len(targets) > 0]
+        if len({(targets.ndim, targets.shape[1:], targets.dtype) for targets in non_empty_targets}) > 1:
+            # Targets that cannot be concatenated without changing their dtype are subclassed one by one
+            return [self._sub_class_target(targets=targets, cls_posx=cls_posx) for targets in targets_list]
+        if len(non_empty_targets) == 0:
+            return [np.zeros((0, 5), dtype=np.float32) for _ in targets_list]
+
+        all_targets = np.concatenate(non_empty_targets, axis=0)
+        included_cls_ids = self._class_inclusion_lut[all_targets[:, cls_posx].astype(np.int64)]
+        is_included = included_cls_ids >= 0
+        all_targets_kept = all_targets[is_included]
+        all_targets_kept[:, cls_posx] = included_cls_ids[is_included]
+
+        # Position of the targets of every image in all_targets_kept
+        offsets = np.cumsum([0] + [len(targets) for targets in targets_list])
+        kept_offsets = np.concatenate([[0], np.cumsum(is_included)])[offsets].tolist()
+        empty_targets = np.zeros((0, 5), dtype=np.float32)
+        return [all_targets_kept[start:end] if end > start else empty_targets.copy() for start, end in zip(kept_offsets[:-1], kept_offsets[1:])]
 
     def _sub_class_target(self, targets: np.ndarray, cls_posx: int) -> np.ndarray:
         """Sublass targets of a specific image.
@@ -211,25 +358,27 @@ class DetectionDataset(Dataset):
                                 ex: 0 if bbox of format label_xyxy | -1 if bbox of format xyxy_label
         :return:            Subclassed target
         """
-        targets_kept = []
-        for target in targets:
-            cls_id = int(target[cls_posx])
-            cls_name = self.all_classes_list[cls_id]
-            if cls_name in self.class_inclusion_list:
-                # Replace the target cls_id in self.all_classes_list by cls_id in self.class_inclusion_list
-                target[cls_posx] = self.class_inclusion_list.index(cls_name)
-                targets_kept.append(target)
+        if len(targets) == 0:
+            return np.zeros((0, 5), dtype=np.float32)
+
+        # Replace the target cls_id in self.all_classes_list by cls_id in self.class_inclusion_list, and drop the excluded classes
+        included_cls_ids = self._class_inclusion_lut[targets[:, cls_posx].astype(np.int64)]
+        is_included = included_cls_ids >= 0
+        if not is_included.any():
+            return np.zeros((0, 5), dtype=np.float32)
 
-        return np.array(targets_kept) if len(targets_kept) > 0 else np.zeros((0, 5), dtype=np.float32)
+        targets_kept = targets[is_included]
+        targets_kept[:, cls_posx] = included_cls_ids[is_included]
+        return targets_kept
 
     def _cache_images(self) -> np.ndarray:
         """Cache the images. The cached image are stored in a file to be loaded faster mext time.
-        :return: Cached images
+        The file is built only once, even when many processes (e.g. DDP ranks) instantiate the same dataset at the same time:
+        the first process builds it while the other ones wait, and then every process memory-maps it in read-only mode,
+        so that the pages are shared in RAM instead of being duplicated by every process.
+        :return: Cached images, of shape (len(self), max_h, max_w, 3) if padded, or flat if cache_variable_size (see get_resized_image)
         """
-        cache_dir = Path(self.cache_dir)
-        if cache_dir is None:
-            raise ValueError("You must specify a cache_dir if you want to cache your images." "If you did not mean to use cache, please set cache=False ")
-        cache_dir.mkdir(parents=True, exist_ok=True)
+        cache_dir = self._get_images_cache_dir()
 
         logger.warning(
             "\n********************************************************************************\n"
@@ -238,38 +387,105 @@ class DetectionDataset(Dataset):
             "********************************************************************************"
         )
 
-        max_h, max_w = self.input_dim[0], self.input_dim[1]
+        cache_hash = self._get_images_cache_hash()
+        if self.cache_variable_size:
+            cache_shape = (int(self.cached_imgs_offsets[-1]),)
+            img_resized_cache_path = cache_dir / f"img_resized_packed_cache_{cache_hash}.array"
+        else:
+            cache_shape = (len(self), self.input_dim[0], self.input_dim[1], 3)
+            img_resized_cache_path = cache_dir / f"img_resized_cache_{cache_hash}.array"
+
+        if img_resized_cache_path.exists():
+            logger.warning("You are using cached imgs!")
+        build_file_once(img_resized_cache_path, build_fn=lambda tmp_cache_path: self._build_images_cache(tmp_cache_path, cache_shape))
+
+        logger.info("Loading cached imgs...")
+        cached_imgs = np.memmap(str(img_resized_cache_path), shape=cache_shape, dtype=np.uint8, mode="r")
+        return cached_imgs
+
+    def _cache_compressed_images(self) -> CompressedImageCache:
+        """Cache the resized images compressed on disk, with the most recently used ones decompressed in RAM (see CompressedImageCache).
+        Like with _cache_images, the file is built only once even when many processes instantiate the same dataset at the same time.
+        :return: Compressed images cache
+        """
+        cache_dir = self._get_images_cache_dir()
+        img_resized_cache_path = cache_dir / f"img_resized_cache_{self._get_images_cache_hash()}.{self.cache_compression}.cache"
+        if img_resized_cache_path.exists():
+            logger.warning("You are using cached imgs!")
+        CompressedImageCache.build(
+            img_resized_cache_path,
+            n_images=len(self),
+            load_image_fn=self._load_resized_img,
+            compression=self.cache_compression,
+            num_workers=self.cache_num_workers,
+        )
+        return CompressedImageCache(img_resized_cache_path, ram_cache_size_mb=self.cache_ram_size_mb)
+
+    def _get_images_cache_dir(self) -> Path:
+        if self.cache_dir is None:
+            raise ValueError("You must specify a cache_dir if you want to cache your images." "If you did not mean to use cache, please set cache=False ")
+        cache_dir = Path(self.cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        return cache_dir
 
-        # The cache should be the same as long as the images and their sizes are the same
+    def _get_images_cache_hash(self) -> str:
+        """The cache should be the same as long as the images and their sizes are the same"""
         hash = hashlib.sha256()
-        for annotation in self.annotations:
-            values_to_hash = [annotation["resized_img_shape"][0], annotation["resized_img_shape"][1], Path(annotation["img_path"]).name]
+        for index in range(len(self)):
+            resized_img_shape = self.annotations.get_field(index, "resized_img_shape")
+            values_to_hash = [resized_img_shape[0], resized_img_shape[1], Path(self.annotations.get_field(index, "img_path")).name]
             for value in values_to_hash:
                 hash.update(str(value).encode("utf-8"))
-        cache_hash = hash.hexdigest()
+        return hash.hexdigest()
 
-        img_resized_cache_path = cache_dir / f"img_resized_cache_{cache_hash}.array"
-
-        if not img_resized_cache_path.exists():
-            logger.info("Caching images for the first time. Be aware that this will stay in the disk until you delete it yourself.")
-            NUM_THREADs = min(8, os.cpu_count())
-            loaded_images = ThreadPool(NUM_THREADs).imap(func=lambda x: self._load_resized_img(x), iterable=range(len(self)))
-
-            # Initialize placeholder for images
-            cached_imgs = np.memmap(str(img_resized_cache_path), shape=(len(self), max_h, max_w, 3), dtype=np.uint8, mode="w+")
-
-            # Store images in the placeholder
-            loaded_images_pbar = tqdm(enumerate(loaded_images), total=len(self))
-            for i, image in loaded_images_pbar:
-                cached_imgs[i][: image.shape[0], : image.shape[1], :] = image.copy()
-            cached_imgs.flush()
-            loaded_images_pbar.close()
+    def _get_cached_imgs_offsets(self) -> np.ndarray:
+        """Offsets of every image in the flat images cache, when cache_variable_size is True.
+        :return: Array of shape (len(self) + 1,), image at index i being stored in [offsets[i], offsets[i + 1])
+        """
+        img_sizes = np.zeros(len(self) + 1, dtype=np.int64)
+        for index in range(len(self)):
+            resized_height, resized_width = self.annotations.get_field(index, "resized_img_shape")
+            img_sizes[index + 1] = resized_height * resized_width * 3
+        return np.cumsum(img_sizes)
+
+    def _build_images_cache(self, cache_path: Path, cache_shape: Tuple[int, ...]) -> None:
+        """Load all the resized images and write them into a new images cache file.
+        The workers write directly into the memory-mapped file, so the images are not sent back to the main process.
+        :param cache_path:  Path of the file to write
+        :param cache_shape: Shape of the cache
+        """
+        logger.info("Caching images for the first time. Be aware that this will stay in the disk until you delete it yourself.")
+        # With fork, the workers inherit this shared mapping of the file
+        self._cached_imgs_writer = np.memmap(str(cache_path), shape=cache_shape, dtype=np.uint8, mode="w+")
+        try:
+            if self.cache_num_workers > 0:
+                cached_indexes = imap_in_workers(self._write_image_to_cache, n_items=len(self), num_workers=self.cache_num_workers)
+            else:
+                cached_indexes = map(self._write_image_to_cache, range(len(self)))
+            for _ in tqdm(cached_indexes, total=len(self), desc="Caching images"):
+                pass
+            self._cached_imgs_writer.flush()
+        finally:
+            self._cached_imgs_writer = None
+
+    def _write_image_to_cache(self, index: int) -> int:
+        """Load the resized image at a specific index and write it into the images cache being built (see _build_images_cache).
+        :param index:   Image index
+        :return:        Image index
+        """
+        image = self._load_resized_img(index)
+        if self.cache_variable_size:
+            resized_img_shape = tuple(self.annotations.get_field(index, "resized_img_shape"))
+            if image.shape[:2] != resized_img_shape:
+                raise ValueError(
+                    f"Image at index {index} was resized to {image.shape[:2]} but its annotation has resized_img_shape={resized_img_shape}, "
+                    f"which is not supported with cache_variable_size=True"
+                )
+            start, end = self.cached_imgs_offsets[index], self.cached_imgs_offsets[index + 1]
+            self._cached_imgs_writer[start:end] = image.reshape(-1)
         else:
-            logger.warning("You are using cached imgs!")
-
-        logger.info("Loading cached imgs...")
-        cached_imgs = np.memmap(str(img_resized_cache_path), shape=(len(self), max_h, max_w, 3), dtype=np.uint8, mode="r+")
-        return cached_imgs
+            self._cached_imgs_writer[index, : image.shape[0], : image.shape[1], :] = image
+        return index
 
     def _load_resized_img(self, index: int) -> np.ndarray:
         """Load image, and resizes it to self.input_dim
@@ -289,7 +505,7 @@ class DetectionDataset(Dataset):
         :param index:   Image index
         :return:        Image in array format
         """
-        img_path = self.annotations[index]["img_path"]
+        img_path = self.annotations.get_field(index, "img_path")
 
         img_file = os.path.join(img_path)
         img = cv2.imread(img_file)
@@ -302,6 +518,8 @@ class DetectionDataset(Dataset):
         """Clear the cached images"""
         if hasattr(self, "cached_imgs_padded"):
             del self.cached_imgs_padded
+        if hasattr(self, "cached_imgs_packed"):
+            del self.cached_imgs_packed
 
     def __len__(self):
         """Get the length of the dataset."""
@@ -331,13 +549,19 @@ class DetectionDataset(Dataset):
     def get_resized_image(self, index: int) -> np.ndarray:
         """
         Get the resized image (i.e. either width or height reaches its input_dim) at a specific sample_id,
-        either from cache or by loading from disk, based on self.cached_imgs_padded
+        either from cache or by loading from disk, based on self.cached_imgs_padded (or self.cached_imgs_packed)
         :param index:  Image index
         :return:       Resized image
         """
-        if self.cache:
+        if self.compressed_imgs_cache is not None:
+            return self.compressed_imgs_cache[index]
+        elif self.cache and self.cache_variable_size:
+            resized_height, resized_width = self.annotations.get_field(index, "resized_img_shape")
+            start, end = self.cached_imgs_offsets[index], self.cached_imgs_offsets[index + 1]
+            return self.cached_imgs_packed[start:end].reshape(resized_height, resized_width, 3).copy()
+        elif self.cache:
             padded_image = self.cached_imgs_padded[index]
-            resized_height, resized_width = self.annotations[index]["resized_img_shape"]
+            resized_height, resized_width = self.annotations.get_field(index, "resized_img_shape")
             resized_image = padded_image[:resized_height, :resized_width, :]
             return resized_image.copy()
         else:
@@ -388,7 +612,7 @@ class DetectionDataset(Dataset):
         target, index = [], -1
         while len(target) == 0:
             index = self._random_index()
-            target = self.annotations[index]["target"]
+            target = self.annotations.get_field(index, "target")
         return index
 
     def _random_index(self):
@@ -109,6 +109,12 @@ class PascalVOCDetectionDataset(DetectionDataset):
         self.img_and_target_path_list = img_and_target_path_list
         return len(self.img_and_target_path_list)
 
+    def _get_annotations_cache_key_items(self) -> list:
+        return super()._get_annotations_cache_key_items() + [self.images_sub_directory]
+
+    def _get_annotations_source_files(self) -> list:
+        return [target_path for _, target_path in self.img_and_target_path_list]
+
     def _load_annotation(self, sample_id: int) -> dict:
         """Load annotations associated to a specific sample.
 
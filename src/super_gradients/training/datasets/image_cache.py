@@ -0,0 +1,170 @@
+import os
+import pickle
+import struct
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Tuple, Union
+
+import numpy as np
+from tqdm import tqdm
+
+from super_gradients.common.abstractions.abstract_logger import get_logger
+from super_gradients.common.environment.ddp_utils import build_file_once
+from super_gradients.training.datasets.datasets_utils import imap_in_workers
+
+logger = get_logger(__name__)
+
+IMAGE_CACHE_COMPRESSIONS = ("zlib", "lz4", "zstd")
+_FOOTER_FORMAT = "<q"  # Position of the index in the file
+
+
+class CompressedImageCache:
+    """Two-tier cache of decoded images:
+        - On disk: every image is compressed independently (zlib, lz4 or zstd) and stored in a single file,
+          which is memory-mapped in read-only mode so that it can be shared by DDP ranks and dataloader workers.
+        - In RAM: a bounded LRU of decompressed images, in every process (i.e. every dataloader worker has its own).
+
+    The hit/miss counters of the RAM tier can be used to size it (see stats).
+
+    File layout: compressed images one after the other, followed by the pickled index (offsets, shapes and dtypes of the images,
+    compression) and by the position of the index.
+    """
+
+    def __init__(self, cache_path: Union[str, Path], ram_cache_size_mb: float = 0):
+        """
+        :param cache_path:          Path of a cache file, built with CompressedImageCache.build
+        :param ram_cache_size_mb:   Maximum size of the decompressed images kept in RAM, in MB (0 to disable the RAM tier)
+        """
+        self.cache_path = str(cache_path)
+        self.ram_cache_size_bytes = int(ram_cache_size_mb * 1024**2)
+
+        with open(self.cache_path, "rb") as f:
+            f.seek(-struct.calcsize(_FOOTER_FORMAT), os.SEEK_END)
+            (index_position,) = struct.unpack(_FOOTER_FORMAT, f.read(struct.calcsize(_FOOTER_FORMAT)))
+            f.seek(index_position)
+            index = pickle.load(f)
+        self.offsets = index["offsets"]
+        self.shapes = index["shapes"]
+        self.dtypes = index["dtypes"]
+        self.compression = index["compression"]
+        self._decompress = _get_codec(self.compression)[1]
+
+        self._data = None
+        self._ram_cache = OrderedDict()
+        self._ram_cache_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def build(
+        cls, cache_path: Union[str, Path], n_images: int, load_image_fn: Callable[[int], np.ndarray], compression: str = "zlib", num_workers: int = 0
+    ) -> None:
+        """Build the cache file, unless it already exists. When many processes (e.g. DDP ranks) build the same cache at the same time,
+        only one of them loads the images while the other ones wait.
+
+        :param cache_path:      Path of the cache file
+        :param n_images:        Number of images
+        :param load_image_fn:   Function loading the decoded image at a specific index
+        :param compression:     Compression of the images, one of IMAGE_CACHE_COMPRESSIONS. lz4 and zstd require the lz4 and zstandard packages.
+        :param num_workers:     Number of workers loading and compressing the images (0 to do it in the main process)
+        """
+        compress = _get_codec(compression)[0]
+
+        def load_and_compress(index: int) -> Tuple[bytes, Tuple[int, ...], str]:
+            image = np.ascontiguousarray(load_image_fn(index))
+            return compress(image.tobytes()), image.shape, image.dtype.str
+
+        def write_cache(tmp_cache_path: Path) -> None:
+            logger.info(f"Caching compressed images to {cache_path}. Be aware that this will stay in the disk until you delete it yourself.")
+            if num_workers > 0:
+                compressed_images = imap_in_workers(load_and_compress, n_items=n_images, num_workers=num_workers)
+            else:
+                compressed_images = map(load_and_compress, range(n_images))
+
+            offsets, shapes, dtypes = np.zeros(n_images + 1, dtype=np.int64), [], []
+            with open(tmp_cache_path, "wb") as f:
+                for index, (data, shape, dtype) in enumerate(tqdm(compressed_images, total=n_images, desc="Caching compressed images")):
+                    f.write(data)
+                    offsets[index + 1] = offsets[index] + len(data)
+                    shapes.append(shape)
+                    dtypes.append(dtype)
+                pickle.dump({"offsets": offsets, "shapes": shapes, "dtypes": dtypes, "compression": compression}, f)
+                f.write(struct.pack(_FOOTER_FORMAT, int(offsets[-1])))
+
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        build_file_once(cache_path, build_fn=write_cache)
+
+    def __len__(self) -> int:
+        return len(self.shapes)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """Get the decoded image at a specific index, from RAM if available and from disk otherwise.
+        :param index:   Image index
+        :return:        Image, that can be modified inplace without altering the cache
+        """
+        image = self._ram_cache.get(index)
+        if image is not None:
+            self.hits += 1
+            self._ram_cache.move_to_end(index)
+            return image.copy()
+
+        self.misses += 1
+        if self._data is None:
+            self._data = np.memmap(self.cache_path, dtype=np.uint8, mode="r")
+        data = self._data[self.offsets[index] : self.offsets[index + 1]].tobytes()
+        image = np.frombuffer(self._decompress(data), dtype=np.dtype(self.dtypes[index])).reshape(self.shapes[index])
+
+        if 0 < image.nbytes <= self.ram_cache_size_bytes:
+            self._ram_cache[index] = image
+            self._ram_cache_bytes += image.nbytes
+            while self._ram_cache_bytes > self.ram_cache_size_bytes:
+                _, evicted_image = self._ram_cache.popitem(last=False)
+                self._ram_cache_bytes -= evicted_image.nbytes
+        return image.copy()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Statistics of the RAM tier in the current process."""
+        n_requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / n_requests if n_requests else 0.0,
+            "ram_cached_images": len(self._ram_cache),
+            "ram_cached_mb": self._ram_cache_bytes / 1024**2,
+            "disk_cached_mb": int(self.offsets[-1]) / 1024**2,
+        }
+
+    def __getstate__(self) -> dict:
+        # The file is mapped again and the RAM tier starts empty in the unpickled copy (e.g. in spawned dataloader workers)
+        state = self.__dict__.copy()
+        state.update(_data=None, _decompress=None, _ram_cache=OrderedDict(), _ram_cache_bytes=0)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._decompress = _get_codec(self.compression)[1]
+
+
+def _get_codec(compression: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """Get the functions compressing and decompressing bytes with a specific compression.
+
+    :param compression: One of IMAGE_CACHE_COMPRESSIONS
+    :return:            compress and decompress functions
+    """
+    if compression == "zlib":
+        return lambda data: zlib.compress(data, 1), zlib.decompress
+    elif compression == "lz4":
+        try:
+            import lz4.frame
+        except ModuleNotFoundError as import_err:
+            raise ModuleNotFoundError('compression="lz4" requires the lz4 package (pip install lz4)') from import_err
+        return lz4.frame.compress, lz4.frame.decompress
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ModuleNotFoundError as import_err:
+            raise ModuleNotFoundError('compression="zstd" requires the zstandard package (pip install zstandard)') from import_err
+        return lambda data: zstandard.ZstdCompressor(level=3).compress(data), lambda data: zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"compression must be one of {IMAGE_CACHE_COMPRESSIONS} but got {compression}")
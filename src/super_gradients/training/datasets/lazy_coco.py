@@ -0,0 +1,248 @@
+import json
+import os
+import pickle
+import shutil
+from collections import defaultdict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from pycocotools.coco import COCO
+
+from super_gradients.common.abstractions.abstract_logger import get_logger
+from super_gradients.training.datasets.detection_datasets.annotations_cache import ColumnarAnnotations, hash_annotations_cache_key
+
+logger = get_logger(__name__)
+
+# Keys stored in columns. The other keys (categories, info, ...) are small, so they are kept as plain python objects
+SIDECAR_ITEMS_KEYS = ("images", "annotations")
+SIDECAR_METADATA_FILE = "dataset.pkl"
+
+
+def load_json(json_file: str) -> Any:
+    """Load a json file with orjson when it is installed, which is much faster than the standard library on large files.
+
+    :param json_file:   Path of the json file
+    :return:            Parsed content
+    """
+    try:
+        import orjson
+    except ModuleNotFoundError:
+        with open(json_file, "r") as f:
+            return json.load(f)
+    with open(json_file, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def get_field_values(items: Sequence[Dict[str, Any]], field: str, dtype: np.dtype) -> np.ndarray:
+    """Get the value of a field for every item (image, annotation, ...) of a COCO dataset, without building the items when they are stored in columns.
+
+    :param items:   List of dicts, or ColumnarAnnotations
+    :param field:   Name of the field
+    :param dtype:   Type of the output array
+    :return:        Array of shape [len(items), ...]
+    """
+    if isinstance(items, ColumnarAnnotations):
+        if items.columns[field]["kind"] in ("scalar", "fixed"):
+            return np.asarray(items.columns[field]["values"], dtype=dtype)
+        return np.array([items.get_field(index, field) for index in range(len(items))], dtype=dtype)
+    return np.array([item[field] for item in items], dtype=dtype)
+
+
+class LazyCOCO(COCO):
+    """Drop-in replacement of pycocotools.COCO, made for large annotation files.
+
+    Compared to COCO:
+        - The json is parsed with orjson when it is installed.
+        - Only the fields listed in keep_fields are kept, the other ones are dropped right after parsing.
+        - The indexes (anns, imgs, imgToAnns, ...) are only built when they are accessed, from numpy arrays of ids.
+          The items (images and annotations) themselves are only built when they are requested.
+        - If sidecar_dir is set, the parsed dataset is saved there in columns (see ColumnarAnnotations) on the first run,
+          and memory-mapped by the next runs and the other DDP ranks instead of parsing the json again.
+          dataset["images"] and dataset["annotations"] are then read-only sequences of dicts (ColumnarAnnotations) instead of lists.
+    """
+
+    def __init__(self, annotation_file: str, sidecar_dir: Optional[str] = None, keep_fields: Optional[Dict[str, List[str]]] = None):
+        """
+        :param annotation_file: Path of the COCO json file
+        :param sidecar_dir:     If not None, directory where the parsed dataset is cached, keyed by the content of annotation_file and keep_fields
+        :param keep_fields:     If not None, fields to keep for the items of some keys of the json, e.g. {"annotations": ["id", "image_id", "bbox"]}
+        """
+        # COCO.__init__ is not called on purpose: it parses the json with the standard library and builds every index
+        self.annotation_file = annotation_file
+        self.keep_fields = keep_fields or {}
+        if sidecar_dir is None:
+            self.dataset = self._parse_dataset()
+        else:
+            self.dataset = self._load_or_save_sidecar(sidecar_dir)
+        self._indexes = {}
+
+    def _parse_dataset(self) -> Dict[str, Any]:
+        dataset = load_json(self.annotation_file)
+        if not isinstance(dataset, dict):
+            raise ValueError(f"annotation file format {type(dataset)} not supported")
+        for key, fields in self.keep_fields.items():
+            fields = set(fields)
+            for item in dataset.get(key, []):
+                for field in [field for field in item if field not in fields]:
+                    del item[field]
+        return dataset
+
+    def _load_or_save_sidecar(self, sidecar_dir: str) -> Dict[str, Any]:
+        """Load the dataset from its sidecar, after saving it if it does not exist yet.
+        :param sidecar_dir: Directory of the sidecars
+        :return:            Dataset, in which the images and annotations are ColumnarAnnotations when all their items have the same fields
+        """
+        cache_hash = hash_annotations_cache_key(key_items=[SIDECAR_ITEMS_KEYS, sorted(self.keep_fields.items())], source_files=[self.annotation_file])
+        sidecar_path = Path(sidecar_dir) / f"{Path(self.annotation_file).stem}_{cache_hash}"
+
+        if not sidecar_path.exists():
+            logger.info(f"Saving the parsed COCO annotations to {sidecar_path}")
+            _save_sidecar(self._parse_dataset(), sidecar_path)
+        else:
+            logger.info(f"Loading the parsed COCO annotations from {sidecar_path}")
+
+        with open(sidecar_path / SIDECAR_METADATA_FILE, "rb") as f:
+            dataset = pickle.load(f)
+        for key in SIDECAR_ITEMS_KEYS:
+            if (sidecar_path / key).exists():
+                dataset[key] = ColumnarAnnotations.load(sidecar_path / key)
+        return dataset
+
+    def createIndex(self) -> None:
+        """Reset the indexes, which are built again when they are accessed (e.g. after modifying self.dataset)."""
+        self._indexes = {}
+
+    def _get_index(self, name: str) -> Any:
+        if name not in self._indexes:
+            self._indexes[name] = self._build_index(name)
+        return self._indexes[name]
+
+    def _build_index(self, name: str) -> Any:
+        images, annotations = self.dataset.get("images", []), self.dataset.get("annotations", [])
+        if name == "anns":
+            return ItemsById(annotations, ids=get_field_values(annotations, "id", np.int64))
+        elif name == "imgs":
+            return ItemsById(images, ids=get_field_values(images, "id", np.int64))
+        elif name == "cats":
+            return {category["id"]: category for category in self.dataset.get("categories", [])}
+        elif name == "imgToAnns":
+            return ItemsByGroup(annotations, group_ids=get_field_values(annotations, "image_id", np.int64))
+        elif name == "catToImgs":
+            cat_to_imgs = defaultdict(list)
+            category_ids = get_field_values(annotations, "category_id", np.int64).tolist()
+            for category_id, image_id in zip(category_ids, get_field_values(annotations, "image_id", np.int64).tolist()):
+                cat_to_imgs[category_id].append(image_id)
+            return cat_to_imgs
+        raise KeyError(name)
+
+    # The indexes of pycocotools.COCO, built lazily
+    anns = property(lambda self: self._get_index("anns"))
+    imgs = property(lambda self: self._get_index("imgs"))
+    cats = property(lambda self: self._get_index("cats"))
+    imgToAnns = property(lambda self: self._get_index("imgToAnns"))
+    catToImgs = property(lambda self: self._get_index("catToImgs"))
+
+
+class ItemsById(Mapping):
+    """Read-only mapping from the ids of items (images, annotations) to the items, that does not need to build the items.
+    Like a dict built from the items, the last item wins when many items have the same id.
+    """
+
+    def __init__(self, items: Sequence[Dict[str, Any]], ids: np.ndarray):
+        """
+        :param items:   List of dicts, or ColumnarAnnotations
+        :param ids:     Id of every item
+        """
+        self.items = items
+        self.ids = ids
+        self._sorting = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._sorting]
+
+    def _get_position(self, item_id: int) -> Optional[int]:
+        position = np.searchsorted(self._sorted_ids, item_id, side="right") - 1
+        if position < 0 or self._sorted_ids[position] != item_id:
+            return None
+        return int(self._sorting[position])
+
+    def __getitem__(self, item_id: int) -> Dict[str, Any]:
+        position = self._get_position(item_id)
+        if position is None:
+            raise KeyError(item_id)
+        return self.items[position]
+
+    def __contains__(self, item_id: object) -> bool:
+        return self._get_position(item_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(dict.fromkeys(self.ids.tolist()))
+
+    def __len__(self) -> int:
+        return len(np.unique(self.ids))
+
+
+class ItemsByGroup(Mapping):
+    """Read-only mapping from group ids (e.g. image ids) to the list of items (e.g. annotations) of every group, in the order of the items.
+    Like the defaultdict of pycocotools, a group without any item maps to an empty list.
+    """
+
+    def __init__(self, items: Sequence[Dict[str, Any]], group_ids: np.ndarray):
+        """
+        :param items:       List of dicts, or ColumnarAnnotations
+        :param group_ids:   Group id of every item
+        """
+        self.items = items
+        self._sorting = np.argsort(group_ids, kind="stable")
+        self._unique_group_ids, self._group_starts, group_sizes = np.unique(group_ids[self._sorting], return_index=True, return_counts=True)
+        self._group_ends = self._group_starts + group_sizes
+
+    def _get_group(self, group_id: int) -> Optional[int]:
+        group = np.searchsorted(self._unique_group_ids, group_id)
+        if group >= len(self._unique_group_ids) or self._unique_group_ids[group] != group_id:
+            return None
+        return int(group)
+
+    def __getitem__(self, group_id: int) -> List[Dict[str, Any]]:
+        group = self._get_group(group_id)
+        if group is None:
+            return []
+        return [self.items[int(position)] for position in self._sorting[self._group_starts[group] : self._group_ends[group]]]
+
+    def __contains__(self, group_id: object) -> bool:
+        return self._get_group(group_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._unique_group_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self._unique_group_ids)
+
+
+def _save_sidecar(dataset: Dict[str, Any], sidecar_path: Union[str, Path]) -> None:
+    """Save a COCO dataset in a directory. The images and annotations are stored in columns (see ColumnarAnnotations)
+    when all their items have the same fields, and every other key of the dataset is pickled.
+    The directory is first written under a temporary name and then renamed, so that a partially written sidecar is never loaded.
+
+    :param dataset:         Parsed COCO json
+    :param sidecar_path:    Path of the sidecar directory
+    """
+    sidecar_path = Path(sidecar_path)
+    tmp_sidecar_path = sidecar_path.with_name(f"{sidecar_path.name}.tmp{os.getpid()}")
+    tmp_sidecar_path.mkdir(parents=True, exist_ok=True)
+
+    metadata = dict(dataset)
+    for key in SIDECAR_ITEMS_KEYS:
+        items = dataset.get(key)
+        if items and len({frozenset(item.keys()) for item in items}) == 1:
+            ColumnarAnnotations.from_annotations(items).save(tmp_sidecar_path / key)
+            metadata.pop(key)
+
+    with open(tmp_sidecar_path / SIDECAR_METADATA_FILE, "wb") as f:
+        pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    try:
+        tmp_sidecar_path.rename(sidecar_path)
+    except OSError:
+        # Another process already saved the same sidecar in the meantime
+        shutil.rmtree(tmp_sidecar_path, ignore_errors=True)
@@ -15,6 +15,7 @@ from typing import List, Union
 import numpy as np
 import torch
 
+from super_gradients.training.datasets.datasets_utils import AbstractPrePredictionCallback
 from super_gradients.training.exceptions.dataset_exceptions import IllegalDatasetParameterException
 
 
@@ -104,6 +105,7 @@ class CollateMixup:
     """
     Collate with Mixup/Cutmix that applies different params to each element or whole batch
     A Mixup impl that's performed while collating the batches.
+    See MixupPrePredictionCallback for the same augmentation performed on the device batches instead of the dataloader workers.
     """
 
     def __init__(self, mixup_alpha: float = 1., cutmix_alpha: float = 0., cutmix_minmax: List[float] = None,
@@ -302,3 +304,131 @@ class CollateMixup:
         target = target[:batch_size]
 
         return output, target
+
+
+class MixupPrePredictionCallback(AbstractPrePredictionCallback):
+    """
+    Mixup/Cutmix applied on the device (i.e. GPU) batches right before the forward pass, instead of in the collate function of the
+     dataloader workers like CollateMixup (which should not be used together with it).
+    Pass it as training_params.pre_prediction_callback, with the default collate function: the images are mixed in place of the
+     collated batch and the labels are replaced with mixed, label smoothed soft targets of shape [B, num_classes].
+
+    The parameters are drawn on the device and applied to the whole batch at once: every image i is mixed with the image
+     B - 1 - i (like CollateMixup), with cutmix boxes applied through masks, for the three modes:
+        'batch':    the same parameters for all the batch
+        'pair':     the same parameters for the two images of every pair (i, B - 1 - i), which exchange the same box with cutmix
+        'elem':     different parameters for every image
+    """
+
+    def __init__(self, mixup_alpha: float = 1., cutmix_alpha: float = 0., cutmix_minmax: List[float] = None,
+                 prob: float = 1.0, switch_prob: float = 0.5,
+                 mode: str = 'batch', correct_lam: bool = True, label_smoothing: float = 0.1, num_classes: int = 1000):
+        """
+        :param mixup_alpha: mixup alpha value, mixup is active if > 0.
+        :param cutmix_alpha: cutmix alpha value, cutmix is active if > 0.
+        :param cutmix_minmax: cutmix min/max image ratio, cutmix is active and uses this vs alpha if not None.
+        :param prob: probability of applying mixup or cutmix per batch or element
+        :param switch_prob: probability of switching to cutmix instead of mixup when both are active
+        :param mode: how to apply mixup/cutmix params (per 'batch', 'pair' (pair of elements), 'elem' (element)
+        :param correct_lam: apply lambda correction when cutmix bbox clipped by image borders
+        :param label_smoothing: apply label smoothing to the mixed target tensor
+        :param num_classes: number of classes for target
+        """
+        if mode not in ('batch', 'pair', 'elem'):
+            raise IllegalDatasetParameterException(f"Unsupported mode: {mode}, expected 'batch', 'pair' or 'elem'")
+        if mixup_alpha <= 0. and cutmix_alpha <= 0. and cutmix_minmax is None:
+            raise IllegalDatasetParameterException("One of mixup_alpha > 0., cutmix_alpha > 0., cutmix_minmax not None should be true.")
+        self.mixup_alpha = mixup_alpha
+        self.cutmix_alpha = cutmix_alpha
+        self.cutmix_minmax = cutmix_minmax
+        if self.cutmix_minmax is not None:
+            assert len(self.cutmix_minmax) == 2
+            # force cutmix alpha == 1.0 when minmax active to keep logic simple & safe
+            self.cutmix_alpha = 1.0
+        self.mix_prob = prob
+        self.switch_prob = switch_prob
+        self.label_smoothing = label_smoothing
+        self.num_classes = num_classes
+        self.mode = mode
+        self.correct_lam = correct_lam  # correct lambda based on clipped area for cutmix
+        self.mixup_enabled = True  # set to false to disable mixing (intended tp be set by train loop)
+
+    def _sample_params(self, n: int, device: torch.device):
+        """
+        Draw the mixing parameters of n elements on the device, like CollateMixup._params_per_elem
+
+        :return: lambda values, and flags indicating use of cutmix (tensors of shape [n])
+        """
+        lam = torch.ones(n, device=device)
+        use_cutmix = torch.zeros(n, dtype=torch.bool, device=device)
+        if not self.mixup_enabled:
+            return lam, use_cutmix
+
+        if self.cutmix_alpha > 0.:
+            cutmix_lam = torch.distributions.Beta(torch.tensor(self.cutmix_alpha, device=device), torch.tensor(self.cutmix_alpha, device=device))
+            lam_mix = cutmix_lam.sample((n,))
+            use_cutmix = torch.rand(n, device=device) < self.switch_prob if self.mixup_alpha > 0. else ~use_cutmix
+        if self.mixup_alpha > 0.:
+            mixup_lam = torch.distributions.Beta(torch.tensor(self.mixup_alpha, device=device), torch.tensor(self.mixup_alpha, device=device))
+            lam_mix = torch.where(use_cutmix, lam_mix, mixup_lam.sample((n,))) if self.cutmix_alpha > 0. else mixup_lam.sample((n,))
+
+        apply = torch.rand(n, device=device) < self.mix_prob
+        return torch.where(apply, lam_mix.float(), lam), use_cutmix & apply
+
+    def _sample_boxes(self, lam: torch.Tensor, height: int, width: int):
+        """
+        Draw a cutmix box for every lambda value, like cutmix_bbox_and_lam
+
+        :return: boxes (yl, yh, xl, xh) as tensors of shape [n], and the corrected lambda values
+        """
+        n, device = len(lam), lam.device
+        if self.cutmix_minmax is not None:
+            low, high = self.cutmix_minmax
+            cut_h = (int(height * low) + torch.rand(n, device=device) * (int(height * high) - int(height * low))).floor()
+            cut_w = (int(width * low) + torch.rand(n, device=device) * (int(width * high) - int(width * low))).floor()
+            yl = (torch.rand(n, device=device) * (height - cut_h)).floor()
+            xl = (torch.rand(n, device=device) * (width - cut_w)).floor()
+            yh, xh = yl + cut_h, xl + cut_w
+        else:
+            ratio = torch.sqrt(1 - lam)
+            half_cut_h, half_cut_w = (height * ratio).floor().div(2).floor(), (width * ratio).floor().div(2).floor()
+            cy = (torch.rand(n, device=device) * height).floor()
+            cx = (torch.rand(n, device=device) * width).floor()
+            yl, yh = (cy - half_cut_h).clamp(0, height), (cy + half_cut_h).clamp(0, height)
+            xl, xh = (cx - half_cut_w).clamp(0, width), (cx + half_cut_w).clamp(0, width)
+
+        if self.correct_lam or self.cutmix_minmax is not None:
+            lam = 1. - (yh - yl) * (xh - xl) / float(height * width)
+        return (yl, yh, xl, xh), lam
+
+    def __call__(self, inputs: torch.Tensor, targets: torch.Tensor, batch_idx: int):
+        batch_size, device = inputs.shape[0], inputs.device
+        height, width = inputs.shape[-2:]
+
+        # PARAMETERS OF EVERY ELEMENT OF THE BATCH
+        n_params = {'batch': 1, 'pair': (batch_size + 1) // 2, 'elem': batch_size}[self.mode]
+        lam, use_cutmix = self._sample_params(n_params, device)
+        (yl, yh, xl, xh), cutmix_lam = self._sample_boxes(lam, height, width)
+        lam = torch.where(use_cutmix, cutmix_lam, lam)
+        params = [lam, use_cutmix, yl, yh, xl, xh]
+        if self.mode == 'batch':
+            params = [param.expand(batch_size) for param in params]
+        elif self.mode == 'pair':
+            # THE SECOND ELEMENT OF EVERY PAIR (i, B - 1 - i) USES THE PARAMETERS OF THE FIRST ONE
+            params = [torch.cat([param, param[:batch_size // 2].flip(0)]) for param in params]
+        lam, use_cutmix, yl, yh, xl, xh = params
+
+        # MIXUP WHERE THERE IS NO CUTMIX, AND PASTE OF THE CUTMIX BOXES THROUGH MASKS
+        inputs = inputs if inputs.is_floating_point() else inputs.float()
+        flipped_inputs = inputs.flip(0)
+        mixup_lam = torch.where(use_cutmix, torch.ones_like(lam), lam).view(-1, 1, 1, 1).to(inputs.dtype)
+        mixed = inputs * mixup_lam + flipped_inputs * (1 - mixup_lam)
+
+        rows = torch.arange(height, device=device).view(1, -1, 1)
+        cols = torch.arange(width, device=device).view(1, 1, -1)
+        in_box = (rows >= yl.view(-1, 1, 1)) & (rows < yh.view(-1, 1, 1)) & (cols >= xl.view(-1, 1, 1)) & (cols < xh.view(-1, 1, 1))
+        in_box &= use_cutmix.view(-1, 1, 1)
+        mixed = torch.where(in_box.unsqueeze(1), flipped_inputs, mixed)
+
+        targets = mixup_target(targets, self.num_classes, lam.unsqueeze(1), self.label_smoothing, device=device)
+        return mixed, targets
@@ -22,6 +22,7 @@ class BaseKeypointsDataset(Dataset):
         target_generator: Callable,
         transforms: List[KeypointTransform],
         min_instance_area: float,
+        fuse_affine_transforms: bool = False,
     ):
         """
 
@@ -29,10 +30,12 @@ class BaseKeypointsDataset(Dataset):
             See DEKRTargetsGenerator for an example.
         :param transforms: Transforms to be applied to the image & keypoints
         :param min_instance_area: Minimum area of an instance to be included in the dataset
+        :param fuse_affine_transforms: If True, consecutive geometric transforms (resize, pad, flips, random affine) are applied
+            as a single affine warp (see KeypointsCompose).
         """
         super().__init__()
         self.target_generator = target_generator
-        self.transforms = KeypointsCompose(transforms)
+        self.transforms = KeypointsCompose(transforms, fuse_affine_transforms=fuse_affine_transforms)
         self.min_instance_area = min_instance_area
 
     @abc.abstractmethod
@@ -1,5 +1,5 @@
 import os
-from typing import Tuple, List, Mapping, Any, Dict
+from typing import Tuple, List, Mapping, Any, Dict, Optional
 
 import cv2
 import numpy as np
@@ -10,6 +10,7 @@ from super_gradients.common.abstractions.abstract_logger import get_logger
 from super_gradients.common.decorators.factory_decorator import resolve_param
 from super_gradients.common.factories.target_generator_factory import TargetGeneratorsFactory
 from super_gradients.common.factories.transforms_factory import TransformsFactory
+from super_gradients.training.datasets.lazy_coco import LazyCOCO
 from super_gradients.training.datasets.pose_estimation_datasets.base_keypoints import BaseKeypointsDataset
 from super_gradients.training.transforms.keypoint_transforms import KeypointTransform
 
@@ -33,6 +34,9 @@ class COCOKeypointsDataset(BaseKeypointsDataset):
         target_generator,
         transforms: List[KeypointTransform],
         min_instance_area: float,
+        lazy_coco: bool = False,
+        coco_sidecar_dir: Optional[str] = None,
+        fuse_affine_transforms: bool = False,
     ):
         """
 
@@ -45,13 +49,24 @@ class COCOKeypointsDataset(BaseKeypointsDataset):
             See DEKRTargetsGenerator for an example.
         :param transforms: Transforms to be applied to the image & keypoints
         :param min_instance_area: Minimum area of an instance to be included in the dataset
+        :param lazy_coco: If True, the json is loaded with LazyCOCO instead of pycocotools.COCO, which is faster and uses less memory
+            on large annotation files: only the indexes used by the dataset are built.
+        :param coco_sidecar_dir: If not None, the json parsed by LazyCOCO is saved in this directory, and memory-mapped by the next runs
+            (and the other DDP ranks) instead of being parsed again. Implies lazy_coco=True.
+        :param fuse_affine_transforms: If True, consecutive geometric transforms (resize, pad, flips, random affine) are applied
+            as a single affine warp (see KeypointsCompose).
         """
-        super().__init__(transforms=transforms, target_generator=target_generator, min_instance_area=min_instance_area)
+        super().__init__(
+            transforms=transforms, target_generator=target_generator, min_instance_area=min_instance_area, fuse_affine_transforms=fuse_affine_transforms
+        )
         self.root = data_dir
         self.images_dir = os.path.join(data_dir, images_dir)
         self.json_file = os.path.join(data_dir, json_file)
 
-        coco = COCO(self.json_file)
+        if lazy_coco or coco_sidecar_dir is not None:
+            coco = LazyCOCO(self.json_file, sidecar_dir=coco_sidecar_dir)
+        else:
+            coco = COCO(self.json_file)
         if len(coco.dataset["categories"]) != 1:
             raise ValueError("Dataset must contain exactly one category")
 
@@ -1,7 +1,9 @@
-from typing import Tuple
+from typing import Tuple, Union
 
 import cv2
 import numpy as np
+import torch
+import torch.nn.functional as F
 from torch import Tensor
 
 
@@ -58,31 +60,29 @@ class DEKRTargetsGenerator:
         :param joints: [Num Instances, Num Joints, 3] Last channel represents (x, y, visibility)
         :return: [Num Instances, Num Joints + 1, 3]
         """
-        augmented_joints = []
-        num_joints = joints.shape[1]
-        num_joints_with_center = num_joints + 1
-
-        for keypoints in joints:
-            # Computing a center point for each person
-            visible_keypoints = keypoints[:, 2] > 0
-            joints_sum = np.sum(keypoints[:, :2] * np.expand_dims(visible_keypoints, -1), axis=0)
-            num_vis_joints = np.count_nonzero(visible_keypoints)
-            if num_vis_joints == 0:
-                raise ValueError("No visible joints found in instance. ")
-
-            keypoints_with_center = np.zeros((num_joints_with_center, 3))
-            keypoints_with_center[0:num_joints] = keypoints
-            keypoints_with_center[-1, :2] = joints_sum / num_vis_joints
-            keypoints_with_center[-1, 2] = 1
-
-            augmented_joints.append(keypoints_with_center)
-
-        joints = np.array(augmented_joints, dtype=np.float32).reshape((-1, num_joints_with_center, 3))
-        return joints
+        num_instances, num_joints, _ = joints.shape
 
-    def __call__(self, image: Tensor, joints: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # Computing a center point for each person
+        visible_keypoints = joints[:, :, 2] > 0
+        num_vis_joints = np.count_nonzero(visible_keypoints, axis=1)
+        if (num_vis_joints == 0).any():
+            raise ValueError("No visible joints found in instance. ")
+        joints_sum = np.sum(joints[:, :, :2] * np.expand_dims(visible_keypoints, -1), axis=1)
+
+        augmented_joints = np.zeros((num_instances, num_joints + 1, 3), dtype=np.float32)
+        augmented_joints[:, :num_joints] = joints
+        augmented_joints[:, -1, :2] = joints_sum / np.expand_dims(num_vis_joints, -1)
+        augmented_joints[:, -1, 2] = 1
+        return augmented_joints
+
+    def __call__(
+        self, image: Union[np.ndarray, Tensor], joints: Union[np.ndarray, Tensor], mask: Union[np.ndarray, Tensor]
+    ) -> Tuple[Union[np.ndarray, Tensor], Union[np.ndarray, Tensor], Union[np.ndarray, Tensor], Union[np.ndarray, Tensor]]:
         """
         Encode the keypoints into dense targets that participate in loss computation.
+        When joints is a torch tensor, the targets are computed with torch on the device of the joints (see encode_torch),
+         e.g. on GPU after moving the joints and the mask to the device.
+
         :param image: Image tensor [3, H, W]
         :param joints: [Instances, NumJoints, 3]
         :param mask: [H,W] A mask that indicates which pixels should be included (1) or which one should be excluded (0) from loss computation.
@@ -98,8 +98,8 @@ class DEKRTargetsGenerator:
         if image.shape[1] % self.output_stride != 0 or image.shape[2] % self.output_stride != 0:
             raise ValueError("Image shape should be divisible by output stride")
 
-        num_instances, num_joints, _ = joints.shape
-        num_joints_with_center = num_joints + 1
+        if isinstance(joints, Tensor):
+            return self.encode_torch(joints, mask)
 
         joints, area = self.sort_joints_by_area(joints)
         joints = self.augment_with_center_joint(joints)
@@ -108,90 +108,12 @@ class DEKRTargetsGenerator:
         rows, cols = mask.shape
         output_rows, output_cols = rows // self.output_stride, cols // self.output_stride
 
-        heatmaps = np.zeros(
-            shape=(num_joints_with_center, output_rows, output_cols),
-            dtype=np.float32,
-        )
-
-        ignored_hms = 2 * np.ones(
-            shape=(num_joints_with_center, output_rows, output_cols),
-            dtype=np.float32,
-        )  # Start with 2 in all places
-
-        offset_map = np.zeros(
-            (num_joints * 2, output_rows, output_cols),
-            dtype=np.float32,
-        )
-        offset_weight = np.zeros(
-            (num_joints * 2, output_rows, output_cols),
-            dtype=np.float32,
-        )
-
-        sx = output_cols / cols
-        sy = output_rows / rows
         joints = joints.copy()
-        joints[:, :, 0] *= sx
-        joints[:, :, 1] *= sy
-
-        for person_id, p in enumerate(joints):
-            for idx, pt in enumerate(p):
-                if idx < num_joints:  # Last joint index is object center
-                    sigma = self.sigma
-                else:
-                    sigma = self.center_sigma
-
-                if pt[2] > 0:
-                    x, y = pt[0], pt[1]
-                    if x < 0 or y < 0 or x >= output_cols or y >= output_rows:
-                        continue
-
-                    ul = int(np.floor(x - 3 * sigma - 1)), int(np.floor(y - 3 * sigma - 1))
-                    br = int(np.ceil(x + 3 * sigma + 1)), int(np.ceil(y + 3 * sigma + 1))
-
-                    aa, bb = max(0, ul[1]), min(br[1], output_rows)
-                    cc, dd = max(0, ul[0]), min(br[0], output_cols)
-
-                    joint_rg = np.zeros((bb - aa, dd - cc), dtype=np.float32)
-                    for sy in range(aa, bb):
-                        for sx in range(cc, dd):
-                            # EK: Note we round x/y values here to obtain clear peak in the center of odd-sized heatmap
-                            # joint_rg[sy - aa, sx - cc] = self.get_heat_val(sigma, sx, sy, x, y)
-                            joint_rg[sy - aa, sx - cc] = self.get_heat_val(sigma, sx, sy, int(x), int(y))
-
-                    # It is important for RFL loss to have 1.0 in heatmap. since 0.9999 would be interpreted as negative pixel
-                    joint_rg[joint_rg.shape[0] // 2, joint_rg.shape[1] // 2] = 1
-
-                    heatmaps[idx, aa:bb, cc:dd] = np.maximum(heatmaps[idx, aa:bb, cc:dd], joint_rg)
-                    # print(heatmaps[-1, 0, 0])
-                    ignored_hms[idx, aa:bb, cc:dd] = 1.0
-
-        for person_id, p in enumerate(joints):
-            ct_x = int(p[-1, 0])
-            ct_y = int(p[-1, 1])
-            ct_v = int(p[-1, 2])
-            if ct_v < 1 or ct_x < 0 or ct_y < 0 or ct_x >= output_cols or ct_y >= output_rows:
-                continue
-
-            for idx, pt in enumerate(p[:-1]):
-                if pt[2] > 0:
-                    x, y = pt[0], pt[1]
-                    if x < 0 or y < 0 or x >= output_cols or y >= output_rows:
-                        continue
-
-                    start_x = max(int(ct_x - self.offset_radius), 0)
-                    start_y = max(int(ct_y - self.offset_radius), 0)
-                    end_x = min(int(ct_x + self.offset_radius), output_cols)
-                    end_y = min(int(ct_y + self.offset_radius), output_rows)
-
-                    for pos_x in range(start_x, end_x):
-                        for pos_y in range(start_y, end_y):
-                            offset_x = pos_x - x
-                            offset_y = pos_y - y
-
-                            offset_map[idx * 2, pos_y, pos_x] = offset_x
-                            offset_map[idx * 2 + 1, pos_y, pos_x] = offset_y
-                            offset_weight[idx * 2, pos_y, pos_x] = 1.0 / np.sqrt(area[person_id])
-                            offset_weight[idx * 2 + 1, pos_y, pos_x] = 1.0 / np.sqrt(area[person_id])
+        joints[:, :, 0] *= output_cols / cols
+        joints[:, :, 1] *= output_rows / rows
+
+        heatmaps, ignored_hms = self._get_heatmaps(joints, output_rows, output_cols)
+        offset_map, offset_weight = self._get_offsets(joints, area, output_rows, output_cols)
 
         ignored_hms[ignored_hms == 2] = self.bg_weight
 
@@ -200,3 +122,217 @@ class DEKRTargetsGenerator:
         mask = mask * ignored_hms
 
         return heatmaps, mask, offset_map, offset_weight
+
+    def _get_heatmaps(self, joints: np.ndarray, output_rows: int, output_cols: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Paint a gaussian patch around every visible joint (and center) of every instance at once.
+        The patches are max-reduced into the heatmaps, and the pixels they cover get a weight of 1 (2 elsewhere).
+
+        :param joints: [Num Instances, Num Joints + 1, 3] Joints sorted by area, with the center joint, at the resolution of the heatmaps
+        :return: Tuple of (heatmaps, ignored_hms), both of shape [Num Joints + 1, output_rows, output_cols]
+        """
+        num_joints_with_center = joints.shape[1]
+        heatmaps = np.zeros((num_joints_with_center, output_rows, output_cols), dtype=np.float32)
+        ignored_hms = np.full((num_joints_with_center, output_rows, output_cols), 2, dtype=np.float32)
+
+        x, y = joints[:, :, 0], joints[:, :, 1]
+        valid = (joints[:, :, 2] > 0) & (x >= 0) & (y >= 0) & (x < output_cols) & (y < output_rows)
+        _, joint_ids = np.nonzero(valid)
+        if len(joint_ids) == 0:
+            return heatmaps, ignored_hms
+
+        sigmas = np.where(joint_ids < num_joints_with_center - 1, self.sigma, self.center_sigma)
+        xs, ys = x[valid].astype(np.float64), y[valid].astype(np.float64)
+        top = np.maximum(np.floor(ys - 3 * sigmas - 1), 0).astype(np.int64)
+        bottom = np.minimum(np.ceil(ys + 3 * sigmas + 1), output_rows).astype(np.int64)
+        left = np.maximum(np.floor(xs - 3 * sigmas - 1), 0).astype(np.int64)
+        right = np.minimum(np.ceil(xs + 3 * sigmas + 1), output_cols).astype(np.int64)
+
+        patch_size = int(np.ceil(6 * max(self.sigma, self.center_sigma) + 4))
+        rows, rows_valid = _get_patch_positions(top, bottom, patch_size)
+        cols, cols_valid = _get_patch_positions(left, right, patch_size)
+
+        # EK: Note we round x/y values here to obtain clear peak in the center of odd-sized heatmap
+        squared_distances = ((rows - np.floor(ys)[:, None]) ** 2)[:, :, None] + ((cols - np.floor(xs)[:, None]) ** 2)[:, None, :]
+        values = np.exp(-squared_distances / (2 * sigmas[:, None, None] ** 2))
+        # It is important for RFL loss to have 1.0 in heatmap. since 0.9999 would be interpreted as negative pixel
+        middle_rows, middle_cols = rows == (top + (bottom - top) // 2)[:, None], cols == (left + (right - left) // 2)[:, None]
+        values[middle_rows[:, :, None] & middle_cols[:, None, :]] = 1
+
+        in_patch = rows_valid[:, :, None] & cols_valid[:, None, :]
+        indexes = (joint_ids[:, None, None] * output_rows + rows[:, :, None]) * output_cols + cols[:, None, :]
+        indexes, values = indexes[in_patch], values[in_patch].astype(np.float32)
+
+        np.maximum.at(heatmaps.reshape(-1), indexes, values)
+        ignored_hms.reshape(-1)[indexes] = 1.0
+        return heatmaps, ignored_hms
+
+    def _get_offsets(self, joints: np.ndarray, area: np.ndarray, output_rows: int, output_cols: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode the offsets from the pixels around the center of every instance to its visible joints, for all the instances at once.
+        When the regions of several instances overlap, the offsets of the instance with the smallest area are kept
+         (i.e. the last one, since the instances are sorted by descending area).
+
+        :param joints: [Num Instances, Num Joints + 1, 3] Joints sorted by area, with the center joint, at the resolution of the heatmaps
+        :param area: [Num Instances] Area of every instance, in the resolution of the input image
+        :return: Tuple of (offset_map, offset_weight), both of shape [Num Joints * 2, output_rows, output_cols]
+        """
+        num_joints = joints.shape[1] - 1
+        offset_map = np.zeros((num_joints * 2, output_rows, output_cols), dtype=np.float32)
+        offset_weight = np.zeros((num_joints * 2, output_rows, output_cols), dtype=np.float32)
+
+        centers = np.trunc(joints[:, -1, :3]).astype(np.int64)
+        ct_x, ct_y, ct_v = centers[:, 0], centers[:, 1], centers[:, 2]
+        valid_centers = (ct_v >= 1) & (ct_x >= 0) & (ct_y >= 0) & (ct_x < output_cols) & (ct_y < output_rows)
+
+        x, y = joints[:, :-1, 0], joints[:, :-1, 1]
+        valid = valid_centers[:, None] & (joints[:, :-1, 2] > 0) & (x >= 0) & (y >= 0) & (x < output_cols) & (y < output_rows)
+        instance_ids, joint_ids = np.nonzero(valid)
+        if len(joint_ids) == 0:
+            return offset_map, offset_weight
+
+        ct_x, ct_y = ct_x[instance_ids], ct_y[instance_ids]
+        top = np.maximum(np.trunc(ct_y - self.offset_radius), 0).astype(np.int64)
+        bottom = np.minimum(np.trunc(ct_y + self.offset_radius), output_rows).astype(np.int64)
+        left = np.maximum(np.trunc(ct_x - self.offset_radius), 0).astype(np.int64)
+        right = np.minimum(np.trunc(ct_x + self.offset_radius), output_cols).astype(np.int64)
+
+        patch_size = int(2 * self.offset_radius) + 2
+        rows, rows_valid = _get_patch_positions(top, bottom, patch_size)
+        cols, cols_valid = _get_patch_positions(left, right, patch_size)
+        in_patch = rows_valid[:, :, None] & cols_valid[:, None, :]
+        pos_y, pos_x = np.broadcast_to(rows[:, :, None], in_patch.shape)[in_patch], np.broadcast_to(cols[:, None, :], in_patch.shape)[in_patch]
+        write_ids = np.broadcast_to(np.arange(len(joint_ids))[:, None, None], in_patch.shape)[in_patch]
+
+        # Writes are ranked in the order of the instances, and only the last write of every pixel is kept
+        indexes = (joint_ids[write_ids] * output_rows + pos_y) * output_cols + pos_x
+        last_write = np.full(num_joints * output_rows * output_cols, -1, dtype=np.int64)
+        np.maximum.at(last_write, indexes, np.arange(len(indexes)))
+        kept = last_write[indexes] == np.arange(len(indexes))
+        write_ids, pos_y, pos_x = write_ids[kept], pos_y[kept], pos_x[kept]
+        joint_ids, instance_ids = joint_ids[write_ids], instance_ids[write_ids]
+
+        weights = 1.0 / np.sqrt(area[instance_ids]).astype(np.float64)
+        offset_map[joint_ids * 2, pos_y, pos_x] = pos_x - x[instance_ids, joint_ids].astype(np.float64)
+        offset_map[joint_ids * 2 + 1, pos_y, pos_x] = pos_y - y[instance_ids, joint_ids].astype(np.float64)
+        offset_weight[joint_ids * 2, pos_y, pos_x] = weights
+        offset_weight[joint_ids * 2 + 1, pos_y, pos_x] = weights
+        return offset_map, offset_weight
+
+    def encode_torch(self, joints: Tensor, mask: Tensor) -> Tuple[Tensor, Tensor, Tensor, Tensor]:
+        """
+        Torch implementation of the targets encoding, computed on the device of the joints (e.g. on GPU after moving a sample to the device).
+        The targets are the same as the ones of the numpy implementation, up to floating point precision.
+        Requires torch>=1.12 (scatter_reduce).
+
+        :param joints: [Instances, NumJoints, 3]
+        :param mask: [H,W] A mask that indicates which pixels should be included (1) or which one should be excluded (0) from loss computation.
+        :return: Tuple of (heatmap, mask, offset, offset_weight), see __call__
+        """
+        device = joints.device
+        joints = joints.float()
+        area = (joints[:, :, 0].max(dim=-1)[0] - joints[:, :, 0].min(dim=-1)[0]) * (joints[:, :, 1].max(dim=-1)[0] - joints[:, :, 1].min(dim=-1)[0])
+        order = torch.argsort(-area)
+        joints, area = joints[order], area[order]
+
+        visible_keypoints = joints[:, :, 2] > 0
+        num_vis_joints = visible_keypoints.sum(dim=1, keepdim=True)
+        if (num_vis_joints == 0).any():
+            raise ValueError("No visible joints found in instance. ")
+        centers = (joints[:, :, :2] * visible_keypoints[:, :, None]).sum(dim=1) / num_vis_joints
+        joints = torch.cat([joints, torch.cat([centers, torch.ones_like(centers[:, :1])], dim=1)[:, None]], dim=1)
+
+        rows, cols = mask.shape
+        output_rows, output_cols = rows // self.output_stride, cols // self.output_stride
+        joints[:, :, 0] *= output_cols / cols
+        joints[:, :, 1] *= output_rows / rows
+        num_joints_with_center = joints.shape[1]
+        num_joints = num_joints_with_center - 1
+
+        # Heatmaps: gaussian patches of all the visible joints, max-reduced
+        heatmaps = torch.zeros((num_joints_with_center, output_rows, output_cols), dtype=torch.float32, device=device)
+        ignored_hms = torch.full((num_joints_with_center, output_rows, output_cols), 2.0, dtype=torch.float32, device=device)
+        x, y = joints[:, :, 0], joints[:, :, 1]
+        valid = (joints[:, :, 2] > 0) & (x >= 0) & (y >= 0) & (x < output_cols) & (y < output_rows)
+        _, joint_ids = torch.nonzero(valid, as_tuple=True)
+        if len(joint_ids):
+            sigmas = torch.where(joint_ids < num_joints, self.sigma, self.center_sigma).double()
+            xs, ys = x[valid].double(), y[valid].double()
+            top = torch.floor(ys - 3 * sigmas - 1).clamp(min=0).long()
+            bottom = torch.ceil(ys + 3 * sigmas + 1).clamp(max=output_rows).long()
+            left = torch.floor(xs - 3 * sigmas - 1).clamp(min=0).long()
+            right = torch.ceil(xs + 3 * sigmas + 1).clamp(max=output_cols).long()
+
+            patch_size = int(np.ceil(6 * max(self.sigma, self.center_sigma) + 4))
+            patch_rows, rows_valid = _get_patch_positions_torch(top, bottom, patch_size)
+            patch_cols, cols_valid = _get_patch_positions_torch(left, right, patch_size)
+            squared_distances = ((patch_rows - torch.floor(ys)[:, None]) ** 2)[:, :, None] + ((patch_cols - torch.floor(xs)[:, None]) ** 2)[:, None, :]
+            values = torch.exp(-squared_distances / (2 * sigmas[:, None, None] ** 2)).float()
+            middle_rows, middle_cols = patch_rows == (top + (bottom - top) // 2)[:, None], patch_cols == (left + (right - left) // 2)[:, None]
+            values[middle_rows[:, :, None] & middle_cols[:, None, :]] = 1
+
+            in_patch = rows_valid[:, :, None] & cols_valid[:, None, :]
+            indexes = ((joint_ids[:, None, None] * output_rows + patch_rows[:, :, None]) * output_cols + patch_cols[:, None, :])[in_patch]
+            heatmaps.view(-1).scatter_reduce_(0, indexes, values[in_patch], reduce="amax")
+            ignored_hms.view(-1)[indexes] = 1.0
+        ignored_hms[ignored_hms == 2] = self.bg_weight
+
+        # Offsets: from the pixels around every center to the visible joints, the instances with the smallest area written last
+        offset_map = torch.zeros((num_joints * 2, output_rows, output_cols), dtype=torch.float32, device=device)
+        offset_weight = torch.zeros((num_joints * 2, output_rows, output_cols), dtype=torch.float32, device=device)
+        ct_x, ct_y, ct_v = torch.trunc(joints[:, -1, :3]).long().unbind(dim=1)
+        valid_centers = (ct_v >= 1) & (ct_x >= 0) & (ct_y >= 0) & (ct_x < output_cols) & (ct_y < output_rows)
+        x, y = joints[:, :-1, 0], joints[:, :-1, 1]
+        valid = valid_centers[:, None] & (joints[:, :-1, 2] > 0) & (x >= 0) & (y >= 0) & (x < output_cols) & (y < output_rows)
+        instance_ids, joint_ids = torch.nonzero(valid, as_tuple=True)
+        if len(joint_ids):
+            ct_x, ct_y = ct_x[instance_ids], ct_y[instance_ids]
+            top = torch.trunc(ct_y - self.offset_radius).clamp(min=0).long()
+            bottom = torch.trunc(ct_y + self.offset_radius).clamp(max=output_rows).long()
+            left = torch.trunc(ct_x - self.offset_radius).clamp(min=0).long()
+            right = torch.trunc(ct_x + self.offset_radius).clamp(max=output_cols).long()
+
+            patch_size = int(2 * self.offset_radius) + 2
+            patch_rows, rows_valid = _get_patch_positions_torch(top, bottom, patch_size)
+            patch_cols, cols_valid = _get_patch_positions_torch(left, right, patch_size)
+            in_patch = rows_valid[:, :, None] & cols_valid[:, None, :]
+            pos_y, pos_x = patch_rows[:, :, None].expand(in_patch.shape)[in_patch], patch_cols[:, None, :].expand(in_patch.shape)[in_patch]
+            write_ids = torch.arange(len(joint_ids), device=device)[:, None, None].expand(in_patch.shape)[in_patch]
+
+            indexes = (joint_ids[write_ids] * output_rows + pos_y) * output_cols + pos_x
+            write_order = torch.arange(len(indexes), device=device)
+            last_write = torch.full((num_joints * output_rows * output_cols,), -1, dtype=torch.long, device=device)
+            last_write.scatter_reduce_(0, indexes, write_order, reduce="amax")
+            kept = last_write[indexes] == write_order
+            write_ids, pos_y, pos_x = write_ids[kept], pos_y[kept], pos_x[kept]
+            joint_ids, instance_ids = joint_ids[write_ids], instance_ids[write_ids]
+
+            weights = 1.0 / torch.sqrt(area[instance_ids])
+            offset_map[joint_ids * 2, pos_y, pos_x] = pos_x - x[instance_ids, joint_ids]
+            offset_map[joint_ids * 2 + 1, pos_y, pos_x] = pos_y - y[instance_ids, joint_ids]
+            offset_weight[joint_ids * 2, pos_y, pos_x] = weights
+            offset_weight[joint_ids * 2 + 1, pos_y, pos_x] = weights
+
+        # Same as cv2.resize with INTER_LINEAR
+        mask = F.interpolate(mask.float()[None, None], size=(output_rows, output_cols), mode="bilinear", align_corners=False)[0, 0]
+        mask = (mask > 0).float() * ignored_hms
+
+        return heatmaps, mask, offset_map, offset_weight
+
+
+def _get_patch_positions(start: np.ndarray, end: np.ndarray, patch_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions covered by patches along one axis, padded to the same size.
+
+    :param start: [Num Patches] First position of every patch
+    :param end: [Num Patches] End (excluded) of every patch, at most start + patch_size
+    :return: Tuple of (positions, valid), both of shape [Num Patches, patch_size], valid being False for the padding positions
+    """
+    positions = start[:, None] + np.arange(patch_size)
+    return positions, positions < end[:, None]
+
+
+def _get_patch_positions_torch(start: Tensor, end: Tensor, patch_size: int) -> Tuple[Tensor, Tensor]:
+    """Torch equivalent of _get_patch_positions."""
+    positions = start[:, None] + torch.arange(patch_size, device=start.device)
+    return positions, positions < end[:, None]
@@ -1,6 +1,9 @@
+import hashlib
 import os
-from typing import Callable, Iterable
+from pathlib import Path
+from typing import Callable, Iterable, Optional
 
+import cv2
 import numpy as np
 import torch
 import torchvision.transforms as transform
@@ -9,8 +12,15 @@ from tqdm import tqdm
 
 from super_gradients.common.decorators.factory_decorator import resolve_param
 from super_gradients.common.factories.transforms_factory import TransformsFactory
+from super_gradients.training.datasets.image_cache import CompressedImageCache
 from super_gradients.training.datasets.sg_dataset import DirectoryDataSet, ListDataset
 
+IMAGENET_MEAN = [.485, .456, .406]
+IMAGENET_STD = [.229, .224, .225]
+
+# BUILT ONCE INSTEAD OF FOR EVERY SAMPLE
+_SAMPLE_TRANSFORM = transform.Compose([transform.ToTensor(), transform.Normalize(IMAGENET_MEAN, IMAGENET_STD)])
+
 
 class SegmentationDataSet(DirectoryDataSet, ListDataset):
 
@@ -19,7 +29,9 @@ class SegmentationDataSet(DirectoryDataSet, ListDataset):
                  targets_sub_directory: str = None,
                  cache_labels: bool = False, cache_images: bool = False,
                  collate_fn: Callable = None, target_extension: str = '.png',
-                 transforms: Iterable = None):
+                 transforms: Iterable = None, cache_dir: str = None, cache_compression: Optional[str] = None,
+                 cache_ram_size_mb: float = 0, cache_num_workers: Optional[int] = None,
+                 numpy_transforms: bool = False, normalize_images: bool = True):
         """
         SegmentationDataSet
             :param root:                        Root folder of the Data Set
@@ -31,12 +43,29 @@ class SegmentationDataSet(DirectoryDataSet, ListDataset):
             :param collate_fn:                  collate_fn func to process batches for the Data Loader
             :param target_extension:            file extension of the targets (default is .png for PASCAL VOC 2012)
             :param transforms:                  transforms to be applied on image and mask
+            :param cache_dir:                   Directory where the compressed images cache is stored (required if cache_compression is set)
+            :param cache_compression:           If not None and cache_images, the decoded images are cached compressed on disk with this
+                                                compression ("zlib", "lz4" or "zstd") instead of being pre-loaded to memory,
+                                                and only the most recently used ones are kept in RAM (see CompressedImageCache)
+            :param cache_ram_size_mb:           Maximum size of the decoded images kept in RAM by every process, in MB (with cache_compression)
+            :param cache_num_workers:           Number of workers used to build the compressed images cache, default to min(8, cpu_count)
+            :param numpy_transforms:            If True, the images and masks are loaded as numpy arrays (RGB uint8 images) and the
+                                                transforms are applied with OpenCV instead of PIL, which is much faster
+            :param normalize_images:            If False, the images are returned as uint8 tensors of shape [3, H, W] instead of being
+                                                normalized in the dataloader workers. They must then be normalized by batch, e.g. on GPU
+                                                with the SegmentationBatchNormalize batch transform (see training_params.batch_transforms)
 
         """
         self.samples_sub_directory = samples_sub_directory
         self.targets_sub_directory = targets_sub_directory
         self.cache_labels = cache_labels
         self.cache_images = cache_images
+        self.cache_dir = cache_dir
+        self.cache_compression = cache_compression
+        self.cache_ram_size_mb = cache_ram_size_mb
+        self.cache_num_workers = min(8, os.cpu_count()) if cache_num_workers is None else cache_num_workers
+        self.numpy_transforms = numpy_transforms
+        self.normalize_images = normalize_images
 
         # CREATE A DIRECTORY DATASET OR A LIST DATASET BASED ON THE list_file INPUT VARIABLE
         if list_file is not None:
@@ -52,25 +81,31 @@ class SegmentationDataSet(DirectoryDataSet, ListDataset):
                                       collate_fn=collate_fn)
 
         self.transforms = transform.Compose(transforms if transforms else [])
+        self.compressed_imgs_cache = self._cache_compressed_images() if self.cache_images and self.cache_compression else None
 
     def __getitem__(self, index):
         sample_path, target_path = self.samples_targets_tuples_list[index]
 
         # TRY TO LOAD THE CACHED IMAGE FIRST
-        if self.cache_images:
+        if self.compressed_imgs_cache is not None:
+            sample = self.compressed_imgs_cache[index]
+            sample = sample if self.numpy_transforms else Image.fromarray(sample)
+        elif self.cache_images:
             sample = self.imgs[index]
         else:
-            sample = self.sample_loader(sample_path)
+            sample = self._load_sample(sample_path)
 
         # TRY TO LOAD THE CACHED LABEL FIRST
         if self.cache_labels:
             target = self.labels[index]
         else:
-            target = self.target_loader(target_path)
+            target = self._load_target(target_path)
 
         # MAKE SURE THE TRANSFORM WORKS ON BOTH IMAGE AND MASK TO ALIGN THE AUGMENTATIONS
         sample, target = self._transform_image_and_mask(sample, target)
 
+        if not self.normalize_images:
+            return self.uint8_sample_transform(sample), self.target_transform(target)
         return self.sample_transform(sample), self.target_transform(target)
 
     @staticmethod
@@ -83,19 +118,38 @@ class SegmentationDataSet(DirectoryDataSet, ListDataset):
         image = Image.open(sample_path).convert('RGB')
         return image
 
+    @staticmethod
+    def numpy_sample_loader(sample_path: str) -> np.ndarray:
+        """
+        numpy_sample_loader - Loads a dataset image from path using OpenCV
+            :param sample_path: The path to the sample image
+            :return:            The loaded image, as an RGB uint8 array of shape [H, W, 3]
+        """
+        # IGNORE THE EXIF ORIENTATION LIKE PIL, SO THAT THE IMAGE STAYS ALIGNED WITH ITS MASK
+        image = cv2.imread(sample_path, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+        if image is None:
+            raise FileNotFoundError(f'Could not read the image {sample_path}')
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
     @staticmethod
     def sample_transform(image):
         """
         sample_transform - Transforms the sample image
 
-            :param image:  The input image to transform
+            :param image:  The input image to transform (PIL image, or RGB uint8 array of shape [H, W, 3])
             :return:       The transformed image
         """
-        sample_transform = transform.Compose([
-            transform.ToTensor(),
-            transform.Normalize([.485, .456, .406], [.229, .224, .225])])
+        return _SAMPLE_TRANSFORM(image)
+
+    @staticmethod
+    def uint8_sample_transform(image) -> torch.Tensor:
+        """
+        uint8_sample_transform - Converts the sample image to a tensor without normalizing it (see normalize_images)
 
-        return sample_transform(image)
+            :param image:  The input image to transform (PIL image, or RGB uint8 array of shape [H, W, 3])
+            :return:       The image as a uint8 tensor of shape [3, H, W]
+        """
+        return torch.from_numpy(np.ascontiguousarray(np.asarray(image).transpose(2, 0, 1)))
 
     @staticmethod
     def target_loader(target_path: str) -> Image:
@@ -117,6 +171,13 @@ class SegmentationDataSet(DirectoryDataSet, ListDataset):
         """
         return torch.from_numpy(np.array(target)).long()
 
+    def _load_sample(self, sample_path: str):
+        return self.numpy_sample_loader(sample_path) if self.numpy_transforms else self.sample_loader(sample_path)
+
+    def _load_target(self, target_path):
+        target = self.target_loader(target_path)
+        return np.asarray(target) if self.numpy_transforms and target is not None else target
+
     def _generate_samples_and_targets(self):
         """
         _generate_samples_and_targets
@@ -130,13 +191,13 @@ class SegmentationDataSet(DirectoryDataSet, ListDataset):
         image_indices_to_remove = []
 
         # CACHE IMAGES INTO MEMORY FOR FASTER TRAINING (WARNING: LARGE DATASETS MAY EXCEED SYSTEM RAM)
-        if self.cache_images:
+        if self.cache_images and not self.cache_compression:
             # CREATE AN EMPTY LIST FOR THE LABELS
             self.imgs = len(self) * [None]
             cached_images_mem_in_gb = 0.
             pbar = tqdm(image_files, desc='Caching images')
             for i, img_path in enumerate(pbar):
-                img = self.sample_loader(img_path)
+                img = self._load_sample(img_path)
                 if img is None:
                     image_indices_to_remove.append(i)
 
@@ -155,7 +216,7 @@ class SegmentationDataSet(DirectoryDataSet, ListDataset):
             missing_labels, found_labels, duplicate_labels = 0, 0, 0
 
             for i, file in enumerate(pbar):
-                labels = self.target_loader(file)
+                labels = self._load_target(file)
 
                 if labels is None:
                     missing_labels += 1
@@ -173,6 +234,28 @@ class SegmentationDataSet(DirectoryDataSet, ListDataset):
             self.label_files = [e for i, e in enumerate(label_files) if i not in image_indices_to_remove]
             self.labels = [e for i, e in enumerate(self.labels) if i not in image_indices_to_remove]
 
+    def _cache_compressed_images(self) -> CompressedImageCache:
+        """
+        _cache_compressed_images - Caches the decoded images compressed on disk, and returns the cache reading them back
+            :return: Compressed images cache, built only once even when many processes (e.g. DDP ranks) create the same dataset
+        """
+        if self.cache_dir is None:
+            raise ValueError('You must specify a cache_dir if you want to cache your images with cache_compression.')
+
+        # THE CACHE IS THE SAME AS LONG AS THE IMAGE FILES ARE THE SAME (REWRITING A FILE CHANGES ITS MODIFICATION TIME)
+        cache_hash = hashlib.sha256()
+        for sample_path, _ in self.samples_targets_tuples_list:
+            sample_stat = os.stat(sample_path)
+            cache_hash.update(f'{sample_path}:{sample_stat.st_size}:{sample_stat.st_mtime_ns}'.encode('utf-8'))
+        cache_path = Path(self.cache_dir) / f'img_cache_{cache_hash.hexdigest()}.{self.cache_compression}.cache'
+
+        CompressedImageCache.build(cache_path, n_images=len(self), load_image_fn=self._load_image_array,
+                                   compression=self.cache_compression, num_workers=self.cache_num_workers)
+        return CompressedImageCache(cache_path, ram_cache_size_mb=self.cache_ram_size_mb)
+
+    def _load_image_array(self, index: int) -> np.ndarray:
+        return np.array(self.sample_loader(self.samples_targets_tuples_list[index][0]))
+
     def _transform_image_and_mask(self, image, mask) -> tuple:
         """
             :param image:           The input image
@@ -1,9 +1,10 @@
-from typing import Dict, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 import torch
 from torchmetrics import Metric
 import super_gradients
 from super_gradients.training.utils import tensor_container_to_device
-from super_gradients.training.utils.detection_utils import compute_detection_matching, compute_detection_metrics
+from super_gradients.training.utils.detection_utils import compute_detection_matching, compute_detection_matching_batched, compute_detection_metrics
+from super_gradients.training.utils.detection_utils import accumulate_detection_matching_histograms, compute_detection_metrics_from_histograms
 from super_gradients.training.utils.detection_utils import DetectionPostPredictionCallback, IouThreshold
 from super_gradients.common.abstractions.abstract_logger import get_logger
 
@@ -33,6 +34,15 @@ class DetectionMetrics(Metric):
                             before returning the value at the step. (default=False)
         accumulate_on_cpu:     Run on CPU regardless of device used in other parts.
                             This is to avoid "CUDA out of memory" that might happen on GPU (default False)
+        batched_matching:   Match the predictions and targets of the whole batch at once with tensor ops, instead of
+                            iterating over every image and every (prediction, target) pair. Results are identical. (default False)
+        n_score_bins:       When set, accumulate per class and IoU threshold TP/FP counts binned by confidence score into
+                            n_score_bins bins, instead of keeping the matching info of every prediction until compute().
+                            Memory is constant, the distributed sync is a single all_reduce, and the metrics are exact
+                            up to a score quantization of 1 / n_score_bins. (default None, i.e. keep every prediction)
+        tensor_dist_sync:   When in distributed mode, synchronize the matching info with torch.distributed.all_gather on
+                            flattened and padded device tensors, instead of pickling it with all_gather_object.
+                            Ignored when n_score_bins is set. (default False)
     """
 
     def __init__(
@@ -46,6 +56,9 @@ class DetectionMetrics(Metric):
         top_k_predictions: int = 100,
         dist_sync_on_step: bool = False,
         accumulate_on_cpu: bool = True,
+        batched_matching: bool = False,
+        n_score_bins: Optional[int] = None,
+        tensor_dist_sync: bool = False,
     ):
         super().__init__(dist_sync_on_step=dist_sync_on_step)
         self.num_cls = num_cls
@@ -71,13 +84,23 @@ class DetectionMetrics(Metric):
         self.denormalize_targets = not normalize_targets
         self.world_size = None
         self.rank = None
-        self.add_state(f"matching_info{self._get_range_str()}", default=[], dist_reduce_fx=None)
+
+        self.n_score_bins = n_score_bins
+        if self.n_score_bins is None:
+            self.add_state(f"matching_info{self._get_range_str()}", default=[], dist_reduce_fx=None)
+        else:
+            histogram_shape = (num_cls, len(self.iou_thresholds), n_score_bins)
+            self.add_state(f"tp_histogram{self._get_range_str()}", default=torch.zeros(histogram_shape, dtype=torch.long), dist_reduce_fx="sum")
+            self.add_state(f"fp_histogram{self._get_range_str()}", default=torch.zeros(histogram_shape, dtype=torch.long), dist_reduce_fx="sum")
+            self.add_state(f"n_targets{self._get_range_str()}", default=torch.zeros(num_cls, dtype=torch.long), dist_reduce_fx="sum")
 
         self.recall_thresholds = torch.linspace(0, 1, 101) if recall_thres is None else recall_thres
         self.score_threshold = score_thres
         self.top_k_predictions = top_k_predictions
 
         self.accumulate_on_cpu = accumulate_on_cpu
+        self.batched_matching = batched_matching
+        self.tensor_dist_sync = tensor_dist_sync
 
     def update(self, preds, target: torch.Tensor, device: str, inputs: torch.tensor, crowd_targets: Optional[torch.Tensor] = None):
         """
@@ -100,7 +123,8 @@ class DetectionMetrics(Metric):
 
         preds = self.post_prediction_callback(preds, device=device)
 
-        new_matching_info = compute_detection_matching(
+        matching_fn = compute_detection_matching_batched if self.batched_matching else compute_detection_matching
+        new_matching_info = matching_fn(
             preds,
             targets,
             height,
@@ -113,13 +137,24 @@ class DetectionMetrics(Metric):
             return_on_cpu=self.accumulate_on_cpu,
         )
 
-        accumulated_matching_info = getattr(self, f"matching_info{self._get_range_str()}")
-        setattr(self, f"matching_info{self._get_range_str()}", accumulated_matching_info + new_matching_info)
+        if self.n_score_bins is None:
+            accumulated_matching_info = getattr(self, f"matching_info{self._get_range_str()}")
+            setattr(self, f"matching_info{self._get_range_str()}", accumulated_matching_info + new_matching_info)
+        elif len(new_matching_info):
+            accumulate_detection_matching_histograms(
+                getattr(self, f"tp_histogram{self._get_range_str()}"),
+                getattr(self, f"fp_histogram{self._get_range_str()}"),
+                getattr(self, f"n_targets{self._get_range_str()}"),
+                *[torch.cat(x, 0) for x in list(zip(*new_matching_info))],
+            )
 
     def compute(self) -> Dict[str, Union[float, torch.Tensor]]:
         """Compute the metrics for all the accumulated results.
         :return: Metrics of interest
         """
+        if self.n_score_bins is not None:
+            return self._compute_from_histograms()
+
         mean_ap, mean_precision, mean_recall, mean_f1 = -1.0, -1.0, -1.0, -1.0
         accumulated_matching_info = getattr(self, f"matching_info{self._get_range_str()}")
 
@@ -148,6 +183,35 @@ class DetectionMetrics(Metric):
             f"F1{self._get_range_str()}": mean_f1,
         }
 
+    def _compute_from_histograms(self) -> Dict[str, Union[float, torch.Tensor]]:
+        """Compute the metrics from the accumulated TP/FP histograms (when n_score_bins is set).
+        :return: Metrics of interest
+        """
+        mean_ap, mean_precision, mean_recall, mean_f1 = -1.0, -1.0, -1.0, -1.0
+        tp_histogram = getattr(self, f"tp_histogram{self._get_range_str()}")
+        fp_histogram = getattr(self, f"fp_histogram{self._get_range_str()}")
+        n_targets = getattr(self, f"n_targets{self._get_range_str()}")
+
+        if n_targets.any() or tp_histogram.any() or fp_histogram.any():
+            # shape (n_class, nb_iou_thresh)
+            ap, precision, recall, f1, unique_classes = compute_detection_metrics_from_histograms(
+                tp_histogram,
+                fp_histogram,
+                n_targets,
+                recall_thresholds=self.recall_thresholds,
+                score_threshold=self.score_threshold,
+                device="cpu" if self.accumulate_on_cpu else self.device,
+            )
+            mean_precision, mean_recall, mean_f1 = precision.mean(), recall.mean(), f1.mean()
+            mean_ap = ap.mean()
+
+        return {
+            f"Precision{self._get_range_str()}": mean_precision,
+            f"Recall{self._get_range_str()}": mean_recall,
+            f"mAP{self._get_range_str()}": mean_ap,
+            f"F1{self._get_range_str()}": mean_f1,
+        }
+
     def _sync_dist(self, dist_sync_fn=None, process_group=None):
         """
         When in distributed mode, stats are aggregated after each forward pass to the metric state. Since these have all
@@ -161,7 +225,20 @@ class DetectionMetrics(Metric):
         if self.rank is None:
             self.rank = torch.distributed.get_rank() if self.is_distributed else -1
 
-        if self.is_distributed:
+        if self.is_distributed and self.n_score_bins is not None:
+            # The histograms have a fixed shape, so they can simply be summed over all the ranks, in a single all_reduce
+            histograms = [getattr(self, attr) for attr in self._reductions.keys()]
+            flat_histograms = torch.cat([histogram.view(-1) for histogram in histograms])
+            torch.distributed.all_reduce(flat_histograms, op=torch.distributed.ReduceOp.SUM, group=process_group)
+            for attr, histogram, reduced_histogram in zip(self._reductions.keys(), histograms, flat_histograms.split([h.numel() for h in histograms])):
+                setattr(self, attr, reduced_histogram.view_as(histogram))
+
+        elif self.is_distributed and self.tensor_dist_sync:
+            matching_info = self._all_gather_matching_info(process_group=process_group)
+            matching_info = tensor_container_to_device(matching_info, device="cpu" if self.accumulate_on_cpu else self.device)
+            setattr(self, f"matching_info{self._get_range_str()}", matching_info)
+
+        elif self.is_distributed:
             local_state_dict = {attr: getattr(self, attr) for attr in self._reductions.keys()}
             gathered_state_dicts = [None] * self.world_size
             torch.distributed.barrier()
@@ -173,6 +250,58 @@ class DetectionMetrics(Metric):
 
             setattr(self, f"matching_info{self._get_range_str()}", matching_info)
 
+    def _all_gather_matching_info(self, process_group=None) -> List[Tuple]:
+        """
+        Gather the matching info of all the ranks with tensor collectives only.
+        The local matching info is flattened into 2 contiguous buffers (one row per prediction, one value per target), the sizes are
+        exchanged first, and then the buffers are padded to the largest size and exchanged with all_gather on the communication device.
+
+        :return: List with one (preds_matched, preds_to_ignore, preds_scores, preds_cls, targets_cls) tuple per rank
+        """
+        backend = torch.distributed.get_backend(process_group)
+        comm_device = torch.device("cuda", torch.cuda.current_device()) if backend == "nccl" else torch.device("cpu")
+        n_iou_thresholds = len(self.iou_thresholds)
+
+        # One row per prediction: (preds_matched[n_iou_thresholds], preds_to_ignore[n_iou_thresholds], score, cls)
+        accumulated_matching_info = getattr(self, f"matching_info{self._get_range_str()}")
+        if len(accumulated_matching_info):
+            preds_matched, preds_to_ignore, preds_scores, preds_cls, targets_cls = [torch.cat(x, 0).to(comm_device) for x in zip(*accumulated_matching_info)]
+            preds_buffer = torch.cat([preds_matched.float(), preds_to_ignore.float(), preds_scores.float().view(-1, 1), preds_cls.float().view(-1, 1)], 1)
+            targets_buffer = targets_cls.float()
+        else:
+            preds_buffer = torch.zeros((0, 2 * n_iou_thresholds + 2), device=comm_device)
+            targets_buffer = torch.zeros(0, device=comm_device)
+
+        local_sizes = torch.tensor([len(preds_buffer), len(targets_buffer)], dtype=torch.long, device=comm_device)
+        gathered_sizes = [torch.zeros_like(local_sizes) for _ in range(self.world_size)]
+        torch.distributed.all_gather(gathered_sizes, local_sizes, group=process_group)
+        gathered_sizes = torch.stack(gathered_sizes).tolist()
+        max_n_preds, max_n_targets = max(n_preds for n_preds, _ in gathered_sizes), max(n_targets for _, n_targets in gathered_sizes)
+
+        padded_preds_buffer = torch.zeros((max_n_preds, preds_buffer.shape[1]), device=comm_device)
+        padded_preds_buffer[: len(preds_buffer)] = preds_buffer
+        padded_targets_buffer = torch.zeros(max_n_targets, device=comm_device)
+        padded_targets_buffer[: len(targets_buffer)] = targets_buffer
+
+        gathered_preds_buffers = [torch.empty_like(padded_preds_buffer) for _ in range(self.world_size)]
+        gathered_targets_buffers = [torch.empty_like(padded_targets_buffer) for _ in range(self.world_size)]
+        torch.distributed.all_gather(gathered_preds_buffers, padded_preds_buffer, group=process_group)
+        torch.distributed.all_gather(gathered_targets_buffers, padded_targets_buffer, group=process_group)
+
+        matching_info = []
+        for (n_preds, n_targets), rank_preds_buffer, rank_targets_buffer in zip(gathered_sizes, gathered_preds_buffers, gathered_targets_buffers):
+            rank_preds_buffer = rank_preds_buffer[:n_preds]
+            matching_info.append(
+                (
+                    rank_preds_buffer[:, :n_iou_thresholds].bool(),
+                    rank_preds_buffer[:, n_iou_thresholds : 2 * n_iou_thresholds].bool(),
+                    rank_preds_buffer[:, -2],
+                    rank_preds_buffer[:, -1],
+                    rank_targets_buffer[:n_targets],
+                )
+            )
+        return matching_info
+
     def _get_range_str(self):
         return "@%.2f" % self.iou_thresholds[0] if not len(self.iou_thresholds) > 1 else "@%.2f:%.2f" % (self.iou_thresholds[0], self.iou_thresholds[-1])
 
@@ -188,6 +317,9 @@ class DetectionMetrics_050(DetectionMetrics):
         top_k_predictions: int = 100,
         dist_sync_on_step: bool = False,
         accumulate_on_cpu: bool = True,
+        batched_matching: bool = False,
+        n_score_bins: Optional[int] = None,
+        tensor_dist_sync: bool = False,
     ):
 
         super().__init__(
@@ -200,6 +332,9 @@ class DetectionMetrics_050(DetectionMetrics):
             top_k_predictions,
             dist_sync_on_step,
             accumulate_on_cpu,
+            batched_matching,
+            n_score_bins,
+            tensor_dist_sync,
         )
 
 
@@ -214,10 +349,24 @@ class DetectionMetrics_075(DetectionMetrics):
         top_k_predictions: int = 100,
         dist_sync_on_step: bool = False,
         accumulate_on_cpu: bool = True,
+        batched_matching: bool = False,
+        n_score_bins: Optional[int] = None,
+        tensor_dist_sync: bool = False,
     ):
 
         super().__init__(
-            num_cls, post_prediction_callback, normalize_targets, 0.75, recall_thres, score_thres, top_k_predictions, dist_sync_on_step, accumulate_on_cpu
+            num_cls,
+            post_prediction_callback,
+            normalize_targets,
+            0.75,
+            recall_thres,
+            score_thres,
+            top_k_predictions,
+            dist_sync_on_step,
+            accumulate_on_cpu,
+            batched_matching,
+            n_score_bins,
+            tensor_dist_sync,
         )
 
 
@@ -232,6 +381,9 @@ class DetectionMetrics_050_095(DetectionMetrics):
         top_k_predictions: int = 100,
         dist_sync_on_step: bool = False,
         accumulate_on_cpu: bool = True,
+        batched_matching: bool = False,
+        n_score_bins: Optional[int] = None,
+        tensor_dist_sync: bool = False,
     ):
 
         super().__init__(
@@ -244,4 +396,7 @@ class DetectionMetrics_050_095(DetectionMetrics):
             top_k_predictions,
             dist_sync_on_step,
             accumulate_on_cpu,
+            batched_matching,
+            n_score_bins,
+            tensor_dist_sync,
         )
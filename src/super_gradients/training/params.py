@@ -21,6 +21,7 @@ DEFAULT_TRAINING_PARAMS = {
     "launch_tensorboard": False,
     "tb_files_user_prompt": False,  # Asks User for Tensorboard Deletion Prompt
     "silent_mode": False,  # Silents the Print outs
+    "log_every_n_steps": 1,  # Running loss and metrics of the train loop are computed (host-device sync) every n steps
     "mixed_precision": False,
     "tensorboard_port": None,
     "save_ckpt_epoch_list": [],  # indices where the ckpt will save automatically
@@ -52,6 +53,11 @@ DEFAULT_TRAINING_PARAMS = {
     "lr_updates": [],
     "clip_grad_norm": None,
     "pre_prediction_callback": None,
+    "batch_transforms": [],
+    "prefetch_to_device": False,
+    "torch_compile": False,
+    "torch_compile_loss": False,
+    "torch_compile_params": {},
     "ckpt_best_name": "ckpt_best.pth",
     "enable_qat": False,
     "qat_params": {
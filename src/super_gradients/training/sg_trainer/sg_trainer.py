@@ -1,5 +1,6 @@
 import inspect
 import os
+import time
 from copy import deepcopy
 from typing import Union, Tuple, Mapping, Dict
 from pathlib import Path
@@ -63,7 +64,7 @@ from super_gradients.training.utils.optimizer_utils import build_optimizer
 from super_gradients.training.utils.utils import fuzzy_idx_in_list
 from super_gradients.training.utils.weight_averaging_utils import ModelWeightAveraging
 from super_gradients.training.metrics import Accuracy, Top5
-from super_gradients.training.utils import random_seed
+from super_gradients.training.utils import random_seed, torch_version_is_greater_or_equal
 from super_gradients.training.utils.checkpoint_utils import (
     get_ckpt_local_path,
     read_ckpt_state_dict,
@@ -83,10 +84,11 @@ from super_gradients.training.utils.callbacks import (
     LRCallbackBase,
 )
 from super_gradients.common.environment.device_utils import device_config
-from super_gradients.training.utils import HpmStruct
+from super_gradients.training.utils import HpmStruct, DevicePrefetcher
 from super_gradients.training.utils.hydra_utils import load_experiment_cfg, add_params_to_cfg
 from omegaconf import OmegaConf
 from super_gradients.common.factories.pre_launch_callbacks_factory import PreLaunchCallbacksFactory
+from super_gradients.common.factories.transforms_factory import TransformsFactory
 
 logger = get_logger(__name__)
 
@@ -144,6 +146,9 @@ class Trainer:
         self.phase_callbacks = None
         self.checkpoint_params = None
         self.pre_prediction_callback = None
+        self.batch_transforms = []
+        self._compiled_net = None
+        self._compiled_criterion = None
 
         # SET THE DEFAULT PROPERTIES
         self.half_precision = False
@@ -400,15 +405,16 @@ class Trainer:
         """
         # SET THE MODEL IN training STATE
         self.net.train()
+        train_batches = DevicePrefetcher(self.train_loader, device_config.device) if self.training_params.prefetch_to_device else self.train_loader
         # THE DISABLE FLAG CONTROLS WHETHER THE PROGRESS BAR IS SILENT OR PRINTS THE LOGS
-        progress_bar_train_loader = tqdm(self.train_loader, bar_format="{l_bar}{bar:10}{r_bar}", dynamic_ncols=True, disable=silent_mode)
+        progress_bar_train_loader = tqdm(train_batches, bar_format="{l_bar}{bar:10}{r_bar}", dynamic_ncols=True, disable=silent_mode)
         progress_bar_train_loader.set_description(f"Train epoch {epoch}")
 
         # RESET/INIT THE METRIC LOGGERS
         self._reset_metrics()
 
         self.train_metrics.to(device_config.device)
-        loss_avg_meter = core_utils.utils.AverageMeter()
+        loss_avg_meter = core_utils.utils.DeviceAverageMeter()
 
         context = PhaseContext(
             epoch=epoch,
@@ -422,12 +428,23 @@ class Trainer:
             train_loader=self.train_loader,
             context_methods=self._get_context_methods(Phase.TRAIN_BATCH_END),
             ddp_silent_mode=self.ddp_silent_mode,
+            batch_transforms=self.batch_transforms,
         )
 
+        # THE COMPILED NET AND CRITERION SHARE THEIR PARAMETERS WITH self.net AND self.criterion, WHICH ARE USED FOR EVERYTHING ELSE
+        # (EMA, CHECKPOINTS, VALIDATION, TEST)
+        train_net = self._compiled_net if self._compiled_net is not None else self.net
+        train_criterion = self._compiled_criterion if self._compiled_criterion is not None else self.criterion
+
         for batch_idx, batch_items in enumerate(progress_bar_train_loader):
+            if self._compiled_net is not None and batch_idx == 0:
+                first_step_start_time = time.perf_counter()
             batch_items = core_utils.tensor_container_to_device(batch_items, device_config.device, non_blocking=True)
             inputs, targets, additional_batch_items = sg_trainer_utils.unpack_batch_items(batch_items)
 
+            for batch_transform in self.batch_transforms:
+                inputs, targets = batch_transform(inputs, targets)
+
             if self.pre_prediction_callback is not None:
                 inputs, targets = self.pre_prediction_callback(inputs, targets, batch_idx)
 
@@ -437,10 +454,10 @@ class Trainer:
             # AUTOCAST IS ENABLED ONLY IF self.training_params.mixed_precision - IF enabled=False AUTOCAST HAS NO EFFECT
             with autocast(enabled=self.training_params.mixed_precision):
                 # FORWARD PASS TO GET NETWORK'S PREDICTIONS
-                outputs = self.net(inputs)
+                outputs = train_net(inputs)
 
                 # COMPUTE THE LOSS FOR BACK PROP + EXTRA METRICS COMPUTED DURING THE LOSS FORWARD PASS
-                loss, loss_log_items = self._get_losses(outputs, targets)
+                loss, loss_log_items = self._get_losses(outputs, targets, criterion=train_criterion)
 
             context.update_context(preds=outputs, loss_log_items=loss_log_items)
             self.phase_callback_handler.on_train_batch_loss_end(context)
@@ -451,25 +468,34 @@ class Trainer:
 
             self._backward_step(loss, epoch, batch_idx, context)
 
-            # COMPUTE THE RUNNING USER METRICS AND LOSS RUNNING ITEMS. RESULT TUPLE IS THEIR CONCATENATION.
-            logging_values = loss_avg_meter.average + get_metrics_results_tuple(self.train_metrics)
-            gpu_memory_utilization = get_gpu_mem_utilization() / 1e9 if torch.cuda.is_available() else 0
+            if self._compiled_net is not None and batch_idx == 0:
+                # THE FIRST STEP OF EVERY EPOCH INCLUDES THE (RE)COMPILATIONS, E.G. AFTER SWITCHING BETWEEN TRAIN AND EVAL MODES
+                if torch.cuda.is_available():
+                    torch.cuda.synchronize()
+                steady_state_start_time = time.perf_counter()
+                if not self.ddp_silent_mode:
+                    first_step_time = steady_state_start_time - first_step_start_time
+                    logger.info(f"torch.compile: first train step of epoch {epoch} took {first_step_time:.2f}s (with compilation)")
 
-            # RENDER METRICS PROGRESS
-            pbar_message_dict = get_train_loop_description_dict(
-                logging_values, self.train_metrics, self.loss_logging_items_names, gpu_mem=gpu_memory_utilization
-            )
+            last_batch_of_loader = batch_idx == len(self.train_loader) - 1
+            last_batch = last_batch_of_loader or (self.max_train_batches is not None and self.max_train_batches - 1 <= batch_idx)
 
-            progress_bar_train_loader.set_postfix(**pbar_message_dict)
+            # THE RUNNING VALUES STAY ON THE DEVICE BETWEEN THE LOGGING STEPS, SO THE HOST DOES NOT WAIT FOR THE DEVICE
+            if (batch_idx + 1) % self.training_params.log_every_n_steps == 0 or last_batch:
+                logging_values, pbar_message_dict = self._get_train_logging_values(loss_avg_meter)
+                progress_bar_train_loader.set_postfix(**pbar_message_dict)
             self.phase_callback_handler.on_train_batch_end(context)
 
             # TODO: ITERATE BY MAX ITERS
             # FOR INFINITE SAMPLERS WE MUST BREAK WHEN REACHING LEN ITERATIONS.
-            if (self._infinite_train_loader and batch_idx == len(self.train_loader) - 1) or (
-                self.max_train_batches is not None and self.max_train_batches - 1 <= batch_idx
-            ):
+            if (self._infinite_train_loader and last_batch_of_loader) or (self.max_train_batches is not None and self.max_train_batches - 1 <= batch_idx):
                 break
 
+        if self._compiled_net is not None and batch_idx > 0 and not self.ddp_silent_mode:
+            # THE LAST STEP ENDS WITH THE COMPUTATION OF THE LOGGING VALUES, WHICH WAITS FOR THE DEVICE
+            steady_state_step_time = (time.perf_counter() - steady_state_start_time) / batch_idx
+            logger.info(f"torch.compile: steady-state train step time of epoch {epoch}: {1000 * steady_state_step_time:.1f}ms")
+
         if not self.ddp_silent_mode:
             self.sg_logger.upload()
 
@@ -479,9 +505,24 @@ class Trainer:
 
         return logging_values
 
-    def _get_losses(self, outputs: torch.Tensor, targets: torch.Tensor) -> Tuple[torch.Tensor, tuple]:
-        # GET THE OUTPUT OF THE LOSS FUNCTION
-        loss = self.criterion(outputs, targets)
+    def _get_train_logging_values(self, loss_avg_meter: core_utils.utils.AverageMeter) -> Tuple[tuple, dict]:
+        """
+        Compute the running loss and metrics of the train loop, which syncs the host with the device
+            :param loss_avg_meter:  Running average of the loss logging items
+            :return: The running loss logging items and metrics, the progress bar message
+        """
+        # COMPUTE THE RUNNING USER METRICS AND LOSS RUNNING ITEMS. RESULT TUPLE IS THEIR CONCATENATION.
+        logging_values = loss_avg_meter.average + get_metrics_results_tuple(self.train_metrics)
+        gpu_memory_utilization = get_gpu_mem_utilization() / 1e9 if torch.cuda.is_available() else 0
+
+        # RENDER METRICS PROGRESS
+        pbar_message_dict = get_train_loop_description_dict(logging_values, self.train_metrics, self.loss_logging_items_names, gpu_mem=gpu_memory_utilization)
+        return logging_values, pbar_message_dict
+
+    def _get_losses(self, outputs: torch.Tensor, targets: torch.Tensor, criterion: nn.Module = None) -> Tuple[torch.Tensor, tuple]:
+        # GET THE OUTPUT OF THE LOSS FUNCTION (self.criterion UNLESS ANOTHER ONE IS GIVEN, E.G. ITS COMPILED VERSION IN THE TRAIN LOOP)
+        criterion = criterion if criterion is not None else self.criterion
+        loss = criterion(outputs, targets)
         if isinstance(loss, tuple):
             loss, loss_logging_items = loss
             # IF ITS NOT A TUPLE THE LOGGING ITEMS CONTAIN ONLY THE LOSS FOR BACKPROP (USER DEFINED LOSS RETURNS SCALAR)
@@ -643,6 +684,25 @@ class Trainer:
         self.ckpt_name = core_utils.get_param(self.training_params, "ckpt_name", "ckpt_latest.pth")
         self._load_checkpoint_to_model()
 
+    def _compile_for_training(self):
+        """
+        Compile the forward pass of the net (and the criterion when training_params.torch_compile_loss is set) with torch.compile,
+        when training_params.torch_compile is set. The compiled modules wrap self.net and self.criterion and share their parameters,
+        so the EMA model, the checkpoints and the validation keep using the uncompiled modules.
+        """
+        self._compiled_net, self._compiled_criterion = None, None
+        if not core_utils.get_param(self.training_params, "torch_compile", False):
+            return
+        if not torch_version_is_greater_or_equal(2, 0):
+            logger.warning("torch_compile requires torch>=2.0, training without compiling the model")
+            return
+
+        torch_compile_params = core_utils.get_param(self.training_params, "torch_compile_params") or {}
+        logger.info(f"Compiling the model with torch.compile (params: {torch_compile_params})")
+        self._compiled_net = torch.compile(self.net, **torch_compile_params)
+        if core_utils.get_param(self.training_params, "torch_compile_loss", False):
+            self._compiled_criterion = torch.compile(self.criterion, **torch_compile_params)
+
     def _init_arch_params(self):
         default_arch_params = HpmStruct()
         arch_params = getattr(self.net, "arch_params", default_arch_params)
@@ -908,6 +968,12 @@ class Trainer:
 
                     Silents the print outs.
 
+                - `log_every_n_steps` : int (default=1)
+
+                    The running loss and metrics of the train loop, and the progress bar, are only computed every log_every_n_steps
+                     batches (and at the end of the epoch). Computing them waits for the device, so setting it to more than 1 keeps
+                     the device busy between the logs, which speeds up the training of small models.
+
                 - `mixed_precision` : bool
 
                     Whether to use mixed precision or not.
@@ -974,6 +1040,40 @@ class Trainer:
                       for the forward pass, and further computations. Args for this callable should be in the order
                       (inputs, targets, batch_idx) returning modified_inputs, modified_targets
 
+                -   `batch_transforms` : list (default=[])
+
+                     Transforms applied to whole training batches, on the device of the batch (i.e. on GPU), right before the
+                      pre_prediction_callback. Every transform is a callable (inputs, targets) returning modified_inputs, modified_targets,
+                      e.g. the detection batch transforms of super_gradients.training.transforms.batch_transforms
+                      (DetectionBatchRandomAffine, DetectionBatchHSV, DetectionBatchHorizontalFlip, DetectionBatchMixup) or
+                      SegmentationBatchNormalize for segmentation datasets returning uint8 images, or RandAugmentTransform with a
+                      "-tensor1" config string (e.g. "rand-m7-mstd0.5-tensor1"), which can be set from the recipes like the dataset transforms.
+
+                -   `torch_compile` : bool (default=False)
+
+                     Whether to compile the forward pass of the model for training with torch.compile (requires torch>=2.0). The compiled
+                      model shares its parameters with the model, which is still used for the EMA, the checkpoints (same state dict keys)
+                      and the validation. The time of the first step of every epoch (with the compilation) and the steady-state step time are logged.
+
+                -   `torch_compile_loss` : bool (default=False)
+
+                     Whether to compile the loss as well (e.g. YoloXFastDetectionLoss, DiceCEEdgeLoss), when torch_compile is set.
+
+                -   `torch_compile_params` : dict (default={})
+
+                     Arguments of torch.compile, e.g. {"mode": "max-autotune"}. With input shapes changing during the training
+                      (e.g. multiscale pre_prediction_callback), every new shape triggers a recompilation until torch.compile
+                      switches to dynamic shapes: use {"dynamic": True} to compile for dynamic shapes from the start, or
+                      {"dynamic": False} to compile once per input size (the multiscale sizes are multiples of its divisor,
+                      raise torch._dynamo.config.cache_size_limit if there are more sizes than the cache size).
+
+                -   `prefetch_to_device` : bool (default=False)
+
+                     Whether to iterate over the train and validation loaders through a DevicePrefetcher
+                      (super_gradients.training.utils.DevicePrefetcher): on CUDA devices, the next batch is copied to the device on
+                      a side stream while the current batch is processed, so the host to device copies overlap with the computations.
+                      Requires data loaders with pin_memory=True to be effective.
+
                 -   `ckpt_best_name` : str (default='ckpt_best.pth')
 
                     The best checkpoint (according to metric_to_watch) will be saved under this filename in the checkpoints directory.
@@ -1045,6 +1145,11 @@ class Trainer:
         self.training_params = TrainingParams()
         self.training_params.override(**training_params)
 
+        # A MODEL COMPILED BY THE USER IS TRAINED THROUGH ITS ORIGINAL MODULE, SO ITS STATE DICT KEYS AND DEEP COPIES (EMA) ARE THE SAME
+        # AS WITHOUT COMPILING (THE training_params.torch_compile PARAMETER COMPILES IT WITHOUT THESE ISSUES)
+        if hasattr(model, "_orig_mod"):
+            logger.warning("The model was compiled with torch.compile before training: training the original model. Use training_params.torch_compile instead.")
+            model = model._orig_mod
         self.net = model
         self._prep_net_for_train()
 
@@ -1094,6 +1199,9 @@ class Trainer:
                     self.ema = False
                     logger.warning("[Warning] Checkpoint does not include EMA weights, continuing training without EMA.")
 
+        # AFTER THE EMA MODEL IS INSTANTIATED, SO IT IS A DEEP COPY OF THE (UNCOMPILED) NET
+        self._compile_for_training()
+
         self.run_validation_freq = self.training_params.run_validation_freq
         validation_results_tuple = (0, 0)
         inf_time = 0
@@ -1185,6 +1293,7 @@ class Trainer:
             self.optimizer.load_state_dict(self.checkpoint["optimizer_state_dict"])
 
         self.pre_prediction_callback = CallbacksFactory().get(self.training_params.pre_prediction_callback)
+        self.batch_transforms = ListFactory(TransformsFactory()).get(self.training_params.batch_transforms or [])
 
         self._initialize_mixed_precision(self.training_params.mixed_precision)
 
@@ -1231,6 +1340,7 @@ class Trainer:
             device=device_config.device,
             context_methods=self._get_context_methods(Phase.PRE_TRAINING),
             ema_model=self.ema_model,
+            batch_transforms=self.batch_transforms,
         )
         self.phase_callback_handler.on_training_start(context)
 
@@ -1341,6 +1451,9 @@ class Trainer:
             if not self.ddp_silent_mode:
                 self.sg_logger.close()
 
+            # THE COMPILED MODULES ARE ONLY USED BY THE TRAIN LOOP OF THIS CALL TO train()
+            self._compiled_net, self._compiled_criterion = None, None
+
     def _reset_best_metric(self):
         self.best_metric = -1 * np.inf if self.greater_metric_to_watch_is_better else np.inf
 
@@ -1776,9 +1889,11 @@ class Trainer:
         :return: results tuple (tuple) containing the loss items and metric values.
         """
 
+        if self.training_params and core_utils.get_param(self.training_params, "prefetch_to_device", default_val=False):
+            data_loader = DevicePrefetcher(data_loader, device_config.device)
         # THE DISABLE FLAG CONTROLS WHETHER THE PROGRESS BAR IS SILENT OR PRINTS THE LOGS
         progress_bar_data_loader = tqdm(data_loader, bar_format="{l_bar}{bar:10}{r_bar}", dynamic_ncols=True, disable=silent_mode)
-        loss_avg_meter = core_utils.utils.AverageMeter()
+        loss_avg_meter = core_utils.utils.DeviceAverageMeter()
         logging_values = None
         loss_tuple = None
         lr_warmup_epochs = self.training_params.lr_warmup_epochs if self.training_params else None
@@ -1814,8 +1929,9 @@ class Trainer:
                 context.update_context(preds=output)
 
                 if self.criterion is not None:
-                    # STORE THE loss_items ONLY, THE 1ST RETURNED VALUE IS THE loss FOR BACKPROP DURING TRAINING
-                    loss_tuple = self._get_losses(output, targets)[1].cpu()
+                    # STORE THE loss_items ONLY, THE 1ST RETURNED VALUE IS THE loss FOR BACKPROP DURING TRAINING.
+                    # THEY STAY ON THE DEVICE, ACCUMULATED BY loss_avg_meter AND COPIED TO THE HOST ONCE AT THE END
+                    loss_tuple = self._get_losses(output, targets)[1]
                     context.update_context(loss_log_items=loss_tuple)
 
                 # TRIGGER PHASE CALLBACKS CORRESPONDING TO THE EVALUATION TYPE
@@ -1835,8 +1951,12 @@ class Trainer:
                 if evaluation_type == EvaluationType.VALIDATION and self.max_valid_batches is not None and self.max_valid_batches - 1 <= batch_idx:
                     break
 
-        # NEED TO COMPUTE METRICS FOR THE FIRST TIME IF PROGRESS VERBOSITY IS NOT SET
-        if not metrics_progress_verbose:
+        if device_config.multi_gpu == MultiGPUMode.DISTRIBUTED_DATA_PARALLEL and self.criterion is not None:
+            # AVERAGE OF THE LOSS ITEMS OVER ALL THE SAMPLES OF ALL THE RANKS (INCLUDING THE RANKS THAT DID NOT GET ANY BATCH)
+            loss_avg_meter.all_reduce()
+
+        # NEED TO COMPUTE METRICS FOR THE FIRST TIME IF PROGRESS VERBOSITY IS NOT SET (OR AGAIN, WITH THE REDUCED LOSS ITEMS)
+        if not metrics_progress_verbose or device_config.multi_gpu == MultiGPUMode.DISTRIBUTED_DATA_PARALLEL:
             # COMPUTE THE RUNNING USER METRICS AND LOSS RUNNING ITEMS. RESULT TUPLE IS THEIR CONCATENATION.
             logging_values = get_logging_values(loss_avg_meter, metrics, self.criterion)
             pbar_message_dict = get_train_loop_description_dict(logging_values, metrics, self.loss_logging_items_names)
@@ -1849,7 +1969,9 @@ class Trainer:
         #  COMPUTATION. ALSO REMOVE THE BELOW LINES BY IMPLEMENTING CRITERION AS A TORCHMETRIC.
 
         if device_config.multi_gpu == MultiGPUMode.DISTRIBUTED_DATA_PARALLEL:
-            logging_values = reduce_results_tuple_for_ddp(logging_values, next(self.net.parameters()).device)
+            # THE LOSS ITEMS ARE ALREADY REDUCED BY THE AVERAGE METER
+            n_loss_items = len(self.loss_logging_items_names) if self.criterion is not None else 0
+            logging_values = logging_values[:n_loss_items] + reduce_results_tuple_for_ddp(logging_values[n_loss_items:], next(self.net.parameters()).device)
 
         pbar_message_dict = get_train_loop_description_dict(logging_values, metrics, self.loss_logging_items_names)
 
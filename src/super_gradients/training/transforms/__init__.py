@@ -3,11 +3,19 @@ import cv2
 from super_gradients.training.transforms.transforms import (
     DetectionMosaic,
     DetectionRandomAffine,
+    DetectionMosaicAffine,
     DetectionHSV,
     DetectionPaddedRescale,
     DetectionTargetsFormatTransform,
     Standardize,
 )
+from super_gradients.training.transforms.batch_transforms import (
+    DetectionBatchRandomAffine,
+    DetectionBatchMixup,
+    DetectionBatchHSV,
+    DetectionBatchHorizontalFlip,
+    SegmentationBatchNormalize,
+)
 from super_gradients.training.transforms.all_transforms import (
     TRANSFORMS,
     ALBUMENTATIONS_TRANSFORMS,
@@ -23,11 +31,17 @@ __all__ = [
     "Transforms",
     "DetectionMosaic",
     "DetectionRandomAffine",
+    "DetectionMosaicAffine",
     "DetectionHSV",
     "DetectionPaddedRescale",
     "DetectionTargetsFormatTransform",
     "imported_albumentations_failure",
     "Standardize",
+    "DetectionBatchRandomAffine",
+    "DetectionBatchMixup",
+    "DetectionBatchHSV",
+    "DetectionBatchHorizontalFlip",
+    "SegmentationBatchNormalize",
 ]
 
 cv2.setNumThreads(0)
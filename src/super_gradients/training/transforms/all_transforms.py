@@ -19,6 +19,7 @@ from super_gradients.training.transforms.transforms import (
     SegColorJitter,
     DetectionMosaic,
     DetectionRandomAffine,
+    DetectionMosaicAffine,
     DetectionMixup,
     DetectionHSV,
     DetectionRGB2BGR,
@@ -29,6 +30,13 @@ from super_gradients.training.transforms.transforms import (
     DetectionTargetsFormatTransform,
     Standardize,
 )
+from super_gradients.training.transforms.batch_transforms import (
+    DetectionBatchRandomAffine,
+    DetectionBatchMixup,
+    DetectionBatchHSV,
+    DetectionBatchHorizontalFlip,
+    SegmentationBatchNormalize,
+)
 from torchvision.transforms import (
     Compose,
     ToTensor,
@@ -89,6 +97,7 @@ TRANSFORMS = {
     Transforms.SegColorJitter: SegColorJitter,
     Transforms.DetectionMosaic: DetectionMosaic,
     Transforms.DetectionRandomAffine: DetectionRandomAffine,
+    Transforms.DetectionMosaicAffine: DetectionMosaicAffine,
     Transforms.DetectionMixup: DetectionMixup,
     Transforms.DetectionHSV: DetectionHSV,
     Transforms.DetectionRGB2BGR: DetectionRGB2BGR,
@@ -97,6 +106,11 @@ TRANSFORMS = {
     Transforms.DetectionRescale: DetectionRescale,
     Transforms.DetectionPaddedRescale: DetectionPaddedRescale,
     Transforms.DetectionTargetsFormatTransform: DetectionTargetsFormatTransform,
+    Transforms.DetectionBatchRandomAffine: DetectionBatchRandomAffine,
+    Transforms.DetectionBatchMixup: DetectionBatchMixup,
+    Transforms.DetectionBatchHSV: DetectionBatchHSV,
+    Transforms.DetectionBatchHorizontalFlip: DetectionBatchHorizontalFlip,
+    Transforms.SegmentationBatchNormalize: SegmentationBatchNormalize,
     Transforms.RandomResizedCropAndInterpolation: RandomResizedCropAndInterpolation,
     Transforms.RandAugmentTransform: rand_augment_transform,
     Transforms.Lighting: Lighting,
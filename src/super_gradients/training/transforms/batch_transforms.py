@@ -0,0 +1,391 @@
+import math
+from typing import Sequence, Tuple, Union
+
+import torch
+import torch.nn.functional as F
+
+from super_gradients.common.abstractions.abstract_logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DetectionBatchTransform:
+    """
+    Detection batch transform base class.
+
+    Batch transforms are applied by the Trainer on whole training batches, on the device of the batch (i.e. on GPU), right after
+     moving the batch to the device and before the pre_prediction_callback (see training_params.batch_transforms).
+     They are the batch-level equivalent of the detection transforms applied per sample in the dataloader workers, with random
+     parameters drawn independently for every sample of the batch.
+
+    Expected inputs (i.e. the output of DetectionCollateFN, with DetectionTargetsFormatTransform(output_format=LABEL_CXCYWH)):
+        images:  Tensor of shape [B, C, H, W] with values in [0, 255]
+        targets: Tensor of shape [N, 6], every row being (index of the image in the batch, class, cx, cy, w, h) in pixels
+    """
+
+    def __call__(self, images: torch.Tensor, targets: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return self.__class__.__name__ + str(self.__dict__).replace("{", "(").replace("}", ")")
+
+
+class DetectionBatchHSV(DetectionBatchTransform):
+    """
+    Batch equivalent of DetectionHSV: random shifts of the hue, saturation and value of the images (in the ranges of OpenCV for uint8
+     images, i.e. hue in [0, 180) and saturation/value in [0, 255]).
+
+    Attributes:
+        prob: (float) probability to apply the transform to every image.
+        hgain: (float) hue gain (default=0.5)
+        sgain: (float) saturation gain (default=0.5)
+        vgain: (float) value gain (default=0.5)
+        bgr_channels: (tuple) channel indices of the BGR channels- useful for images with >3 channels,
+         or when BGR channels are in different order. (default=(0,1,2)).
+    """
+
+    def __init__(self, prob: float, hgain: float = 0.5, sgain: float = 0.5, vgain: float = 0.5, bgr_channels=(0, 1, 2)):
+        self.prob = prob
+        self.hgain = hgain
+        self.sgain = sgain
+        self.vgain = vgain
+        self.bgr_channels = bgr_channels
+
+    def __call__(self, images: torch.Tensor, targets: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        batch_size, device = images.shape[0], images.device
+        indexes = torch.nonzero(torch.rand(batch_size, device=device) < self.prob).squeeze(1)
+        if len(indexes) == 0:
+            return images, targets
+
+        # Same gains as augment_hsv: random in [-gain, gain], applied to a random selection of h, s, v, and truncated to integers
+        gains = torch.tensor([self.hgain, self.sgain, self.vgain], device=device, dtype=torch.float32)
+        hsv_augs = (torch.rand(len(indexes), 3, device=device) * 2 - 1) * gains * torch.randint(0, 2, (len(indexes), 3), device=device)
+        hsv_augs = hsv_augs.trunc()[:, :, None, None]
+
+        channels = list(self.bgr_channels)
+        hue, saturation, value = _bgr_to_hsv(images[indexes][:, channels].float())
+        hue = torch.remainder(hue + hsv_augs[:, 0], 180)
+        saturation = (saturation + hsv_augs[:, 1]).clamp(0, 255)
+        value = (value + hsv_augs[:, 2]).clamp(0, 255)
+
+        augmented_images = images[indexes]
+        augmented_images[:, channels] = _hsv_to_bgr(hue, saturation, value).to(images.dtype)
+        images[indexes] = augmented_images
+        return images, targets
+
+
+class DetectionBatchHorizontalFlip(DetectionBatchTransform):
+    """
+    Batch equivalent of DetectionHorizontalFlip.
+
+    Attributes:
+        prob: (float) probability to flip every image.
+    """
+
+    def __init__(self, prob: float):
+        self.prob = prob
+
+    def __call__(self, images: torch.Tensor, targets: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        flip = torch.rand(images.shape[0], device=images.device) < self.prob
+        indexes = torch.nonzero(flip).squeeze(1)
+        if len(indexes) == 0:
+            return images, targets
+
+        images[indexes] = images[indexes].flip(-1)
+        targets = targets.clone()
+        flipped_targets = flip[targets[:, 0].long()]
+        targets[flipped_targets, 2] = images.shape[-1] - targets[flipped_targets, 2]
+        return images, targets
+
+
+class DetectionBatchRandomAffine(DetectionBatchTransform):
+    """
+    Batch equivalent of DetectionRandomAffine, with the same random parameters (see get_affine_matrix), drawn for every image.
+     The images are warped with grid_sample, and keep their shape.
+
+    Attributes:
+        degrees:  (Union[tuple, float]) degrees for random rotation, when float the random values are drawn uniformly
+            from (-degrees, degrees)
+        translate:  (Union[tuple, float]) translate size (in pixels) for random translation, when float the random values
+            are drawn uniformly from (-translate, translate)
+        scales: (Union[tuple, float]) values for random rescale, when float the random values are drawn uniformly
+            from (1-scales, 1+scales)
+        shear: (Union[tuple, float]) degrees for random shear, when float the random values are drawn uniformly
+            from (-shear, shear)
+        filter_box_candidates: (bool) whether to filter out transformed bboxes by edge size, area ratio, and aspect ratio (default=False).
+        wh_thr: (float) edge size threshold when filter_box_candidates = True (default=2)
+        ar_thr: (float) aspect ratio threshold when filter_box_candidates = True (default=20)
+        area_thr: (float) threshold for area ratio between original box and the transformed one, when filter_box_candidates = True (default=0.1)
+        border_value: value for filling borders after applying transforms (default=114).
+        min_bbox_edge_size: bboxes with edge size lower then this values will be removed, like in DetectionTargetsFormatTransform (default=1).
+    """
+
+    def __init__(
+        self,
+        degrees: Union[tuple, float] = 10,
+        translate: Union[tuple, float] = 0.1,
+        scales: Union[tuple, float] = 0.1,
+        shear: Union[tuple, float] = 10,
+        filter_box_candidates: bool = False,
+        wh_thr: float = 2,
+        ar_thr: float = 20,
+        area_thr: float = 0.1,
+        border_value: float = 114,
+        min_bbox_edge_size: float = 1,
+    ):
+        self.degrees = degrees
+        self.translate = translate
+        self.scale = scales
+        self.shear = shear
+        self.enable = True
+        self.filter_box_candidates = filter_box_candidates
+        self.wh_thr = wh_thr
+        self.ar_thr = ar_thr
+        self.area_thr = area_thr
+        self.border_value = border_value
+        self.min_bbox_edge_size = min_bbox_edge_size
+
+    def close(self):
+        self.enable = False
+
+    def __call__(self, images: torch.Tensor, targets: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        if not self.enable:
+            return images, targets
+
+        height, width = images.shape[2:]
+        M = get_affine_matrices(images.shape[0], (width, height), self.degrees, self.translate, self.scale, self.shear, device=images.device)
+        images = warp_affine(images, M, border_value=self.border_value)
+
+        boxes = _cxcywh_to_xyxy(targets[:, 2:6])
+        new_boxes = _apply_affine_to_boxes(boxes, M[targets[:, 0].long()], width=width, height=height)
+        keep = _is_big_enough(new_boxes, self.min_bbox_edge_size)
+        if self.filter_box_candidates:
+            keep &= _is_box_candidate(boxes, new_boxes, wh_thr=self.wh_thr, ar_thr=self.ar_thr, area_thr=self.area_thr)
+        targets = torch.cat([targets[:, :2], _xyxy_to_cxcywh(new_boxes)], dim=1)[keep]
+        return images, targets
+
+
+class DetectionBatchMixup(DetectionBatchTransform):
+    """
+    Batch equivalent of DetectionMixup: every image is averaged with another image of the batch, which is randomly flipped, rescaled
+     by a random factor (from its top left corner) and cropped at a random position, and the targets of both images are kept.
+
+    Attributes:
+        mixup_scale: (tuple) scale range for the additional image.
+        prob: (float) probability of applying mixup to every image.
+        enable_mixup: (bool) whether to apply mixup at all (regardless of prob) (default=True).
+        flip_prob: (float) probability to apply horizontal flip to the additional image.
+        min_bbox_edge_size: bboxes with edge size lower then this values will be removed, like in DetectionTargetsFormatTransform (default=1).
+    """
+
+    def __init__(self, mixup_scale: Sequence[float], prob: float = 1.0, enable_mixup: bool = True, flip_prob: float = 0.5, min_bbox_edge_size: float = 1):
+        self.mixup_scale = mixup_scale
+        self.prob = prob
+        self.enable_mixup = enable_mixup
+        self.flip_prob = flip_prob
+        self.min_bbox_edge_size = min_bbox_edge_size
+
+    def close(self):
+        self.enable_mixup = False
+
+    def __call__(self, images: torch.Tensor, targets: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        batch_size, device = images.shape[0], images.device
+        if not self.enable_mixup or batch_size < 2:
+            return images, targets
+        indexes = torch.nonzero(torch.rand(batch_size, device=device) < self.prob).squeeze(1)
+        if len(indexes) == 0:
+            return images, targets
+
+        # Every image is mixed with another one of the batch, taken before any mixing
+        n_mixed, (height, width) = len(indexes), images.shape[2:]
+        shift = int(torch.randint(1, batch_size, (1,)))
+        cp_indexes = (indexes + shift) % batch_size
+        jit_factors = torch.empty(n_mixed, device=device).uniform_(*self.mixup_scale)
+        flips = torch.rand(n_mixed, device=device) < self.flip_prob
+        # Same crop as DetectionMixup, at a random position when the rescaled image is larger than the batch
+        x_offsets = (torch.rand(n_mixed, device=device) * ((width * jit_factors).floor() - width)).floor().clamp(min=0)
+        y_offsets = (torch.rand(n_mixed, device=device) * ((height * jit_factors).floor() - height)).floor().clamp(min=0)
+
+        # Mapping of the pixel centers of the additional images (flip + resize + crop), and of the box coordinates
+        M = torch.zeros(n_mixed, 2, 3, device=device)
+        M[:, 0, 0] = torch.where(flips, -jit_factors, jit_factors)
+        M[:, 0, 2] = torch.where(flips, jit_factors * (width - 0.5), 0.5 * jit_factors) - 0.5 - x_offsets
+        M[:, 1, 1] = jit_factors
+        M[:, 1, 2] = 0.5 * jit_factors - 0.5 - y_offsets
+        cp_images = warp_affine(images[cp_indexes].float(), M, border_value=0)
+        images[indexes] = (0.5 * images[indexes].float() + 0.5 * cp_images).to(images.dtype)
+
+        # Targets of the additional images, moved to the images they were mixed in
+        cp_position = torch.full((batch_size,), -1, dtype=torch.long, device=device)
+        cp_position[cp_indexes] = torch.arange(n_mixed, device=device)
+        cp_targets = targets[cp_position[targets[:, 0].long()] >= 0]
+        positions = cp_position[cp_targets[:, 0].long()]
+
+        boxes = _cxcywh_to_xyxy(cp_targets[:, 2:6])
+        x_flipped = torch.where(flips[positions, None], width - boxes[:, [2, 0]], boxes[:, [0, 2]])
+        boxes = torch.stack([x_flipped[:, 0], boxes[:, 1], x_flipped[:, 1], boxes[:, 3]], dim=1) * jit_factors[positions, None]
+        boxes -= torch.stack([x_offsets, y_offsets, x_offsets, y_offsets], dim=1)[positions]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clamp(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clamp(0, height)
+
+        cp_targets = torch.cat([indexes[positions, None].to(targets.dtype), cp_targets[:, 1:2], _xyxy_to_cxcywh(boxes)], dim=1)
+        cp_targets = cp_targets[_is_big_enough(boxes, self.min_bbox_edge_size)]
+        targets = torch.cat([targets, cp_targets], dim=0)
+        return images, targets[torch.sort(targets[:, 0], stable=True).indices]
+
+
+class SegmentationBatchNormalize:
+    """
+    Normalizes batches of uint8 images on their device (i.e. on GPU), for segmentation datasets returning uint8 images
+     (see SegmentationDataSet's normalize_images), which are 4 times smaller to collate and to copy to the GPU than normalized images.
+     The masks are left untouched. Only training batches go through the batch transforms, so the validation dataset should keep
+     normalizing its images.
+
+    Attributes:
+        mean: (sequence) mean of every channel, for images in [0, 1] (default: ImageNet mean).
+        std: (sequence) standard deviation of every channel, for images in [0, 1] (default: ImageNet std).
+        max_value: (float) value of the images corresponding to 1 (default=255).
+    """
+
+    def __init__(self, mean: Sequence[float] = (0.485, 0.456, 0.406), std: Sequence[float] = (0.229, 0.224, 0.225), max_value: float = 255.0):
+        self.mean = mean
+        self.std = std
+        self.max_value = max_value
+
+    def __call__(self, images: torch.Tensor, targets: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        mean = torch.tensor(self.mean, dtype=torch.float32, device=images.device).view(1, -1, 1, 1) * self.max_value
+        std = torch.tensor(self.std, dtype=torch.float32, device=images.device).view(1, -1, 1, 1) * self.max_value
+        return (images.float() - mean) / std, targets
+
+    def __repr__(self):
+        return self.__class__.__name__ + str(self.__dict__).replace("{", "(").replace("}", ")")
+
+
+def get_affine_matrices(
+    batch_size: int,
+    target_size: Tuple[int, int],
+    degrees: Union[tuple, float] = 10,
+    translate: Union[tuple, float] = 0.1,
+    scales: Union[tuple, float] = 0.1,
+    shear: Union[tuple, float] = 10,
+    device: Union[str, torch.device] = "cpu",
+) -> torch.Tensor:
+    """
+    Batch equivalent of get_affine_matrix: random affine transform matrices, one for every image (see get_affine_matrix for the parameters).
+
+    :return: Matrices of shape [batch_size, 2, 3], mapping the pixels of the images to the pixels of the transformed images
+    """
+    twidth, theight = target_size
+
+    angle = _sample_uniform(degrees, batch_size, device) * math.pi / 180
+    scale = _sample_uniform(scales, batch_size, device, center=1.0)
+    if (scale <= 0.0).any():
+        raise ValueError("Argument scale should be positive")
+
+    # Same as cv2.getRotationMatrix2D(angle=angle, center=(0, 0), scale=scale)
+    R = torch.zeros(batch_size, 2, 3, device=device)
+    R[:, 0, 0], R[:, 0, 1] = scale * torch.cos(angle), scale * torch.sin(angle)
+    R[:, 1, 0], R[:, 1, 1] = -scale * torch.sin(angle), scale * torch.cos(angle)
+
+    shear_x = torch.tan(_sample_uniform(shear, batch_size, device) * math.pi / 180)
+    shear_y = torch.tan(_sample_uniform(shear, batch_size, device) * math.pi / 180)
+    M = torch.stack([R[:, 0] + shear_y[:, None] * R[:, 1], R[:, 1] + shear_x[:, None] * R[:, 0]], dim=1)
+
+    M[:, 0, 2] = _sample_uniform(translate, batch_size, device) * twidth
+    M[:, 1, 2] = _sample_uniform(translate, batch_size, device) * theight
+    return M
+
+
+def warp_affine(images: torch.Tensor, M: torch.Tensor, border_value: float = 0) -> torch.Tensor:
+    """
+    Batch equivalent of cv2.warpAffine with bilinear interpolation, keeping the size of the images.
+
+    :param images:          Images of shape [B, C, H, W]
+    :param M:               Matrices of shape [B, 2, 3], mapping the pixels of the images to the pixels of the warped images
+    :param border_value:    Value of the pixels outside of the images
+    :return:                Warped images, of shape [B, C, H, W]
+    """
+    batch_size, _, height, width = images.shape
+    M = M.to(torch.float64)
+
+    # Inverse mapping (output pixel -> input pixel), in the normalized coordinates of grid_sample with align_corners=False
+    M_inv = torch.zeros(batch_size, 3, 3, dtype=torch.float64, device=images.device)
+    M_inv[:, :2, :2] = torch.linalg.inv(M[:, :, :2])
+    M_inv[:, :2, 2:] = -M_inv[:, :2, :2] @ M[:, :, 2:]
+    M_inv[:, 2, 2] = 1
+    to_normalized = torch.tensor([[2 / width, 0, 1 / width - 1], [0, 2 / height, 1 / height - 1], [0, 0, 1]], dtype=torch.float64, device=images.device)
+    theta = (to_normalized @ M_inv @ torch.linalg.inv(to_normalized))[:, :2]
+
+    grid = F.affine_grid(theta.to(images.dtype), list(images.shape), align_corners=False)
+    # grid_sample pads with zeros, so the border value is subtracted before and added back after
+    warped = F.grid_sample(images - border_value, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
+    return warped + border_value
+
+
+def _sample_uniform(value: Union[tuple, float], n: int, device: Union[str, torch.device], center: float = 0.0) -> torch.Tensor:
+    """Batch equivalent of get_aug_params: n values drawn uniformly in (value[0], value[1]), or (center - value, center + value)."""
+    if isinstance(value, (int, float)):
+        low, high = center - value, center + value
+    elif len(value) == 2:
+        low, high = value
+    else:
+        raise ValueError(f"Affine params should be either a sequence containing two values or single float values. Got {value}")
+    return torch.empty(n, device=device).uniform_(low, high)
+
+
+def _bgr_to_hsv(bgr: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Convert BGR images of shape [B, 3, H, W] in [0, 255] to hue in [0, 180), saturation and value in [0, 255], like cv2.COLOR_BGR2HSV."""
+    blue, green, red = bgr[:, 0], bgr[:, 1], bgr[:, 2]
+    value, _ = bgr.max(dim=1)
+    delta = value - bgr.min(dim=1)[0]
+    saturation = torch.where(value > 0, 255 * delta / value.clamp(min=1e-6), torch.zeros_like(value))
+
+    safe_delta = delta.clamp(min=1e-6)
+    hue = torch.where(
+        value == red,
+        60 * (green - blue) / safe_delta,
+        torch.where(value == green, 120 + 60 * (blue - red) / safe_delta, 240 + 60 * (red - green) / safe_delta),
+    )
+    hue = torch.where(delta > 0, torch.remainder(hue, 360), torch.zeros_like(hue)) / 2
+    return hue, saturation, value
+
+
+def _hsv_to_bgr(hue: torch.Tensor, saturation: torch.Tensor, value: torch.Tensor) -> torch.Tensor:
+    """Inverse of _bgr_to_hsv, returns images of shape [B, 3, H, W]."""
+    chroma = value * saturation / 255
+
+    def channel(n: int) -> torch.Tensor:
+        k = torch.remainder(n + hue / 30, 6)
+        return value - chroma * torch.minimum(k, 4 - k).clamp(0, 1)
+
+    return torch.stack([channel(1), channel(3), channel(5)], dim=1)
+
+
+def _cxcywh_to_xyxy(boxes: torch.Tensor) -> torch.Tensor:
+    return torch.cat([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, :2] + boxes[:, 2:] / 2], dim=1)
+
+
+def _xyxy_to_cxcywh(boxes: torch.Tensor) -> torch.Tensor:
+    return torch.cat([(boxes[:, :2] + boxes[:, 2:]) / 2, boxes[:, 2:] - boxes[:, :2]], dim=1)
+
+
+def _apply_affine_to_boxes(boxes: torch.Tensor, M: torch.Tensor, width: int, height: int) -> torch.Tensor:
+    """Batch equivalent of apply_affine_to_bboxes: warp the corners of XYXY boxes with their own matrix, and clip the boxes to the image."""
+    corners = boxes[:, [0, 1, 2, 3, 0, 3, 2, 1]].reshape(-1, 4, 2)
+    corners = corners @ M[:, :, :2].transpose(1, 2) + M[:, None, :, 2]
+    new_boxes = torch.cat([corners.min(dim=1)[0], corners.max(dim=1)[0]], dim=1)
+    new_boxes[:, [0, 2]] = new_boxes[:, [0, 2]].clamp(0, width)
+    new_boxes[:, [1, 3]] = new_boxes[:, [1, 3]].clamp(0, height)
+    return new_boxes
+
+
+def _is_box_candidate(boxes: torch.Tensor, new_boxes: torch.Tensor, wh_thr: float = 2, ar_thr: float = 20, area_thr: float = 0.1) -> torch.Tensor:
+    """Batch equivalent of _filter_box_candidates."""
+    w1, h1 = boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]
+    w2, h2 = new_boxes[:, 2] - new_boxes[:, 0], new_boxes[:, 3] - new_boxes[:, 1]
+    ar = torch.maximum(w2 / (h2 + 1e-16), h2 / (w2 + 1e-16))
+    return (w2 > wh_thr) & (h2 > wh_thr) & (w2 * h2 / (w1 * h1 + 1e-16) > area_thr) & (ar < ar_thr)
+
+
+def _is_big_enough(boxes: torch.Tensor, min_bbox_edge_size: float) -> torch.Tensor:
+    return torch.minimum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]) > min_bbox_edge_size
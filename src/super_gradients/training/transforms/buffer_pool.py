@@ -0,0 +1,88 @@
+import os
+import sys
+import threading
+from collections import defaultdict
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+
+def _get_refcount(buffers: List[np.ndarray], index: int) -> int:
+    return sys.getrefcount(buffers[index])
+
+
+# Reference count of a buffer that is only referenced by the pool (measured instead of hardcoded, since it depends on the python version)
+_FREE_BUFFER_REFCOUNT = _get_refcount([np.empty(0)], 0)
+
+
+class BufferPool:
+    """Pool of numpy arrays reused as output canvases by the transforms, instead of allocating large arrays for every sample.
+
+    A buffer is lent again only once nothing else references it (e.g. once the sample using it was transformed further or collated
+    into a batch), so buffers can be used like any freshly allocated array. Numpy views and tensors created with torch.from_numpy
+    reference their buffer, so they keep it borrowed as long as they exist.
+
+    Every process (i.e. every dataloader worker) has its own pool, see get_buffer_pool.
+    """
+
+    def __init__(self, max_buffers_per_shape: int = 64):
+        """
+        :param max_buffers_per_shape: Maximum number of buffers kept for every shape and dtype. When all of them are borrowed,
+            new arrays are allocated and not kept by the pool.
+        """
+        self.max_buffers_per_shape = max_buffers_per_shape
+        self._buffers = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def empty(self, shape: Tuple[int, ...], dtype: Union[np.dtype, type] = np.uint8) -> np.ndarray:
+        """Borrow an uninitialized buffer.
+
+        :param shape:   Shape of the buffer
+        :param dtype:   Type of the buffer
+        :return:        Buffer, C-contiguous
+        """
+        shape, dtype = tuple(int(size) for size in shape), np.dtype(dtype)
+        with self._lock:
+            buffers = self._buffers[(shape, dtype)]
+            for index in range(len(buffers)):
+                if _get_refcount(buffers, index) == _FREE_BUFFER_REFCOUNT:
+                    return buffers[index]
+
+            buffer = np.empty(shape, dtype=dtype)
+            if len(buffers) < self.max_buffers_per_shape:
+                buffers.append(buffer)
+            return buffer
+
+    def full(self, shape: Tuple[int, ...], fill_value, dtype: Union[np.dtype, type] = np.uint8) -> np.ndarray:
+        """Borrow a buffer filled with fill_value, like np.full.
+
+        :param shape:       Shape of the buffer
+        :param fill_value:  Scalar, or value for each channel (last dimension)
+        :param dtype:       Type of the buffer
+        :return:            Buffer, C-contiguous
+        """
+        buffer = self.empty(shape, dtype=dtype)
+        buffer[...] = fill_value
+        return buffer
+
+    def clear(self) -> None:
+        """Release all the buffers kept by the pool (the borrowed ones stay valid)."""
+        with self._lock:
+            self._buffers.clear()
+
+    @property
+    def n_buffers(self) -> int:
+        """Number of buffers kept by the pool, either borrowed or free."""
+        return sum(len(buffers) for buffers in self._buffers.values())
+
+
+_BUFFER_POOL: Optional[BufferPool] = None
+_BUFFER_POOL_PID: Optional[int] = None
+
+
+def get_buffer_pool() -> BufferPool:
+    """Get the buffer pool of the current process. Forked processes (e.g. dataloader workers) get a new, empty pool."""
+    global _BUFFER_POOL, _BUFFER_POOL_PID
+    if _BUFFER_POOL is None or _BUFFER_POOL_PID != os.getpid():
+        _BUFFER_POOL, _BUFFER_POOL_PID = BufferPool(), os.getpid()
+    return _BUFFER_POOL
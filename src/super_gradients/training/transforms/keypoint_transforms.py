@@ -1,6 +1,6 @@
 import random
 from abc import abstractmethod
-from typing import Tuple, List, Iterable, Union
+from typing import Tuple, List, Iterable, Union, Optional
 
 import cv2
 import numpy as np
@@ -13,6 +13,8 @@ __all__ = [
     "KeypointsPadIfNeeded",
     "KeypointsLongestMaxSize",
     "KeypointTransform",
+    "FusableKeypointTransform",
+    "KeypointsAffineWarp",
     "KeypointsCompose",
     "KeypointsRandomHorizontalFlip",
     "KeypointsRandomAffineTransform",
@@ -40,13 +42,149 @@ class KeypointTransform(object):
         raise NotImplementedError
 
 
+class KeypointsAffineWarp:
+    """
+    Affine warp of an image, its mask and its joints, as applied by a FusableKeypointTransform.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        output_size: Tuple[int, int],
+        flip_index: Optional[List[int]] = None,
+        image_pad_value=None,
+        mask_pad_value: Optional[float] = None,
+        mask_interpolation: int = cv2.INTER_LINEAR,
+        hide_outside_joints: bool = False,
+    ):
+        """
+
+        :param matrix: Matrix of shape [3, 3], mapping the pixels of the input image to the pixels of the output image
+        :param output_size: (rows, cols) of the output image
+        :param flip_index: If not None, order of the joints after the warp (see KeypointsRandomHorizontalFlip)
+        :param image_pad_value: Padding value of the image, None if the warp does not pad the image
+        :param mask_pad_value: Padding value of the mask, None if the warp does not pad the mask
+        :param mask_interpolation: Interpolation of the mask
+        :param hide_outside_joints: Whether to set the visibility of the joints moved outside of the image to 0
+        """
+        self.matrix = matrix
+        self.output_size = output_size
+        self.flip_index = flip_index
+        self.image_pad_value = image_pad_value
+        self.mask_pad_value = mask_pad_value
+        self.mask_interpolation = mask_interpolation
+        self.hide_outside_joints = hide_outside_joints
+
+    def can_be_fused_with(self, other: "KeypointsAffineWarp") -> bool:
+        """Whether the warps pad the image and the mask with the same values (or do not pad them), so they can be applied at once.
+        The joints outside of the output of a warp hiding them are only hidden by the fused warp if the other warp does not move them
+        or change the output size (e.g. a joint hidden outside of the image would otherwise become visible after a padding).
+        """
+        if self.hide_outside_joints and (other.output_size != self.output_size or not np.allclose(other.matrix, np.eye(3))):
+            return False
+        return all(
+            value is None or other_value is None or value == other_value
+            for value, other_value in [(self.image_pad_value, other.image_pad_value), (self.mask_pad_value, other.mask_pad_value)]
+        )
+
+    def then(self, other: "KeypointsAffineWarp") -> "KeypointsAffineWarp":
+        """Compose this warp with the warp applied after it."""
+        if self.flip_index is None or other.flip_index is None:
+            flip_index = self.flip_index if other.flip_index is None else other.flip_index
+        else:
+            flip_index = [self.flip_index[index] for index in other.flip_index]
+        return KeypointsAffineWarp(
+            matrix=other.matrix @ self.matrix,
+            output_size=other.output_size,
+            flip_index=flip_index,
+            image_pad_value=self.image_pad_value if other.image_pad_value is None else other.image_pad_value,
+            mask_pad_value=self.mask_pad_value if other.mask_pad_value is None else other.mask_pad_value,
+            mask_interpolation=cv2.INTER_NEAREST if cv2.INTER_NEAREST in (self.mask_interpolation, other.mask_interpolation) else cv2.INTER_LINEAR,
+            hide_outside_joints=self.hide_outside_joints or other.hide_outside_joints,
+        )
+
+    def __call__(self, image: np.ndarray, mask: np.ndarray, joints: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rows, cols = self.output_size
+        if image.shape[:2] != self.output_size or not np.allclose(self.matrix, np.eye(3)):
+            matrix = self.matrix[:2]
+            image_pad_value = 0 if self.image_pad_value is None else self.image_pad_value
+            image = cv2.warpAffine(image, matrix, dsize=(cols, rows), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=image_pad_value)
+
+            mask_pad_value = 0 if self.mask_pad_value is None else self.mask_pad_value
+            original_dtype = mask.dtype
+            mask = mask.astype(np.uint8) if original_dtype == bool else mask
+            mask = cv2.warpAffine(mask, matrix, dsize=(cols, rows), flags=self.mask_interpolation, borderMode=cv2.BORDER_CONSTANT, borderValue=mask_pad_value)
+            mask = mask.astype(original_dtype)
+
+        joints = joints.copy() if self.flip_index is None else joints[:, self.flip_index]
+        joints[:, :, 0:2] = joints[:, :, 0:2] @ self.matrix[:2, :2].T + self.matrix[:2, 2]
+        if self.hide_outside_joints:
+            joints_outside_image = (joints[:, :, 0] < 0) | (joints[:, :, 0] >= cols) | (joints[:, :, 1] < 0) | (joints[:, :, 1] >= rows)
+            joints[joints_outside_image, 2] = 0
+        return image, mask, joints
+
+
+class FusableKeypointTransform(KeypointTransform):
+    """
+    Base class for the keypoint transforms that are affine warps of the image, mask and joints.
+    When fuse_affine_transforms=True, KeypointsCompose composes consecutive fusable transforms into a single warp,
+     so that the image and the mask are interpolated once and the joints of all the instances are transformed with a single matmul.
+    """
+
+    @abstractmethod
+    def get_affine_warp(self, rows: int, cols: int) -> Optional[KeypointsAffineWarp]:
+        """
+        Draw the random parameters of the transform, exactly like __call__ does, and get the corresponding warp.
+
+        :param rows: Height of the input image
+        :param cols: Width of the input image
+        :return: Warp applied by the transform, or None if the transform leaves the sample unchanged
+        """
+        raise NotImplementedError
+
+
 class KeypointsCompose(KeypointTransform):
-    def __init__(self, transforms: List[KeypointTransform]):
+    def __init__(self, transforms: List[KeypointTransform], fuse_affine_transforms: bool = False):
+        """
+
+        :param transforms: Transforms to apply, in order
+        :param fuse_affine_transforms: If True, consecutive FusableKeypointTransform (e.g. resize, pad, flip and random affine)
+            are applied as a single affine warp. The random parameters are the same as when applying them one by one, and the outputs
+            only differ by the interpolation of the image (done once instead of once per transform) and of the mask (nearest).
+        """
         self.transforms = transforms
+        self.fuse_affine_transforms = fuse_affine_transforms
 
     def __call__(self, image: np.ndarray, mask: np.ndarray, joints: np.ndarray) -> Tuple[Union[np.ndarray, Tensor], np.ndarray, np.ndarray]:
+        if not self.fuse_affine_transforms:
+            for t in self.transforms:
+                image, mask, joints = t(image, mask, joints)
+            return image, mask, joints
+
+        pending_warp = None
         for t in self.transforms:
-            image, mask, joints = t(image, mask, joints)
+            if isinstance(t, FusableKeypointTransform):
+                if image.shape[:2] != mask.shape[:2]:
+                    raise RuntimeError(f"Image shape ({image.shape[:2]}) does not match mask shape ({mask.shape[:2]}).")
+                rows, cols = image.shape[:2] if pending_warp is None else pending_warp.output_size
+                warp = t.get_affine_warp(rows, cols)
+                if warp is None:
+                    continue
+                if pending_warp is None:
+                    pending_warp = warp
+                elif pending_warp.can_be_fused_with(warp):
+                    pending_warp = pending_warp.then(warp)
+                else:
+                    image, mask, joints = pending_warp(image, mask, joints)
+                    pending_warp = warp
+            else:
+                if pending_warp is not None:
+                    image, mask, joints = pending_warp(image, mask, joints)
+                    pending_warp = None
+                image, mask, joints = t(image, mask, joints)
+
+        if pending_warp is not None:
+            image, mask, joints = pending_warp(image, mask, joints)
         return image, mask, joints
 
 
@@ -75,7 +213,7 @@ class KeypointsImageNormalize(KeypointTransform):
         return image, mask, joints
 
 
-class KeypointsRandomHorizontalFlip(KeypointTransform):
+class KeypointsRandomHorizontalFlip(FusableKeypointTransform):
     """
     Flip image, mask and joints horizontally with a given probability.
     """
@@ -106,8 +244,14 @@ class KeypointsRandomHorizontalFlip(KeypointTransform):
 
         return image, mask, joints
 
+    def get_affine_warp(self, rows: int, cols: int) -> Optional[KeypointsAffineWarp]:
+        if random.random() < self.prob:
+            matrix = np.array([[-1, 0, cols - 1], [0, 1, 0], [0, 0, 1]], dtype=np.float64)
+            return KeypointsAffineWarp(matrix, output_size=(rows, cols), flip_index=list(self.flip_index))
+        return None
+
 
-class KeypointsRandomVerticalFlip(KeypointTransform):
+class KeypointsRandomVerticalFlip(FusableKeypointTransform):
     """
     Flip image, mask and joints vertically with a given probability.
     """
@@ -129,8 +273,13 @@ class KeypointsRandomVerticalFlip(KeypointTransform):
 
         return image, mask, joints
 
+    def get_affine_warp(self, rows: int, cols: int) -> Optional[KeypointsAffineWarp]:
+        if random.random() < self.prob:
+            return KeypointsAffineWarp(np.array([[1, 0, 0], [0, -1, rows - 1], [0, 0, 1]], dtype=np.float64), output_size=(rows, cols))
+        return None
+
 
-class KeypointsLongestMaxSize(KeypointTransform):
+class KeypointsLongestMaxSize(FusableKeypointTransform):
     """
     Resize image, mask and joints to ensure that resulting image does not exceed max_sizes (rows, cols).
     """
@@ -166,6 +315,16 @@ class KeypointsLongestMaxSize(KeypointTransform):
 
         return image, mask, joints
 
+    def get_affine_warp(self, rows: int, cols: int) -> Optional[KeypointsAffineWarp]:
+        if random.random() < self.prob:
+            scale = min(self.max_height / rows, self.max_width / cols)
+            if scale == 1.0:
+                return None
+            # Same output size as rescale_image, and same scaling of the joints as __call__
+            output_size = tuple(int(dim * scale + 0.5) for dim in (rows, cols))
+            return KeypointsAffineWarp(np.diag([scale, scale, 1.0]), output_size=output_size)
+        return None
+
     @classmethod
     def rescale_image(cls, img, scale, interpolation):
         height, width = img.shape[:2]
@@ -176,7 +335,7 @@ class KeypointsLongestMaxSize(KeypointTransform):
         return img
 
 
-class KeypointsPadIfNeeded(KeypointTransform):
+class KeypointsPadIfNeeded(FusableKeypointTransform):
     """
     Pad image and mask to ensure that resulting image size is not less than `output_size` (rows, cols).
     Image and mask padded from right and bottom, thus joints remains unchanged.
@@ -210,8 +369,14 @@ class KeypointsPadIfNeeded(KeypointTransform):
 
         return image, mask, joints
 
+    def get_affine_warp(self, rows: int, cols: int) -> Optional[KeypointsAffineWarp]:
+        if rows >= self.min_height and cols >= self.min_width:
+            return None
+        output_size = (max(rows, self.min_height), max(cols, self.min_width))
+        return KeypointsAffineWarp(np.eye(3), output_size=output_size, image_pad_value=self.image_pad_value, mask_pad_value=self.mask_pad_value)
+
 
-class KeypointsRandomAffineTransform(KeypointTransform):
+class KeypointsRandomAffineTransform(FusableKeypointTransform):
     """
     Apply random affine transform to image, mask and joints.
     """
@@ -300,3 +465,22 @@ class KeypointsRandomAffineTransform(KeypointTransform):
             joints[joints_outside_image, 2] = 0
 
         return image, mask, joints
+
+    def get_affine_warp(self, rows: int, cols: int) -> Optional[KeypointsAffineWarp]:
+        if random.random() < self.prob:
+            angle = random.uniform(-self.max_rotation, self.max_rotation)
+            scale = random.uniform(self.min_scale, self.max_scale)
+            dx = random.uniform(-self.max_translate, self.max_translate)
+            dy = random.uniform(-self.max_translate, self.max_translate)
+
+            matrix = np.eye(3)
+            matrix[:2] = cv2.getRotationMatrix2D((cols / 2 + dx * cols, rows / 2 + dy * rows), angle, scale)
+            return KeypointsAffineWarp(
+                matrix,
+                output_size=(rows, cols),
+                image_pad_value=self.image_pad_value,
+                mask_pad_value=self.mask_pad_value,
+                mask_interpolation=cv2.INTER_NEAREST,
+                hide_outside_joints=True,
+            )
+        return None
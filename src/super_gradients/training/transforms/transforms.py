@@ -15,6 +15,7 @@ from super_gradients.training.utils.detection_utils import get_mosaic_coordinate
 from super_gradients.training.datasets.data_formats import ConcatenatedTensorFormatConverter
 from super_gradients.training.datasets.data_formats.formats import filter_on_bboxes, ConcatenatedTensorFormat
 from super_gradients.training.datasets.data_formats.default_formats import XYXY_LABEL, LABEL_CXCYWH
+from super_gradients.training.transforms.buffer_pool import BufferPool, get_buffer_pool
 
 image_resample = Image.BILINEAR
 mask_resample = Image.NEAREST
@@ -23,6 +24,14 @@ logger = get_logger(__name__)
 
 
 class SegmentationTransform:
+    """
+    Segmentation transform base class.
+
+    The transforms are applied on samples {"image": image, "mask": mask}, where the image and mask are either PIL images, or numpy
+     arrays (image of shape [H, W, 3] in RGB uint8 and mask of shape [H, W]) which are transformed with OpenCV.
+     The random parameters are drawn once and shared by the image and the mask, in the same way for both types.
+    """
+
     def __call__(self, *args, **kwargs):
         raise NotImplementedError
 
@@ -38,8 +47,7 @@ class SegResize(SegmentationTransform):
     def __call__(self, sample):
         image = sample["image"]
         mask = sample["mask"]
-        sample["image"] = image.resize((self.w, self.h), image_resample)
-        sample["mask"] = mask.resize((self.w, self.h), mask_resample)
+        sample["image"], sample["mask"] = _resize_image_and_mask(image, mask, (self.w, self.h))
         return sample
 
 
@@ -56,8 +64,11 @@ class SegRandomFlip(SegmentationTransform):
         image = sample["image"]
         mask = sample["mask"]
         if random.random() < self.prob:
-            image = image.transpose(Image.FLIP_LEFT_RIGHT)
-            mask = mask.transpose(Image.FLIP_LEFT_RIGHT)
+            if isinstance(image, np.ndarray):
+                image, mask = cv2.flip(image, 1), cv2.flip(mask, 1)
+            else:
+                image = image.transpose(Image.FLIP_LEFT_RIGHT)
+                mask = mask.transpose(Image.FLIP_LEFT_RIGHT)
             sample["image"] = image
             sample["mask"] = mask
 
@@ -88,7 +99,7 @@ class SegRescale(SegmentationTransform):
     def __call__(self, sample: dict):
         image = sample["image"]
         mask = sample["mask"]
-        w, h = image.size
+        w, h = _get_image_size(image)
         if self.scale_factor is not None:
             scale = self.scale_factor
         elif self.short_size is not None:
@@ -100,8 +111,7 @@ class SegRescale(SegmentationTransform):
 
         out_size = int(scale * w), int(scale * h)
 
-        image = image.resize(out_size, image_resample)
-        mask = mask.resize(out_size, mask_resample)
+        image, mask = _resize_image_and_mask(image, mask, out_size)
 
         sample["image"] = image
         sample["mask"] = mask
@@ -137,13 +147,12 @@ class SegRandomRescale:
     def __call__(self, sample: dict):
         image = sample["image"]
         mask = sample["mask"]
-        w, h = image.size
+        w, h = _get_image_size(image)
 
         scale = random.uniform(self.scales[0], self.scales[1])
         out_size = int(scale * w), int(scale * h)
 
-        image = image.resize(out_size, image_resample)
-        mask = mask.resize(out_size, mask_resample)
+        image, mask = _resize_image_and_mask(image, mask, out_size)
 
         sample["image"] = image
         sample["mask"] = mask
@@ -186,8 +195,15 @@ class SegRandomRotate(SegmentationTransform):
         mask = sample["mask"]
 
         deg = random.uniform(self.min_deg, self.max_deg)
-        image = image.rotate(deg, resample=image_resample, fillcolor=self.fill_image)
-        mask = mask.rotate(deg, resample=mask_resample, fillcolor=self.fill_mask)
+        if isinstance(image, np.ndarray):
+            # Same rotation as PIL: counter-clockwise around the center of the image (pixel centers are at integer coordinates in OpenCV)
+            h, w = image.shape[:2]
+            matrix = cv2.getRotationMatrix2D(((w - 1) / 2, (h - 1) / 2), deg, 1.0)
+            image = cv2.warpAffine(image, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=self.fill_image)
+            mask = cv2.warpAffine(mask, matrix, (w, h), flags=cv2.INTER_NEAREST, borderMode=cv2.BORDER_CONSTANT, borderValue=self.fill_mask)
+        else:
+            image = image.rotate(deg, resample=image_resample, fillcolor=self.fill_image)
+            mask = mask.rotate(deg, resample=mask_resample, fillcolor=self.fill_mask)
 
         sample["image"] = image
         sample["mask"] = mask
@@ -223,7 +239,7 @@ class SegCropImageAndMask(SegmentationTransform):
         image = sample["image"]
         mask = sample["mask"]
 
-        w, h = image.size
+        w, h = _get_image_size(image)
         if self.mode == "random":
             x1 = random.randint(0, w - self.crop_size[0])
             y1 = random.randint(0, h - self.crop_size[1])
@@ -231,8 +247,12 @@ class SegCropImageAndMask(SegmentationTransform):
             x1 = int(round((w - self.crop_size[0]) / 2.0))
             y1 = int(round((h - self.crop_size[1]) / 2.0))
 
-        image = image.crop((x1, y1, x1 + self.crop_size[0], y1 + self.crop_size[1]))
-        mask = mask.crop((x1, y1, x1 + self.crop_size[0], y1 + self.crop_size[1]))
+        if isinstance(image, np.ndarray):
+            image = _crop_array(image, x1, y1, self.crop_size[0], self.crop_size[1])
+            mask = _crop_array(mask, x1, y1, self.crop_size[0], self.crop_size[1])
+        else:
+            image = image.crop((x1, y1, x1 + self.crop_size[0], y1 + self.crop_size[1]))
+            mask = mask.crop((x1, y1, x1 + self.crop_size[0], y1 + self.crop_size[1]))
 
         sample["image"] = image
         sample["mask"] = mask
@@ -263,7 +283,12 @@ class SegRandomGaussianBlur(SegmentationTransform):
         mask = sample["mask"]
 
         if random.random() < self.prob:
-            image = image.filter(ImageFilter.GaussianBlur(radius=random.random()))
+            radius = random.random()
+            if not isinstance(image, np.ndarray):
+                image = image.filter(ImageFilter.GaussianBlur(radius=radius))
+            elif radius > 0:
+                # The radius of PIL's GaussianBlur is the standard deviation of the kernel
+                image = cv2.GaussianBlur(image, (0, 0), sigmaX=radius)
 
         sample["image"] = image
         sample["mask"] = mask
@@ -294,7 +319,7 @@ class SegPadShortToCropSize(SegmentationTransform):
     def __call__(self, sample: dict):
         image = sample["image"]
         mask = sample["mask"]
-        w, h = image.size
+        w, h = _get_image_size(image)
 
         # pad images from center symmetrically
         if w < self.crop_size[0] or h < self.crop_size[1]:
@@ -303,8 +328,12 @@ class SegPadShortToCropSize(SegmentationTransform):
             padw = (self.crop_size[0] - w) / 2 if w < self.crop_size[0] else 0
             pad_left, pad_right = math.ceil(padw), math.floor(padw)
 
-            image = ImageOps.expand(image, border=(pad_left, pad_top, pad_right, pad_bottom), fill=self.fill_image)
-            mask = ImageOps.expand(mask, border=(pad_left, pad_top, pad_right, pad_bottom), fill=self.fill_mask)
+            if isinstance(image, np.ndarray):
+                image = cv2.copyMakeBorder(image, pad_top, pad_bottom, pad_left, pad_right, cv2.BORDER_CONSTANT, value=self.fill_image)
+                mask = cv2.copyMakeBorder(mask, pad_top, pad_bottom, pad_left, pad_right, cv2.BORDER_CONSTANT, value=self.fill_mask)
+            else:
+                image = ImageOps.expand(image, border=(pad_left, pad_top, pad_right, pad_bottom), fill=self.fill_image)
+                mask = ImageOps.expand(mask, border=(pad_left, pad_top, pad_right, pad_bottom), fill=self.fill_mask)
 
         sample["image"] = image
         sample["mask"] = mask
@@ -321,10 +350,73 @@ class SegPadShortToCropSize(SegmentationTransform):
 
 
 class SegColorJitter(transforms.ColorJitter):
+    """
+    Randomly changes the brightness, contrast, saturation and hue of the image, like torchvision's ColorJitter.
+    Numpy images (RGB uint8) are jittered with OpenCV and lookup tables, with the same random parameters as torchvision.
+    """
+
     def __call__(self, sample):
-        sample["image"] = super(SegColorJitter, self).__call__(sample["image"])
+        if isinstance(sample["image"], np.ndarray):
+            sample["image"] = self._jitter_array(sample["image"])
+        else:
+            sample["image"] = super(SegColorJitter, self).__call__(sample["image"])
         return sample
 
+    def _jitter_array(self, image: np.ndarray) -> np.ndarray:
+        fn_idx, brightness_factor, contrast_factor, saturation_factor, hue_factor = self.get_params(self.brightness, self.contrast, self.saturation, self.hue)
+        values = np.arange(256, dtype=np.float32)
+        for fn_id in fn_idx:
+            if fn_id == 0 and brightness_factor is not None:
+                image = cv2.LUT(image, _to_uint8_lut(values * brightness_factor))
+            elif fn_id == 1 and contrast_factor is not None:
+                # Blend with the mean of the grayscale image, rounded like PIL's ImageEnhance.Contrast
+                mean = int(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY).mean() + 0.5)
+                image = cv2.LUT(image, _to_uint8_lut(mean + (values - mean) * contrast_factor))
+            elif fn_id == 2 and saturation_factor is not None:
+                gray = cv2.cvtColor(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY), cv2.COLOR_GRAY2RGB)
+                image = cv2.addWeighted(image, saturation_factor, gray, 1 - saturation_factor, 0)
+            elif fn_id == 3 and hue_factor is not None:
+                # Shift of the hue in [0, 255], wrapping around like torchvision
+                hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV_FULL)
+                lut = np.stack([(np.arange(256) + int(hue_factor * 255)) % 256, np.arange(256), np.arange(256)], axis=-1).astype(np.uint8)
+                image = cv2.cvtColor(cv2.LUT(hsv, lut.reshape(256, 1, 3)), cv2.COLOR_HSV2RGB_FULL)
+        return image
+
+
+def _get_image_size(image) -> Tuple[int, int]:
+    """Get the (width, height) of a PIL image, or of a numpy image of shape [H, W, C]"""
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    return image.size
+
+
+def _resize_image_and_mask(image, mask, out_size: Tuple[int, int]) -> tuple:
+    """Resize an image and its mask (PIL images or numpy arrays) to out_size (width, height)"""
+    if not isinstance(image, np.ndarray):
+        return image.resize(out_size, image_resample), mask.resize(out_size, mask_resample)
+
+    # Unlike PIL, OpenCV's bilinear interpolation does not filter the image when downscaling, INTER_AREA does
+    interpolation = cv2.INTER_AREA if out_size[0] < image.shape[1] else cv2.INTER_LINEAR
+    # INTER_NEAREST_EXACT picks the same pixels as PIL's nearest interpolation
+    return cv2.resize(image, out_size, interpolation=interpolation), cv2.resize(mask, out_size, interpolation=cv2.INTER_NEAREST_EXACT)
+
+
+def _crop_array(array: np.ndarray, x1: int, y1: int, crop_w: int, crop_h: int) -> np.ndarray:
+    """Crop a numpy image or mask like PIL's crop, i.e. the parts of the crop outside of the array are filled with zeros"""
+    h, w = array.shape[:2]
+    if x1 >= 0 and y1 >= 0 and x1 + crop_w <= w and y1 + crop_h <= h:
+        return array[y1 : y1 + crop_h, x1 : x1 + crop_w]
+
+    cropped = np.zeros((crop_h, crop_w) + array.shape[2:], dtype=array.dtype)
+    src_x1, src_y1, src_x2, src_y2 = max(x1, 0), max(y1, 0), min(x1 + crop_w, w), min(y1 + crop_h, h)
+    if src_x2 > src_x1 and src_y2 > src_y1:
+        cropped[src_y1 - y1 : src_y2 - y1, src_x1 - x1 : src_x2 - x1] = array[src_y1:src_y2, src_x1:src_x2]
+    return cropped
+
+
+def _to_uint8_lut(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.round(values), 0, 255).astype(np.uint8)
+
 
 def _validate_fill_values_arguments(fill_mask: int, fill_image: Union[int, Tuple, List]):
     if not isinstance(fill_image, collections.abc.Iterable):
@@ -381,15 +473,17 @@ class DetectionMosaic(DetectionTransform):
         prob: (float) probability of applying mosaic.
         enable_mosaic: (bool) whether to apply mosaic at all (regardless of prob) (default=True).
         border_value: value for filling borders after applying transforms (default=114).
+        use_buffer_pool: (bool) whether to borrow the mosaic image from the buffer pool of the process instead of allocating it (default=False).
 
     """
 
-    def __init__(self, input_dim: tuple, prob: float = 1.0, enable_mosaic: bool = True, border_value=114):
+    def __init__(self, input_dim: tuple, prob: float = 1.0, enable_mosaic: bool = True, border_value=114, use_buffer_pool: bool = False):
         super(DetectionMosaic, self).__init__(additional_samples_count=3)
         self.prob = prob
         self.input_dim = input_dim
         self.enable_mosaic = enable_mosaic
         self.border_value = border_value
+        self.use_buffer_pool = use_buffer_pool
 
     def close(self):
         self.additional_samples_count = 0
@@ -418,7 +512,7 @@ class DetectionMosaic(DetectionTransform):
                 # generate output mosaic image
                 (h, w, c) = img.shape[:3]
                 if i_mosaic == 0:
-                    mosaic_img = np.full((input_h * 2, input_w * 2, c), self.border_value, dtype=np.uint8)
+                    mosaic_img = _full((input_h * 2, input_w * 2, c), self.border_value, self.use_buffer_pool)
 
                 # suffix l means large image, while s means small image in mosaic aug.
                 (l_x1, l_y1, l_x2, l_y2), (s_x1, s_y1, s_x2, s_y2) = get_mosaic_coordinate(i_mosaic, xc, yc, w, h, input_h, input_w)
@@ -426,34 +520,12 @@ class DetectionMosaic(DetectionTransform):
                 mosaic_img[l_y1:l_y2, l_x1:l_x2] = img[s_y1:s_y2, s_x1:s_x2]
                 padw, padh = l_x1 - s_x1, l_y1 - s_y1
 
-                labels = _labels.copy()
-
-                # Normalized xywh to pixel xyxy format
-                if _labels.size > 0:
-                    labels[:, 0] = scale * _labels[:, 0] + padw
-                    labels[:, 1] = scale * _labels[:, 1] + padh
-                    labels[:, 2] = scale * _labels[:, 2] + padw
-                    labels[:, 3] = scale * _labels[:, 3] + padh
+                labels, labels_seg = _place_mosaic_targets(_labels, _labels_seg, scale, padw, padh)
                 mosaic_labels.append(labels)
-
-                if _labels_seg is not None:
-                    labels_seg = _labels_seg.copy()
-                    if _labels.size > 0:
-                        labels_seg[:, ::2] = scale * labels_seg[:, ::2] + padw
-                        labels_seg[:, 1::2] = scale * labels_seg[:, 1::2] + padh
+                if labels_seg is not None:
                     mosaic_labels_seg.append(labels_seg)
 
-            if len(mosaic_labels):
-                mosaic_labels = np.concatenate(mosaic_labels, 0)
-                np.clip(mosaic_labels[:, 0], 0, 2 * input_w, out=mosaic_labels[:, 0])
-                np.clip(mosaic_labels[:, 1], 0, 2 * input_h, out=mosaic_labels[:, 1])
-                np.clip(mosaic_labels[:, 2], 0, 2 * input_w, out=mosaic_labels[:, 2])
-                np.clip(mosaic_labels[:, 3], 0, 2 * input_h, out=mosaic_labels[:, 3])
-
-            if len(mosaic_labels_seg):
-                mosaic_labels_seg = np.concatenate(mosaic_labels_seg, 0)
-                np.clip(mosaic_labels_seg[:, ::2], 0, 2 * input_w, out=mosaic_labels_seg[:, ::2])
-                np.clip(mosaic_labels_seg[:, 1::2], 0, 2 * input_h, out=mosaic_labels_seg[:, 1::2])
+            mosaic_labels, mosaic_labels_seg = _concatenate_mosaic_targets(mosaic_labels, mosaic_labels_seg, input_h, input_w)
 
             sample["image"] = mosaic_img
             sample["target"] = mosaic_labels
@@ -552,6 +624,199 @@ class DetectionRandomAffine(DetectionTransform):
         return sample
 
 
+class DetectionMosaicAffine(DetectionTransform):
+    """
+    DetectionMosaicAffine detection transform, equivalent to DetectionMosaic followed by DetectionRandomAffine.
+
+    Instead of building the mosaic image of shape [2 * input_h, 2 * input_w] and then warping it to target_size, the
+     placement of each of the 4 images in the mosaic is combined with the random affine matrix, and each image is warped
+     once, directly into the output image. The targets go through the same mappings as with the 2 transforms, and the
+     random parameters are drawn in the same order, so that both give the same targets for the same random state.
+
+    Attributes:
+        input_dim: (tuple) input dimension.
+        prob: (float) probability of applying mosaic.
+        enable_mosaic: (bool) whether to apply mosaic at all (regardless of prob) (default=True).
+        degrees, translate, scales, shear, target_size, filter_box_candidates, wh_thr, ar_thr, area_thr:
+            see DetectionRandomAffine.
+        border_value: value for filling borders after applying transforms (default=114).
+        use_buffer_pool: (bool) whether to borrow the output image from the buffer pool of the process instead of allocating it (default=False).
+    """
+
+    def __init__(
+        self,
+        input_dim: tuple,
+        prob: float = 1.0,
+        enable_mosaic: bool = True,
+        degrees=10,
+        translate=0.1,
+        scales=0.1,
+        shear=10,
+        target_size=(640, 640),
+        filter_box_candidates: bool = False,
+        wh_thr=2,
+        ar_thr=20,
+        area_thr=0.1,
+        border_value=114,
+        use_buffer_pool: bool = False,
+    ):
+        super(DetectionMosaicAffine, self).__init__(additional_samples_count=3)
+        self.input_dim = input_dim
+        self.prob = prob
+        self.enable_mosaic = enable_mosaic
+        self.degrees = degrees
+        self.translate = translate
+        self.scale = scales
+        self.shear = shear
+        self.target_size = target_size
+        self.enable = True
+        self.filter_box_candidates = filter_box_candidates
+        self.wh_thr = wh_thr
+        self.ar_thr = ar_thr
+        self.area_thr = area_thr
+        self.border_value = border_value
+        self.use_buffer_pool = use_buffer_pool
+
+    def close(self):
+        self.additional_samples_count = 0
+        self.enable_mosaic = False
+        self.enable = False
+
+    def __call__(self, sample: dict):
+        if not (self.enable_mosaic and random.random() < self.prob):
+            if self.enable:
+                sample["image"], sample["target"] = random_affine(
+                    sample["image"],
+                    sample["target"],
+                    sample.get("target_seg"),
+                    target_size=self.target_size,
+                    degrees=self.degrees,
+                    translate=self.translate,
+                    scales=self.scale,
+                    shear=self.shear,
+                    filter_box_candidates=self.filter_box_candidates,
+                    wh_thr=self.wh_thr,
+                    area_thr=self.area_thr,
+                    ar_thr=self.ar_thr,
+                    border_value=self.border_value,
+                )
+            return sample
+
+        input_h, input_w = self.input_dim[0], self.input_dim[1]
+        yc = int(random.uniform(0.5 * input_h, 1.5 * input_h))
+        xc = int(random.uniform(0.5 * input_w, 1.5 * input_w))
+
+        if self.enable:
+            M, _ = get_affine_matrix(self.target_size, self.degrees, self.translate, self.scale, self.shear)
+            output_size = tuple(self.target_size)
+        else:
+            M = np.eye(3)[:2]
+            output_size = (2 * input_w, 2 * input_h)
+
+        # 3 additional samples, total of 4
+        all_samples = [sample] + sample["additional_samples"]
+        output_img = self._get_empty_output(output_size, sample["image"].shape[2], M, input_h, input_w)
+
+        mosaic_labels, mosaic_labels_seg = [], []
+        for i_mosaic, mosaic_sample in enumerate(all_samples):
+            img = mosaic_sample["image"]
+            h0, w0 = img.shape[:2]
+            scale = min(1.0 * input_h / h0, 1.0 * input_w / w0)
+            w, h = int(w0 * scale), int(h0 * scale)
+
+            (l_x1, l_y1, l_x2, l_y2), (s_x1, s_y1, s_x2, s_y2) = get_mosaic_coordinate(i_mosaic, xc, yc, w, h, input_h, input_w)
+            padw, padh = l_x1 - s_x1, l_y1 - s_y1
+            if l_x2 > l_x1 and l_y2 > l_y1:
+                self._warp_into(output_img, img, M, (w / w0, h / h0), (padw, padh), (l_x1, l_y1, l_x2, l_y2))
+
+            labels, labels_seg = _place_mosaic_targets(mosaic_sample["target"], mosaic_sample.get("target_seg"), scale, padw, padh)
+            mosaic_labels.append(labels)
+            if labels_seg is not None:
+                mosaic_labels_seg.append(labels_seg)
+
+        mosaic_labels, mosaic_labels_seg = _concatenate_mosaic_targets(mosaic_labels, mosaic_labels_seg, input_h, input_w)
+        if self.enable:
+            targets_seg = mosaic_labels_seg if len(mosaic_labels_seg) else np.zeros((mosaic_labels.shape[0], 0))
+            mosaic_labels = _apply_affine_to_targets(
+                mosaic_labels,
+                targets_seg,
+                self.target_size,
+                M,
+                self.filter_box_candidates,
+                wh_thr=self.wh_thr,
+                ar_thr=self.ar_thr,
+                area_thr=self.area_thr,
+            )
+
+        sample["image"] = output_img
+        sample["target"] = mosaic_labels
+        sample["info"] = (2 * input_w, 2 * input_h)
+        if len(mosaic_labels_seg):
+            sample["target_seg"] = mosaic_labels_seg
+        return sample
+
+    def _get_empty_output(self, output_size: Tuple[int, int], channels: int, M: np.ndarray, input_h: int, input_w: int) -> np.ndarray:
+        """
+        Get the output image before warping the images into it, with the same borders as the 2 transforms: the mosaic is filled
+         with border_value, and the rest of the output with the border of cv2.warpAffine (in which a scalar only fills the first channel).
+        """
+        mosaic_fill = np.broadcast_to(np.array(self.border_value, dtype=np.uint8), (channels,))
+        output_img = _empty((output_size[1], output_size[0], channels), np.uint8, self.use_buffer_pool)
+        if not self.enable:
+            output_img[:] = mosaic_fill
+            return output_img
+
+        warp_border_values = np.atleast_1d(self.border_value)[:channels]
+        output_img[:] = 0
+        output_img[..., : len(warp_border_values)] = warp_border_values
+
+        mosaic_corners = np.array([[-0.5, -0.5, 1], [2 * input_w - 0.5, -0.5, 1], [2 * input_w - 0.5, 2 * input_h - 0.5, 1], [-0.5, 2 * input_h - 0.5, 1]])
+        shift = 4
+        cv2.fillConvexPoly(output_img, np.round(mosaic_corners @ M.T * (1 << shift)).astype(np.int32), mosaic_fill.tolist(), shift=shift)
+        return output_img
+
+    @staticmethod
+    def _warp_into(output_img: np.ndarray, img: np.ndarray, M: np.ndarray, img_scale: Tuple[float, float], pad: Tuple[int, int], tile: Tuple[int, ...]):
+        """
+        Warp the part of an image that is visible in its tile of the mosaic directly into the output image.
+
+        :param output_img:  Output image, modified inplace
+        :param img:         Image, at its original size
+        :param M:           Affine matrix from the mosaic to the output image
+        :param img_scale:   (x, y) scale of the image in the mosaic
+        :param pad:         (x, y) offset of the resized image in the mosaic
+        :param tile:        (x1, y1, x2, y2) tile of the image in the mosaic
+        """
+        (sx, sy), (padw, padh), (l_x1, l_y1, l_x2, l_y2) = img_scale, pad, tile
+        h0, w0 = img.shape[:2]
+
+        # Pixels of the original image used by the bilinear interpolation of the tile (same pixel centers as cv2.resize)
+        x1 = min(max(math.floor((l_x1 - padw + 0.5) / sx - 0.5), 0), w0 - 1)
+        x2 = min(max(math.ceil((l_x2 - padw - 0.5) / sx - 0.5) + 1, x1 + 1), w0)
+        y1 = min(max(math.floor((l_y1 - padh + 0.5) / sy - 0.5), 0), h0 - 1)
+        y2 = min(max(math.ceil((l_y2 - padh - 0.5) / sy - 0.5) + 1, y1 + 1), h0)
+
+        # Crop of the original image -> mosaic -> output image
+        crop_to_mosaic = np.array([[sx, 0, sx * (x1 + 0.5) - 0.5 + padw], [0, sy, sy * (y1 + 0.5) - 0.5 + padh], [0, 0, 1]])
+        crop_to_output = M @ crop_to_mosaic
+
+        # Only the bounding box of the tile in the output image is warped, inplace (borders are left untouched by BORDER_TRANSPARENT)
+        tile_corners = np.array([[l_x1 - 0.5, l_y1 - 0.5, 1], [l_x2 - 0.5, l_y1 - 0.5, 1], [l_x1 - 0.5, l_y2 - 0.5, 1], [l_x2 - 0.5, l_y2 - 0.5, 1]])
+        tile_xs, tile_ys = tile_corners @ M[0], tile_corners @ M[1]
+        roi_x1 = min(max(math.floor(tile_xs.min()) - 1, 0), output_img.shape[1])
+        roi_x2 = min(max(math.ceil(tile_xs.max()) + 2, roi_x1), output_img.shape[1])
+        roi_y1 = min(max(math.floor(tile_ys.min()) - 1, 0), output_img.shape[0])
+        roi_y2 = min(max(math.ceil(tile_ys.max()) + 2, roi_y1), output_img.shape[0])
+        if roi_x2 == roi_x1 or roi_y2 == roi_y1:
+            return
+        crop_to_output[:, 2] -= (roi_x1, roi_y1)
+
+        roi = output_img[roi_y1:roi_y2, roi_x1:roi_x2]
+        cv2.warpAffine(
+            img[y1:y2, x1:x2], crop_to_output, dsize=(roi.shape[1], roi.shape[0]), dst=roi, borderMode=cv2.BORDER_TRANSPARENT, flags=cv2.INTER_LINEAR
+        )
+
+
 class DetectionMixup(DetectionTransform):
     """
     Mixup detection transform
@@ -563,10 +828,12 @@ class DetectionMixup(DetectionTransform):
         enable_mixup: (bool) whether to apply mixup at all (regardless of prob) (default=True).
         flip_prob: (float) prbability to apply horizontal flip to the additional sample.
         border_value: value for filling borders after applying transform (default=114).
+        use_buffer_pool: (bool) whether to borrow the intermediate and output images from the buffer pool of the process
+            instead of allocating them (default=False).
 
     """
 
-    def __init__(self, input_dim, mixup_scale, prob=1.0, enable_mixup=True, flip_prob=0.5, border_value=114):
+    def __init__(self, input_dim, mixup_scale, prob=1.0, enable_mixup=True, flip_prob=0.5, border_value=114, use_buffer_pool: bool = False):
         super(DetectionMixup, self).__init__(additional_samples_count=1, non_empty_targets=True)
         self.input_dim = input_dim
         self.mixup_scale = mixup_scale
@@ -574,6 +841,7 @@ class DetectionMixup(DetectionTransform):
         self.enable_mixup = enable_mixup
         self.flip_prob = flip_prob
         self.border_value = border_value
+        self.use_buffer_pool = use_buffer_pool
 
     def close(self):
         self.additional_samples_count = 0
@@ -592,10 +860,7 @@ class DetectionMixup(DetectionTransform):
 
             jit_factor = random.uniform(*self.mixup_scale)
 
-            if len(img.shape) == 3:
-                cp_img = np.ones((self.input_dim[0], self.input_dim[1], img.shape[2]), dtype=np.uint8) * self.border_value
-            else:
-                cp_img = np.ones(self.input_dim, dtype=np.uint8) * self.border_value
+            cp_img = _full((self.input_dim[0], self.input_dim[1]) + img.shape[2:], self.border_value, self.use_buffer_pool)
 
             cp_scale_ratio = min(self.input_dim[0] / img.shape[0], self.input_dim[1] / img.shape[1])
             resized_img = cv2.resize(
@@ -615,10 +880,7 @@ class DetectionMixup(DetectionTransform):
             origin_h, origin_w = cp_img.shape[:2]
             target_h, target_w = origin_img.shape[:2]
 
-            if len(img.shape) == 3:
-                padded_img = np.zeros((max(origin_h, target_h), max(origin_w, target_w), img.shape[2]), dtype=np.uint8)
-            else:
-                padded_img = np.zeros((max(origin_h, target_h), max(origin_w, target_w)), dtype=np.uint8)
+            padded_img = _full((max(origin_h, target_h), max(origin_w, target_w)) + img.shape[2:], 0, self.use_buffer_pool)
 
             padded_img[:origin_h, :origin_w] = cp_img
 
@@ -638,10 +900,15 @@ class DetectionMixup(DetectionTransform):
             box_labels = cp_bboxes_transformed_np
             labels = np.hstack((box_labels, cls_labels))
             origin_labels = np.vstack((origin_labels, labels))
-            origin_img = origin_img.astype(np.float32)
-            origin_img = 0.5 * origin_img + 0.5 * padded_cropped_img.astype(np.float32)
+            if origin_img.dtype == np.uint8:
+                # Same as the float average below, rounded down, without the float copies
+                mixed_img = np.add(origin_img, padded_cropped_img, out=_empty(origin_img.shape, np.uint16, self.use_buffer_pool), dtype=np.uint16)
+                origin_img = np.right_shift(mixed_img, 1, out=_empty(origin_img.shape, np.uint8, self.use_buffer_pool), casting="unsafe")
+            else:
+                origin_img = origin_img.astype(np.float32)
+                origin_img = (0.5 * origin_img + 0.5 * padded_cropped_img.astype(np.float32)).astype(np.uint8)
 
-            sample["image"], sample["target"] = origin_img.astype(np.uint8), origin_labels
+            sample["image"], sample["target"] = origin_img, origin_labels
         return sample
 
 
@@ -655,18 +922,31 @@ class DetectionPaddedRescale(DetectionTransform):
     Attributes:
         input_dim: (tuple) final input dimension (default=(640,640))
         swap: image axis's to be rearranged.
+        keep_uint8: (bool) whether to output the image in uint8 instead of float32, to convert it only once per batch
+            in the collate function (see DetectionCollateFN) (default=False).
+        use_buffer_pool: (bool) whether to borrow the intermediate and output images from the buffer pool of the process
+            instead of allocating them (default=False).
 
     """
 
-    def __init__(self, input_dim, swap=(2, 0, 1), max_targets=50, pad_value=114):
+    def __init__(self, input_dim, swap=(2, 0, 1), max_targets=50, pad_value=114, keep_uint8: bool = False, use_buffer_pool: bool = False):
         self.swap = swap
         self.input_dim = input_dim
         self.max_targets = max_targets
         self.pad_value = pad_value
+        self.keep_uint8 = keep_uint8
+        self.use_buffer_pool = use_buffer_pool
 
     def __call__(self, sample: Dict[str, np.array]):
         img, targets, crowd_targets = sample["image"], sample["target"], sample.get("crowd_target")
-        img, r = rescale_and_pad_to_size(img, self.input_dim, self.swap, self.pad_value)
+        img, r = rescale_and_pad_to_size(
+            img,
+            self.input_dim,
+            self.swap,
+            self.pad_value,
+            dtype=np.uint8 if self.keep_uint8 else np.float32,
+            buffer_pool=get_buffer_pool() if self.use_buffer_pool else None,
+        )
 
         sample["image"] = img
         sample["target"] = self._rescale_target(targets, r)
@@ -849,16 +1129,19 @@ class DetectionHSV(DetectionTransform):
         vgain: (float) value gain (default=0.5)
         bgr_channels: (tuple) channel indices of the BGR channels- useful for images with >3 channels,
          or when BGR channels are in different order. (default=(0,1,2)).
+        use_lut: (bool) whether to shift the HSV values of uint8 images with a lookup table (see augment_hsv_lut), which gives the
+         same output as augment_hsv faster (default=True).
 
     """
 
-    def __init__(self, prob: float, hgain: float = 0.5, sgain: float = 0.5, vgain: float = 0.5, bgr_channels=(0, 1, 2)):
+    def __init__(self, prob: float, hgain: float = 0.5, sgain: float = 0.5, vgain: float = 0.5, bgr_channels=(0, 1, 2), use_lut: bool = True):
         super(DetectionHSV, self).__init__()
         self.prob = prob
         self.hgain = hgain
         self.sgain = sgain
         self.vgain = vgain
         self.bgr_channels = bgr_channels
+        self.use_lut = use_lut
         self._additional_channels_warned = False
 
     def __call__(self, sample: dict) -> dict:
@@ -874,7 +1157,10 @@ class DetectionHSV(DetectionTransform):
             )
             self._additional_channels_warned = True
         if random.random() < self.prob:
-            augment_hsv(sample["image"], self.hgain, self.sgain, self.vgain, self.bgr_channels)
+            if self.use_lut and sample["image"].dtype == np.uint8:
+                augment_hsv_lut(sample["image"], self.hgain, self.sgain, self.vgain, self.bgr_channels)
+            else:
+                augment_hsv(sample["image"], self.hgain, self.sgain, self.vgain, self.bgr_channels)
         return sample
 
 
@@ -1060,7 +1346,7 @@ def apply_affine_to_bboxes(targets, targets_seg, target_size, M):
         corner_ys = corner_points[:, 1::2]
         new_bboxes = np.concatenate((np.min(corner_xs, 1), np.min(corner_ys, 1), np.max(corner_xs, 1), np.max(corner_ys, 1))).reshape(4, -1).T
     else:
-        new_bboxes = np.ones((0, 4), dtype=np.float)
+        new_bboxes = np.ones((0, 4), dtype=np.float64)
 
     if num_gts_masks:
         # warp segmentation points
@@ -1079,7 +1365,7 @@ def apply_affine_to_bboxes(targets, targets_seg, target_size, M):
             .T
         )
     else:
-        new_tight_bboxes = np.ones((0, 4), dtype=np.float)
+        new_tight_bboxes = np.ones((0, 4), dtype=np.float64)
 
     targets[~seg_is_present_mask, :4] = new_bboxes
     targets[seg_is_present_mask, :4] = new_tight_bboxes
@@ -1141,14 +1427,102 @@ def random_affine(
 
     img = cv2.warpAffine(img, M, dsize=target_size, borderValue=border_value)
 
-    # Transform label coordinates
+    targets = _apply_affine_to_targets(targets, targets_seg, target_size, M, filter_box_candidates, wh_thr=wh_thr, ar_thr=ar_thr, area_thr=area_thr)
+    return img, targets
+
+
+def _apply_affine_to_targets(targets, targets_seg, target_size, M, filter_box_candidates: bool, wh_thr=2, ar_thr=20, area_thr=0.1):
+    """
+    Transform label coordinates with an affine matrix (see random_affine for the parameters).
+    """
+    if len(targets) > 0 and (targets_seg is None or targets_seg.size == 0):
+        return _apply_affine_to_boxes(targets, target_size, M, filter_box_candidates, wh_thr=wh_thr, ar_thr=ar_thr, area_thr=area_thr)
     if len(targets) > 0:
         targets_orig = targets.copy()
         targets = apply_affine_to_bboxes(targets, targets_seg, target_size, M)
         if filter_box_candidates:
             box_candidates_ids = _filter_box_candidates(targets_orig[:, :4], targets[:, :4], wh_thr=wh_thr, ar_thr=ar_thr, area_thr=area_thr)
             targets = targets[box_candidates_ids]
-    return img, targets
+    return targets
+
+
+def _apply_affine_to_boxes(targets, target_size, M, filter_box_candidates: bool, wh_thr=2, ar_thr=20, area_thr=0.1):
+    """
+    Fast path of _apply_affine_to_targets for targets without segmentation points, giving the same targets as
+     apply_affine_to_bboxes followed by _filter_box_candidates with much fewer numpy calls.
+    """
+    twidth, theight = target_size
+    boxes_orig = targets[:, :4].copy() if filter_box_candidates else None
+
+    # Corners x1y1, x2y2, x1y2, x2y1 of all the boxes in homogeneous coordinates [N, 4, 3], warped with a single matrix product
+    corners = np.ones((len(targets), 4, 3))
+    corners[:, :, :2] = targets[:, [0, 1, 2, 3, 0, 3, 2, 1]].reshape(-1, 4, 2)
+    corners = (corners.reshape(-1, 3) @ M.T).reshape(-1, 4, 2)
+
+    # Min/max over the 4 corners, with elementwise minimum/maximum which are much faster than reductions over such a small axis
+    new_boxes = np.empty((len(targets), 4))
+    np.minimum(corners[:, 0], corners[:, 1], out=new_boxes[:, :2])
+    np.minimum(new_boxes[:, :2], np.minimum(corners[:, 2], corners[:, 3]), out=new_boxes[:, :2])
+    np.maximum(corners[:, 0], corners[:, 1], out=new_boxes[:, 2:])
+    np.maximum(new_boxes[:, 2:], np.maximum(corners[:, 2], corners[:, 3]), out=new_boxes[:, 2:])
+    np.maximum(new_boxes, 0, out=new_boxes)
+    np.minimum(new_boxes, np.array([twidth, theight, twidth, theight], dtype=new_boxes.dtype), out=new_boxes)
+    targets[:, :4] = new_boxes
+
+    if not filter_box_candidates:
+        return targets
+    # Same criteria as _filter_box_candidates (on the boxes cast to the type of the targets), computed on both dimensions at once
+    wh_orig = boxes_orig[:, 2:] - boxes_orig[:, :2]
+    wh = targets[:, 2:4] - targets[:, :2]
+    aspect_ratios = wh / (wh[:, ::-1] + 1e-16)
+    keep = (np.minimum(wh[:, 0], wh[:, 1]) > wh_thr) & (np.maximum(aspect_ratios[:, 0], aspect_ratios[:, 1]) < ar_thr)
+    keep &= wh[:, 0] * wh[:, 1] / (wh_orig[:, 0] * wh_orig[:, 1] + 1e-16) > area_thr
+    return targets[keep]
+
+
+def _place_mosaic_targets(labels: np.ndarray, labels_seg: Optional[np.ndarray], scale: float, padw: int, padh: int):
+    """
+    Move the targets of an image to its place in the mosaic.
+
+    :param labels:      Targets of the image, XYXY first
+    :param labels_seg:  Targets derived from segmentation masks of the image, if any
+    :param scale:       Scale of the image in the mosaic
+    :param padw:        Horizontal offset of the resized image in the mosaic
+    :param padh:        Vertical offset of the resized image in the mosaic
+    :return:            labels, labels_seg in the coordinates of the mosaic
+    """
+    placed_labels = labels.copy()
+    if labels.size > 0:
+        placed_labels[:, [0, 2]] = scale * labels[:, [0, 2]] + padw
+        placed_labels[:, [1, 3]] = scale * labels[:, [1, 3]] + padh
+
+    placed_labels_seg = None
+    if labels_seg is not None:
+        placed_labels_seg = labels_seg.copy()
+        if labels.size > 0:
+            placed_labels_seg[:, ::2] = scale * labels_seg[:, ::2] + padw
+            placed_labels_seg[:, 1::2] = scale * labels_seg[:, 1::2] + padh
+    return placed_labels, placed_labels_seg
+
+
+def _concatenate_mosaic_targets(mosaic_labels: List[np.ndarray], mosaic_labels_seg: List[np.ndarray], input_h: int, input_w: int):
+    """
+    Concatenate the targets of the images of a mosaic, and clip them to the mosaic (of shape [2 * input_h, 2 * input_w]).
+
+    :return: mosaic_labels, mosaic_labels_seg (empty list when the images do not have targets derived from segmentation masks)
+    """
+    if len(mosaic_labels):
+        mosaic_labels = np.concatenate(mosaic_labels, 0)
+        np.clip(mosaic_labels[:, 0], 0, 2 * input_w, out=mosaic_labels[:, 0])
+        np.clip(mosaic_labels[:, 1], 0, 2 * input_h, out=mosaic_labels[:, 1])
+        np.clip(mosaic_labels[:, 2], 0, 2 * input_w, out=mosaic_labels[:, 2])
+        np.clip(mosaic_labels[:, 3], 0, 2 * input_h, out=mosaic_labels[:, 3])
+
+    if len(mosaic_labels_seg):
+        mosaic_labels_seg = np.concatenate(mosaic_labels_seg, 0)
+        np.clip(mosaic_labels_seg[:, ::2], 0, 2 * input_w, out=mosaic_labels_seg[:, ::2])
+        np.clip(mosaic_labels_seg[:, 1::2], 0, 2 * input_h, out=mosaic_labels_seg[:, 1::2])
+    return mosaic_labels, mosaic_labels_seg
 
 
 def _filter_box_candidates(box1, box2, wh_thr=2, ar_thr=20, area_thr=0.1):
@@ -1186,10 +1560,14 @@ def _mirror(image, boxes, prob=0.5):
     return image, flipped_boxes
 
 
-def augment_hsv(img: np.array, hgain: float, sgain: float, vgain: float, bgr_channels=(0, 1, 2)):
+def _get_hsv_augs(hgain: float, sgain: float, vgain: float) -> np.ndarray:
     hsv_augs = np.random.uniform(-1, 1, 3) * [hgain, sgain, vgain]  # random gains
     hsv_augs *= np.random.randint(0, 2, 3)  # random selection of h, s, v
-    hsv_augs = hsv_augs.astype(np.int16)
+    return hsv_augs.astype(np.int16)
+
+
+def augment_hsv(img: np.array, hgain: float, sgain: float, vgain: float, bgr_channels=(0, 1, 2)):
+    hsv_augs = _get_hsv_augs(hgain, sgain, vgain)
     img_hsv = cv2.cvtColor(img[..., bgr_channels], cv2.COLOR_BGR2HSV).astype(np.int16)
 
     img_hsv[..., 0] = (img_hsv[..., 0] + hsv_augs[0]) % 180
@@ -1199,7 +1577,28 @@ def augment_hsv(img: np.array, hgain: float, sgain: float, vgain: float, bgr_cha
     img[..., bgr_channels] = cv2.cvtColor(img_hsv.astype(img.dtype), cv2.COLOR_HSV2BGR)  # no return needed
 
 
-def rescale_and_pad_to_size(img, input_size, swap=(2, 0, 1), pad_val=114):
+def augment_hsv_lut(img: np.array, hgain: float, sgain: float, vgain: float, bgr_channels=(0, 1, 2)):
+    """
+    Same as augment_hsv (with the same random draws and the same output) for uint8 images, but the shifts of hue, saturation
+     and value are applied with a single cv2.LUT on the HSV image, instead of int16 operations on every plane.
+
+    :param img: uint8 image, modified in place.
+    """
+    hsv_augs = _get_hsv_augs(hgain, sgain, vgain)
+    values = np.arange(256, dtype=np.int16)
+    lut = np.stack([(values + hsv_augs[0]) % 180, np.clip(values + hsv_augs[1], 0, 255), np.clip(values + hsv_augs[2], 0, 255)], axis=1)
+    lut = lut.astype(np.uint8).reshape(1, 256, 3)
+
+    in_place = tuple(bgr_channels) == (0, 1, 2) and img.shape[2] == 3 and img.flags.c_contiguous
+    img_hsv = cv2.cvtColor(img if in_place else img[..., bgr_channels], cv2.COLOR_BGR2HSV)
+    cv2.LUT(img_hsv, lut, dst=img_hsv)
+    if in_place:
+        cv2.cvtColor(img_hsv, cv2.COLOR_HSV2BGR, dst=img)
+    else:
+        img[..., bgr_channels] = cv2.cvtColor(img_hsv, cv2.COLOR_HSV2BGR)
+
+
+def rescale_and_pad_to_size(img, input_size, swap=(2, 0, 1), pad_val=114, dtype=np.float32, buffer_pool: Optional[BufferPool] = None):
     """
     Rescales image according to minimum ratio between the target height /image height, target width / image width,
     and pads the image to the target size.
@@ -1207,24 +1606,44 @@ def rescale_and_pad_to_size(img, input_size, swap=(2, 0, 1), pad_val=114):
     :param img: Image to be rescaled
     :param input_size: Target size
     :param swap: Axis's to be rearranged.
+    :param dtype: Type of the output image.
+    :param buffer_pool: If not None, the intermediate and output images are borrowed from this pool instead of being allocated.
     :return: rescaled image, ratio
     """
-    if len(img.shape) == 3:
-        padded_img = np.ones((input_size[0], input_size[1], img.shape[-1]), dtype=np.uint8) * pad_val
-    else:
-        padded_img = np.ones(input_size, dtype=np.uint8) * pad_val
+    empty, full = (buffer_pool.empty, buffer_pool.full) if buffer_pool is not None else (np.empty, np.full)
+    padded_img = full((input_size[0], input_size[1]) + img.shape[2:], pad_val, dtype=np.uint8)
 
     r = min(input_size[0] / img.shape[0], input_size[1] / img.shape[1])
-    resized_img = cv2.resize(
-        img,
-        (int(img.shape[1] * r), int(img.shape[0] * r)),
-        interpolation=cv2.INTER_LINEAR,
-    ).astype(np.uint8)
-    padded_img[: int(img.shape[0] * r), : int(img.shape[1] * r)] = resized_img
-
-    padded_img = padded_img.transpose(swap)
-    padded_img = np.ascontiguousarray(padded_img, dtype=np.float32)
-    return padded_img, r
+    resized_roi = padded_img[: int(img.shape[0] * r), : int(img.shape[1] * r)]
+    dst = resized_roi if img.dtype == np.uint8 else None
+    resized_img = cv2.resize(img, (resized_roi.shape[1], resized_roi.shape[0]), dst=dst, interpolation=cv2.INTER_LINEAR)
+    if not np.may_share_memory(resized_img, padded_img):  # Not resized inplace (e.g. single channel images, that OpenCV outputs in 2D)
+        resized_roi[:] = resized_img.astype(np.uint8).reshape(resized_roi.shape)
+
+    transposed_shape = tuple(padded_img.shape[axis] for axis in swap)
+    output_img = empty(transposed_shape, dtype=dtype)
+    if tuple(swap) == (2, 0, 1):
+        # HWC -> CHW is a transposition of a [H * W, C] matrix, which OpenCV does much faster than numpy for uint8
+        chw_img = output_img if output_img.dtype == np.uint8 else empty(transposed_shape, dtype=np.uint8)
+        transposed_img = cv2.transpose(padded_img.reshape(-1, padded_img.shape[2]), chw_img.reshape(padded_img.shape[2], -1))
+        if not np.may_share_memory(transposed_img, chw_img):
+            chw_img[:] = transposed_img.reshape(transposed_shape)
+        padded_img = chw_img
+    else:
+        padded_img = padded_img.transpose(swap)
+    if padded_img is not output_img:
+        np.copyto(output_img, padded_img, casting="unsafe")
+    return output_img, r
+
+
+def _empty(shape: Tuple[int, ...], dtype, use_buffer_pool: bool) -> np.ndarray:
+    """Uninitialized array, borrowed from the buffer pool of the process if use_buffer_pool."""
+    return get_buffer_pool().empty(shape, dtype=dtype) if use_buffer_pool else np.empty(shape, dtype=dtype)
+
+
+def _full(shape: Tuple[int, ...], fill_value, use_buffer_pool: bool) -> np.ndarray:
+    """uint8 array filled with fill_value, borrowed from the buffer pool of the process if use_buffer_pool."""
+    return get_buffer_pool().full(shape, fill_value) if use_buffer_pool else np.full(shape, fill_value, dtype=np.uint8)
 
 
 class Standardize(torch.nn.Module):
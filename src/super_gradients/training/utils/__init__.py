@@ -1,4 +1,13 @@
-from super_gradients.training.utils.utils import Timer, HpmStruct, WrappedModel, convert_to_tensor, get_param, tensor_container_to_device, random_seed
+from super_gradients.training.utils.utils import (
+    Timer,
+    HpmStruct,
+    WrappedModel,
+    convert_to_tensor,
+    get_param,
+    tensor_container_to_device,
+    random_seed,
+    DevicePrefetcher,
+)
 from super_gradients.training.utils.checkpoint_utils import adapt_state_dict_to_fit_model_layer_names, raise_informative_runtime_error
 from super_gradients.training.utils.version_utils import torch_version_is_greater_or_equal
 from super_gradients.training.utils.config_utils import raise_if_unused_params, warn_if_unused_params
@@ -10,6 +19,7 @@ __all__ = [
     "convert_to_tensor",
     "get_param",
     "tensor_container_to_device",
+    "DevicePrefetcher",
     "adapt_state_dict_to_fit_model_layer_names",
     "raise_informative_runtime_error",
     "random_seed",
@@ -1,5 +1,6 @@
 from super_gradients.common.object_names import Callbacks, LRSchedulers, LRWarmups
 from super_gradients.training.datasets.datasets_utils import DetectionMultiscalePrePredictionCallback
+from super_gradients.training.datasets.mixup import MixupPrePredictionCallback
 from super_gradients.training.utils.callbacks.callbacks import (
     DeciLabUploadCallback,
     LRCallbackBase,
@@ -26,6 +27,7 @@ CALLBACKS = {
     Callbacks.MODEL_CONVERSION_CHECK: ModelConversionCheckCallback,
     Callbacks.EARLY_STOP: EarlyStop,
     Callbacks.DETECTION_MULTISCALE_PREPREDICTION: DetectionMultiscalePrePredictionCallback,
+    Callbacks.MIXUP_PREPREDICTION: MixupPrePredictionCallback,
     Callbacks.YOLOX_TRAINING_STAGE_SWITCH: YoloXTrainingStageSwitchCallback,
 }
 
@@ -669,7 +669,7 @@ class YoloXTrainingStageSwitchCallback(TrainingStageSwitchCallbackBase):
     YoloXTrainingStageSwitchCallback
 
     Training stage switch for YoloX training.
-    Disables mosaic, and manipulates YoloX loss to use L1.
+    Disables mosaic (and the other transforms that can be closed, including the batch transforms), and manipulates YoloX loss to use L1.
 
     """
 
@@ -680,6 +680,9 @@ class YoloXTrainingStageSwitchCallback(TrainingStageSwitchCallbackBase):
         for transform in context.train_loader.dataset.transforms:
             if hasattr(transform, "close"):
                 transform.close()
+        for batch_transform in context.batch_transforms or []:
+            if hasattr(batch_transform, "close"):
+                batch_transform.close()
         iter(context.train_loader)
         context.criterion.use_l1 = True
 
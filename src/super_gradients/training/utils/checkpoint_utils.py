@@ -150,6 +150,16 @@ def read_ckpt_state_dict(ckpt_path: str, device="cpu"):
     return state_dict
 
 
+def remove_torch_compile_prefix(state_dict: dict) -> dict:
+    """
+    Remove the prefix added by torch.compile to the keys of the state dict of a compiled model (i.e. "_orig_mod."),
+    so the checkpoints of compiled models can be loaded to uncompiled models.
+        :param state_dict:  State dict of a model
+        :return:            The state dict, with the keys of the uncompiled model
+    """
+    return {key.replace("_orig_mod.", ""): value for key, value in state_dict.items()}
+
+
 def adapt_state_dict_to_fit_model_layer_names(model_state_dict: dict, source_ckpt: dict, exclude: list = [], solver: callable = None):
     """
     Given a model state dict and source checkpoints, the method tries to correct the keys in the model_state_dict to fit
@@ -216,6 +226,9 @@ def load_checkpoint_to_model(
 
     # LOAD THE LOCAL CHECKPOINT PATH INTO A state_dict OBJECT
     checkpoint = read_ckpt_state_dict(ckpt_path=ckpt_local_path)
+    for net_key in ("net", "ema_net"):
+        if net_key in checkpoint.keys():
+            checkpoint[net_key] = remove_torch_compile_prefix(checkpoint[net_key])
 
     if load_ema_as_net:
         if "ema_net" not in checkpoint.keys():
@@ -671,7 +671,11 @@ class DetectionCollateFN:
     def __call__(self, data) -> Tuple[torch.Tensor, torch.Tensor]:
         batch = default_collate(data)
         ims, targets = batch[0:2]
-        return ims, self._format_targets(targets)
+        return self._format_images(ims), self._format_targets(targets)
+
+    def _format_images(self, images: torch.Tensor) -> torch.Tensor:
+        """Convert the images to float, once per batch, when the transforms kept them in uint8 (see DetectionPaddedRescale.keep_uint8)."""
+        return images.float() if images.dtype == torch.uint8 else images
 
     def _format_targets(self, targets: torch.Tensor) -> torch.Tensor:
         nlabel = (targets.sum(dim=2) > 0).sum(dim=1)  # number of label per image
@@ -691,7 +695,7 @@ class CrowdDetectionCollateFN(DetectionCollateFN):
     def __call__(self, data) -> Tuple[torch.Tensor, torch.Tensor, Dict[str, torch.Tensor]]:
         batch = default_collate(data)
         ims, targets, crowd_targets = batch[0:3]
-        return ims, self._format_targets(targets), {"crowd_targets": self._format_targets(crowd_targets)}
+        return self._format_images(ims), self._format_targets(targets), {"crowd_targets": self._format_targets(crowd_targets)}
 
 
 def compute_box_area(box: torch.Tensor) -> torch.Tensor:
@@ -939,6 +943,201 @@ def compute_img_detection_matching(
     return preds_matched, preds_to_ignore, preds_scores, preds_cls, targets_cls
 
 
+def compute_detection_matching_batched(
+    output: List[Optional[torch.Tensor]],
+    targets: torch.Tensor,
+    height: int,
+    width: int,
+    iou_thresholds: torch.Tensor,
+    denormalize_targets: bool,
+    device: str,
+    crowd_targets: Optional[torch.Tensor] = None,
+    top_k: int = 100,
+    return_on_cpu: bool = True,
+) -> List[Tuple]:
+    """
+    Match predictions (NMS output) and the targets (ground truth) with respect to IoU and confidence score, for the whole batch at once.
+    Predictions and targets are padded into dense (batch_size, max_n, ...) tensors and the greedy matching is run with tensor ops only.
+    Since predictions of different classes never compete for the same target, the k-th best prediction of every class (of every image)
+    is matched in the same step, so the only python loop is over the prediction rank (at most top_k iterations).
+
+    The results are identical to compute_detection_matching, which this function can replace.
+
+    :param output:          list (of length batch_size) of Tensors of shape (num_predictions, 6)
+                            format:     (x1, y1, x2, y2, confidence, class_label) where x1,y1,x2,y2 are according to image size
+    :param targets:         targets for all images of shape (total_num_targets, 6)
+                            format:     (index, x, y, w, h, label) where x,y,w,h are in range [0,1]
+    :param height:          dimensions of the image
+    :param width:           dimensions of the image
+    :param iou_thresholds:  Threshold to compute the mAP
+    :param device:          Device
+    :param crowd_targets:   crowd targets for all images of shape (total_num_crowd_targets, 6)
+                            format:     (index, x, y, w, h, label) where x,y,w,h are in range [0,1]
+    :param top_k:           Number of predictions to keep per class, ordered by confidence score
+    :param denormalize_targets: If True, denormalize the targets and crowd_targets
+    :param return_on_cpu:   If True, the output will be returned on "CPU", otherwise it will be returned on "device"
+
+    :return:                list of the following tensors, for every image (see compute_detection_matching)
+    """
+    batch_size = len(output)
+    output = [torch.zeros(size=(0, 6), device=device) if img_preds is None else img_preds.to(device) for img_preds in output]
+    targets, iou_thresholds = targets.to(device), iou_thresholds.to(device)
+    crowd_targets = torch.zeros(size=(0, 6), device=device) if crowd_targets is None else crowd_targets.to(device)
+    n_iou_thresholds = len(iou_thresholds)
+
+    # PREDICTIONS: shape = (batch_size, max_n_preds, 6)
+    n_preds = torch.tensor([len(img_preds) for img_preds in output], device=device)
+    preds = torch.nn.utils.rnn.pad_sequence(output, batch_first=True) if batch_size > 0 else torch.zeros(size=(0, 0, 6), device=device)
+    max_n_preds = preds.shape[1]
+    is_pred = torch.arange(max_n_preds, device=device).view(1, -1) < n_preds.view(-1, 1)
+
+    preds_cls, preds_scores = preds[..., 5], preds[..., 4]
+    preds_box = preds[..., 0:4].clone()
+    preds_box[..., [0, 2]] = preds_box[..., [0, 2]].clamp(min=0, max=width)
+    preds_box[..., [1, 3]] = preds_box[..., [1, 3]].clamp(min=0, max=height)
+
+    # TARGETS: shape = (batch_size, max_n_targets, 5)
+    padded_targets, is_target, n_targets = _pad_targets_per_image(targets, batch_size)
+    padded_crowd_targets, is_crowd_target, _ = _pad_targets_per_image(crowd_targets, batch_size)
+
+    targets_cls, targets_box = padded_targets[..., 0], convert_xywh_bbox_to_xyxy(padded_targets[..., 1:5])
+    crowd_targets_cls, crowd_targets_box = padded_crowd_targets[..., 0], convert_xywh_bbox_to_xyxy(padded_crowd_targets[..., 1:5])
+    if denormalize_targets:
+        targets_box[..., [0, 2]] *= width
+        targets_box[..., [1, 3]] *= height
+        crowd_targets_box[..., [0, 2]] *= width
+        crowd_targets_box[..., [1, 3]] *= height
+
+    # TOP K: shape = (batch_size, top_k, n_cls), sorting_idx[b, k, c] is the index of the k-th best prediction of class c in image b
+    n_cls = int(preds_cls[is_pred].max().item()) + 1 if is_pred.any() else 0
+    cls_mask = preds_cls.unsqueeze(-1) == torch.arange(n_cls, device=device).view(1, 1, -1)
+    preds_scores_per_cls = preds_scores.unsqueeze(-1) * cls_mask
+    sorted_scores_per_cls, sorting_idx = preds_scores_per_cls.sort(dim=1, descending=True, stable=True)
+    sorted_scores_per_cls, sorting_idx = sorted_scores_per_cls[:, :top_k], sorting_idx[:, :top_k]
+    is_top_k = sorted_scores_per_cls != 0
+
+    # Scatter the top k selection back to prediction indexes: shape = (batch_size, max_n_preds)
+    is_pred_to_use = torch.zeros(batch_size, max_n_preds, dtype=torch.int32, device=device)
+    is_pred_to_use.scatter_add_(1, sorting_idx.flatten(1), is_top_k.flatten(1).to(torch.int32))
+    is_pred_to_use = is_pred_to_use.bool()
+
+    preds_matched = torch.zeros(batch_size, max_n_preds, n_iou_thresholds, dtype=torch.int32, device=device)
+    targets_matched = torch.zeros(batch_size, n_iou_thresholds, padded_targets.shape[1], dtype=torch.int32, device=device)
+    preds_to_ignore = ~is_pred_to_use.unsqueeze(-1).repeat(1, 1, n_iou_thresholds)
+
+    if padded_targets.shape[1] > 0 and n_cls > 0:
+        # shape = (batch_size, max_n_preds, max_n_targets)
+        iou = _batched_box_iou(preds_box, targets_box)
+        cls_match = preds_cls.unsqueeze(-1) == targets_cls.unsqueeze(1)
+        iou = torch.where(cls_match & is_target.unsqueeze(1), iou, torch.zeros_like(iou))
+
+        # Only iterate over the ranks where at least one prediction has an IoU higher than min threshold to speed up the process
+        has_candidate = torch.gather((iou > iou_thresholds[0]).any(-1), 1, sorting_idx.flatten(1)).view_as(is_top_k) & is_top_k
+        ranks_to_match = has_candidate.any(-1).any(0).nonzero(as_tuple=False).view(-1).tolist()
+
+        for rank_i in ranks_to_match:
+            # shape = (batch_size, n_cls), the prediction of rank rank_i for every class of every image
+            rank_preds_idx, is_rank_pred = sorting_idx[:, rank_i], has_candidate[:, rank_i]
+
+            # shape = (batch_size, n_cls, 1, max_n_targets)
+            rank_iou = torch.gather(iou, 1, rank_preds_idx.unsqueeze(-1).expand(-1, -1, iou.shape[-1])).unsqueeze(2)
+
+            # shape = (batch_size, n_cls, n_iou_thresholds, max_n_targets), True when (pred, target) can be matched for the (j)th threshold
+            is_iou_above_threshold = rank_iou > iou_thresholds.view(1, 1, -1, 1)
+            are_candidates_free = (targets_matched == 0).unsqueeze(1)
+            are_candidates_good = is_iou_above_threshold & are_candidates_free & is_rank_pred.view(batch_size, -1, 1, 1)
+
+            # For every threshold, the prediction is matched with the free target of highest IoU (lowest index on ties, like a stable sort)
+            best_target_idx = torch.where(are_candidates_good, rank_iou, torch.full_like(rank_iou, -1.0)).argmax(-1)
+            is_matched = are_candidates_good.any(-1).to(torch.int32)
+
+            # Targets of different classes are disjoint, so at most one prediction can select any given target in this step
+            targets_matched.scatter_add_(2, best_target_idx.transpose(1, 2), is_matched.transpose(1, 2))
+            preds_matched.scatter_add_(1, rank_preds_idx.unsqueeze(-1).expand(-1, -1, n_iou_thresholds), is_matched)
+
+    if padded_crowd_targets.shape[1] > 0 and n_cls > 0:
+        # shape = (batch_size, max_n_preds, max_n_crowd_targets)
+        ioa = _batched_crowd_ioa(preds_box, crowd_targets_box)
+        cls_match = preds_cls.unsqueeze(-1) == crowd_targets_cls.unsqueeze(1)
+        ioa = torch.where(cls_match & is_crowd_target.unsqueeze(1), ioa, torch.zeros_like(ioa))
+
+        # shape = (batch_size, max_n_preds, n_iou_thresholds)
+        best_ioa, _ = ioa.max(-1)
+        is_matching_with_crowd = best_ioa.unsqueeze(-1) > iou_thresholds.view(1, 1, -1)
+        preds_to_ignore |= is_matching_with_crowd
+
+    preds_matched = preds_matched.bool()
+    if return_on_cpu:
+        preds_matched, preds_to_ignore = preds_matched.to("cpu"), preds_to_ignore.to("cpu")
+        preds_scores, preds_cls = preds_scores.to("cpu"), preds_cls.to("cpu")
+        targets_cls, n_targets = targets_cls.to("cpu"), n_targets.to("cpu")
+
+    batch_metrics = []
+    for img_i, (img_n_preds, img_n_targets) in enumerate(zip(n_preds.tolist(), n_targets.tolist())):
+        batch_metrics.append(
+            (
+                preds_matched[img_i, :img_n_preds],
+                preds_to_ignore[img_i, :img_n_preds],
+                preds_scores[img_i, :img_n_preds],
+                preds_cls[img_i, :img_n_preds],
+                targets_cls[img_i, :img_n_targets],
+            )
+        )
+    return batch_metrics
+
+
+def _pad_targets_per_image(targets: torch.Tensor, batch_size: int) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Split the targets of a batch into a padded tensor, keeping the original order of the targets of every image.
+
+    :param targets:     Targets for all images of shape (total_num_targets, 6), format: (index, ...)
+    :param batch_size:  Number of images in the batch
+
+    :return:
+        :padded_targets:    Tensor of shape (batch_size, max_num_img_targets, 5), the targets without the image index
+        :is_target:         Tensor of shape (batch_size, max_num_img_targets), False for padding
+        :n_targets:         Tensor of shape (batch_size), number of targets of every image
+    """
+    device = targets.device
+    img_idx = targets[:, 0].long()
+    n_targets = torch.bincount(img_idx, minlength=batch_size)[:batch_size]
+    max_n_targets = int(n_targets.max().item()) if len(targets) else 0
+
+    # Position of every target within its image, preserving the original order
+    sorted_img_idx, order = img_idx.sort(stable=True)
+    first_target_idx = torch.cumsum(n_targets, 0) - n_targets
+    position = torch.arange(len(targets), device=device) - first_target_idx[sorted_img_idx]
+
+    padded_targets = torch.zeros(batch_size, max_n_targets, targets.shape[1] - 1, dtype=targets.dtype, device=device)
+    padded_targets[sorted_img_idx, position] = targets[order, 1:]
+    is_target = torch.arange(max_n_targets, device=device).view(1, -1) < n_targets.view(-1, 1)
+    return padded_targets, is_target, n_targets
+
+
+def _batched_box_iou(box1: torch.Tensor, box2: torch.Tensor) -> torch.Tensor:
+    """Batched version of box_iou.
+
+    :param box1: Tensor of shape (batch_size, N, 4) in format (x1, y1, x2, y2)
+    :param box2: Tensor of shape (batch_size, M, 4) in format (x1, y1, x2, y2)
+    :return:     Tensor of shape (batch_size, N, M) of pairwise IoU for every image
+    """
+    area1 = compute_box_area(box1.permute(2, 0, 1))
+    area2 = compute_box_area(box2.permute(2, 0, 1))
+    inter = (torch.min(box1[:, :, None, 2:], box2[:, None, :, 2:]) - torch.max(box1[:, :, None, :2], box2[:, None, :, :2])).clamp(0).prod(3)
+    return inter / (area1[:, :, None] + area2[:, None, :] - inter)
+
+
+def _batched_crowd_ioa(det_box: torch.Tensor, crowd_box: torch.Tensor) -> torch.Tensor:
+    """Batched version of crowd_ioa.
+
+    :param det_box:     Tensor of shape (batch_size, N, 4) in format (x1, y1, x2, y2)
+    :param crowd_box:   Tensor of shape (batch_size, M, 4) in format (x1, y1, x2, y2)
+    :return:            Tensor of shape (batch_size, N, M) of pairwise IoA for every image
+    """
+    det_area = compute_box_area(det_box.permute(2, 0, 1))
+    inter = (torch.min(det_box[:, :, None, 2:], crowd_box[:, None, :, 2:]) - torch.max(det_box[:, :, None, :2], crowd_box[:, None, :, :2])).clamp(0).prod(3)
+    return inter / det_area[:, :, None]
+
+
 def get_top_k_idx_per_cls(preds_scores: torch.Tensor, preds_cls: torch.Tensor, top_k: int):
     """Get the indexes of all the top k predictions for every class
 
@@ -952,7 +1151,7 @@ def get_top_k_idx_per_cls(preds_scores: torch.Tensor, preds_cls: torch.Tensor, t
     mask = preds_cls.view(-1, 1) == torch.arange(n_unique_cls + 1, device=preds_scores.device).view(1, -1)
     preds_scores_per_cls = preds_scores.view(-1, 1) * mask
 
-    sorted_scores_per_cls, sorting_idx = preds_scores_per_cls.sort(0, descending=True)
+    sorted_scores_per_cls, sorting_idx = preds_scores_per_cls.sort(dim=0, descending=True, stable=True)
     idx_with_satisfying_scores = sorted_scores_per_cls[:top_k, :].nonzero(as_tuple=False)
     top_k_idx = sorting_idx[idx_with_satisfying_scores.split(1, dim=1)]
     return top_k_idx.view(-1)
@@ -1019,6 +1218,138 @@ def compute_detection_metrics(
     return ap, precision, recall, f1, unique_classes
 
 
+def score_to_histogram_bin(scores: torch.Tensor, n_score_bins: int) -> torch.Tensor:
+    """Quantize confidence scores in range [0, 1] into histogram bin indexes.
+
+    :param scores:          Tensor of confidence scores of any shape
+    :param n_score_bins:    Number of bins used to split the [0, 1] range
+    :return:                Tensor of the same shape as scores, with the bin index (long) of every score
+    """
+    return (scores * n_score_bins).long().clamp(min=0, max=n_score_bins - 1)
+
+
+def accumulate_detection_matching_histograms(
+    tp_histogram: torch.Tensor,
+    fp_histogram: torch.Tensor,
+    n_targets: torch.Tensor,
+    preds_matched: torch.Tensor,
+    preds_to_ignore: torch.Tensor,
+    preds_scores: torch.Tensor,
+    preds_cls: torch.Tensor,
+    targets_cls: torch.Tensor,
+) -> None:
+    """
+    Accumulate (inplace) the matching info of predictions into per class, per IoU threshold, histograms of TP/FP counts binned by confidence score.
+    This summary has a fixed size, so it can be used to compute the metrics without keeping every prediction in memory.
+
+    :param tp_histogram:    Tensor of shape (n_class, n_iou_thresholds, n_score_bins), number of True Positives in every score bin
+    :param fp_histogram:    Tensor of shape (n_class, n_iou_thresholds, n_score_bins), number of False Positives in every score bin
+    :param n_targets:       Tensor of shape (n_class), number of targets of every class
+    :param preds_matched:   Tensor of shape (num_predictions, n_iou_thresholds)
+                                True when prediction (i) is matched with a target with respect to the (j)th IoU threshold
+    :param preds_to_ignore  Tensor of shape (num_predictions, n_iou_thresholds)
+                                True when prediction (i) is matched with a crowd target with respect to the (j)th IoU threshold
+    :param preds_scores:    Tensor of shape (num_predictions), confidence score for every prediction
+    :param preds_cls:       Tensor of shape (num_predictions), predicted class for every prediction
+    :param targets_cls:     Tensor of shape (num_targets), ground truth class for every target box to be detected
+    """
+    n_class, n_iou_thresholds, n_score_bins = tp_histogram.shape
+    device = tp_histogram.device
+    preds_matched, preds_to_ignore = preds_matched.to(device), preds_to_ignore.to(device)
+    preds_scores, preds_cls, targets_cls = preds_scores.to(device), preds_cls.to(device).long(), targets_cls.to(device).long()
+
+    # Classes out of the [0, n_class) range cannot be represented in the histograms
+    is_valid_pred = (preds_cls >= 0) & (preds_cls < n_class)
+    is_valid_target = (targets_cls >= 0) & (targets_cls < n_class)
+
+    tps = preds_matched & is_valid_pred.view(-1, 1)
+    fps = ~preds_matched & ~preds_to_ignore & is_valid_pred.view(-1, 1)
+
+    # Flat index of (cls, iou_threshold, score_bin) for every (prediction, iou_threshold)
+    iou_threshold_idx = torch.arange(n_iou_thresholds, device=device).view(1, -1)
+    score_bins = score_to_histogram_bin(preds_scores, n_score_bins).view(-1, 1)
+    flat_idx = (preds_cls.clamp(0, n_class - 1).view(-1, 1) * n_iou_thresholds + iou_threshold_idx) * n_score_bins + score_bins
+
+    tp_histogram.view(-1).index_add_(0, flat_idx.view(-1), tps.view(-1).to(tp_histogram.dtype))
+    fp_histogram.view(-1).index_add_(0, flat_idx.view(-1), fps.view(-1).to(fp_histogram.dtype))
+    n_targets.index_add_(0, targets_cls[is_valid_target], torch.ones_like(targets_cls[is_valid_target], dtype=n_targets.dtype))
+
+
+def compute_detection_metrics_from_histograms(
+    tp_histogram: torch.Tensor,
+    fp_histogram: torch.Tensor,
+    n_targets: torch.Tensor,
+    device: str,
+    recall_thresholds: Optional[torch.Tensor] = None,
+    score_threshold: Optional[float] = 0.1,
+) -> Tuple:
+    """
+    Compute the list of precision, recall, MaP and f1 for every recall IoU threshold and for every class,
+    from the TP/FP histograms built with accumulate_detection_matching_histograms.
+
+    All the predictions of a given score bin are considered as having the same score, so the results are equal to
+    compute_detection_metrics up to the score quantization (1 / n_score_bins).
+
+    :param tp_histogram:        Tensor of shape (n_class, n_iou_thresholds, n_score_bins), number of True Positives in every score bin
+    :param fp_histogram:        Tensor of shape (n_class, n_iou_thresholds, n_score_bins), number of False Positives in every score bin
+    :param n_targets:           Tensor of shape (n_class), number of targets of every class
+    :param recall_thresholds:   Recall thresholds used to compute MaP.
+    :param score_threshold:     Minimum confidence score to consider a prediction for the computation of
+                                    precision, recall and f1 (not MaP)
+    :param device:              Device
+
+    :return:
+        :ap, precision, recall, f1: Tensors of shape (n_class, nb_iou_thrs)
+        :unique_classes:            Vector with all unique target classes
+    """
+    tp_histogram, fp_histogram, n_targets = tp_histogram.to(device), fp_histogram.to(device), n_targets.to(device)
+    recall_thresholds = torch.linspace(0, 1, 101, device=device) if recall_thresholds is None else recall_thresholds.to(device)
+
+    unique_classes = n_targets.nonzero(as_tuple=False).view(-1)
+    n_class, nb_iou_thrs, n_score_bins = len(unique_classes), tp_histogram.shape[1], tp_histogram.shape[2]
+
+    # Rolling sum over the score bins, by decreasing score. shape = (n_class, nb_iou_thrs, n_score_bins)
+    rolling_tps = torch.cumsum(tp_histogram[unique_classes].flip(-1), dim=-1, dtype=torch.float)
+    rolling_fps = torch.cumsum(fp_histogram[unique_classes].flip(-1), dim=-1, dtype=torch.float)
+
+    rolling_recalls = rolling_tps / n_targets[unique_classes].view(-1, 1, 1)
+    rolling_precisions = rolling_tps / (rolling_tps + rolling_fps + torch.finfo(torch.float64).eps)
+
+    # Reversed cummax to only have decreasing values
+    rolling_precisions = rolling_precisions.flip(-1).cummax(-1).values.flip(-1)
+
+    # ==================
+    # RECALL & PRECISION
+
+    # Predictions with a score in a bin higher or equal to the bin of score_threshold are considered
+    n_bins_above_threshold = n_score_bins - int(score_to_histogram_bin(torch.tensor(score_threshold), n_score_bins))
+    if n_bins_above_threshold == 0:
+        recall = torch.zeros((n_class, nb_iou_thrs), device=device)
+        precision = torch.zeros((n_class, nb_iou_thrs), device=device)
+    else:
+        recall = rolling_recalls[..., n_bins_above_threshold - 1]
+        precision = rolling_precisions[..., n_bins_above_threshold - 1]
+
+    # ==================
+    # AVERAGE PRECISION
+
+    # We want the index i so that: rolling_recalls[i-1] < recall_thresholds[k] <= rolling_recalls[i]
+    # shape = (n_class, nb_iou_thrs, n_recall_thresholds)
+    recall_thresholds = recall_thresholds.view(1, 1, -1).expand(n_class, nb_iou_thrs, -1).contiguous()
+    recall_threshold_idx = torch.searchsorted(rolling_recalls.contiguous(), recall_thresholds, right=False)
+
+    # When recall_thresholds[k] > max(rolling_recalls), rolling_precisions[i] is not defined, and we want precision = 0
+    rolling_precisions = torch.cat((rolling_precisions, torch.zeros(n_class, nb_iou_thrs, 1, device=device)), dim=-1)
+    sampled_precision_points = torch.gather(input=rolling_precisions, index=recall_threshold_idx, dim=-1)
+
+    # Average over the recall_thresholds
+    ap = sampled_precision_points.mean(-1)
+
+    f1 = 2 * precision * recall / (precision + recall + 1e-16)
+
+    return ap, precision, recall, f1, unique_classes
+
+
 def compute_detection_metrics_per_cls(
     preds_matched: torch.Tensor,
     preds_to_ignore: torch.Tensor,
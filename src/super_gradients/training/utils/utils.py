@@ -2,7 +2,7 @@ import math
 import time
 from functools import lru_cache
 from pathlib import Path
-from typing import Mapping, Optional, Tuple, Union, List, Dict, Any
+from typing import Mapping, Optional, Tuple, Union, List, Dict, Any, Iterable, Iterator
 from zipfile import ZipFile
 import os
 from jsonschema import validate
@@ -147,6 +147,87 @@ class AverageMeter:
         #     else tuple((self._sum / self._count).cpu().numpy())
 
 
+class DeviceAverageMeter(AverageMeter):
+    """AverageMeter keeping its running sum in a tensor allocated once, on the device of the values (or on the given device),
+    so updating it neither allocates nor waits for the device. Only reading average copies the result to the host.
+    """
+
+    def __init__(self, device: Optional[Union[str, torch.device]] = None):
+        """
+        :param device: Device of the running sum, when None the device of the first tensor value (or the cpu for other values)
+        """
+        super().__init__()
+        self.device = device
+
+    def _init_sum(self, value: Union[float, tuple, list, torch.Tensor]):
+        if isinstance(value, torch.Tensor):
+            device = self.device or value.device
+            dtype = value.dtype if value.is_floating_point() else torch.float32
+            self._sum = torch.zeros(value.shape, dtype=dtype, device=device)
+        elif isinstance(value, (tuple, list)):
+            device = self.device or next((item.device for item in value if isinstance(item, torch.Tensor)), "cpu")
+            self._sum = torch.zeros((len(value),), dtype=torch.float32, device=device)
+        else:
+            self._sum = torch.zeros((), dtype=torch.float32, device=self.device or "cpu")
+
+    def update(self, value: Union[float, tuple, list, torch.Tensor], batch_size: int):
+        if self._sum is None:
+            self._init_sum(value)
+
+        if isinstance(value, torch.Tensor):
+            self._sum.add_(value.detach().to(self._sum.device, non_blocking=True), alpha=batch_size)
+        elif isinstance(value, (tuple, list)):
+            # ONE IN-PLACE ADD PER ITEM (FUSED ON CUDA), WITHOUT STACKING THE ITEMS IN A NEW TENSOR
+            sum_items = list(self._sum.unbind())
+            tensor_items = [(sum_item, item) for sum_item, item in zip(sum_items, value) if isinstance(item, torch.Tensor)]
+            if tensor_items:
+                torch._foreach_add_(
+                    [sum_item for sum_item, _ in tensor_items],
+                    [item.detach().reshape(()).to(self._sum.device, non_blocking=True) for _, item in tensor_items],
+                    alpha=batch_size,
+                )
+            if len(tensor_items) < len(sum_items):
+                number_items = [(sum_item, item) for sum_item, item in zip(sum_items, value) if not isinstance(item, torch.Tensor)]
+                torch._foreach_add_([sum_item for sum_item, _ in number_items], [float(item) * batch_size for _, item in number_items])
+        else:
+            self._sum.add_(float(value) * batch_size)
+
+        self._count += batch_size
+
+    @property
+    def average_tensor(self) -> Optional[torch.Tensor]:
+        """The running average as a tensor on the device of the running sum (without waiting for the device), None before any update"""
+        if self._sum is None:
+            return None
+        return self._sum / max(self._count, 1)
+
+    def all_reduce(self):
+        """
+        Sum the running sums and counts of all the DDP ranks, so average is the average over all the ranks.
+        Ranks that were never updated take part with a zero sum and a zero count: the size of the sum is first agreed on
+        by all the ranks (a single number), and then the sums and the counts are packed into a single all_reduce.
+        """
+        if torch.distributed.get_backend() == torch.distributed.Backend.NCCL:
+            # NCCL ONLY REDUCES CUDA TENSORS
+            reduce_device = torch.device("cuda", torch.cuda.current_device())
+        else:
+            reduce_device = self._sum.device if self._sum is not None else torch.device("cpu")
+
+        n_items = torch.tensor([self._sum.numel() if self._sum is not None else -1], dtype=torch.int64, device=reduce_device)
+        torch.distributed.all_reduce(n_items, op=torch.distributed.ReduceOp.MAX)
+        n_items = int(n_items.item())
+        if n_items < 0:
+            # NONE OF THE RANKS WAS UPDATED
+            return
+        if self._sum is None:
+            self._sum = torch.zeros((n_items,), dtype=torch.float32, device=self.device or reduce_device)
+
+        packed = torch.cat([self._sum.reshape(-1).double().to(reduce_device), torch.tensor([self._count], dtype=torch.float64, device=reduce_device)])
+        torch.distributed.all_reduce(packed, op=torch.distributed.ReduceOp.SUM)
+        self._sum.copy_(packed[:-1].view_as(self._sum))
+        self._count = int(packed[-1].item())
+
+
 def tensor_container_to_device(obj: Union[torch.Tensor, tuple, list, dict], device: str, non_blocking=True):
     """
     recursively send compounded objects to device (sending all tensors to device and maintaining structure)
@@ -168,6 +249,66 @@ def tensor_container_to_device(obj: Union[torch.Tensor, tuple, list, dict], devi
         return obj
 
 
+def _tensor_container_record_stream(obj: Union[torch.Tensor, tuple, list, dict], stream: "torch.cuda.Stream"):
+    """
+    recursively mark the tensors of compounded objects as used by stream (see torch.Tensor.record_stream)
+    """
+    if isinstance(obj, torch.Tensor):
+        obj.record_stream(stream)
+    elif isinstance(obj, (tuple, list)):
+        for x in obj:
+            _tensor_container_record_stream(x, stream)
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            _tensor_container_record_stream(v, stream)
+
+
+class DevicePrefetcher:
+    """Iterable over the batches of a data loader, sent to device (with tensor_container_to_device).
+    On CUDA devices, the next batch is copied on a side stream while the current batch is processed, so the host to device copies
+    overlap with the computations (use a data loader with pin_memory=True, otherwise the copies are synchronous).
+    On other devices, the batches are simply sent to device.
+    """
+
+    def __init__(self, data_loader: Iterable, device: Union[str, torch.device]):
+        """
+        :param data_loader: Data loader (or any iterable) of tensors, or of lists / tuples / dicts of tensors
+        :param device:      Device to send the batches to
+        """
+        self.data_loader = data_loader
+        self.device = device
+
+    def __len__(self):
+        return len(self.data_loader)
+
+    def __iter__(self):
+        if not torch.cuda.is_available() or torch.device(self.device).type != "cuda":
+            for batch_items in self.data_loader:
+                yield tensor_container_to_device(batch_items, self.device, non_blocking=True)
+            return
+
+        copy_stream = torch.cuda.Stream()
+        batches_iterator = iter(self.data_loader)
+        next_batch_items = self._preload(batches_iterator, copy_stream)
+        while next_batch_items is not None:
+            # THE COMPUTATIONS OF THE CURRENT STREAM WAIT FOR THE COPY OF THE BATCH, AND THE MEMORY OF THE BATCH IS NOT REUSED
+            # BY THE CACHING ALLOCATOR BEFORE THEY ARE DONE
+            compute_stream = torch.cuda.current_stream()
+            compute_stream.wait_stream(copy_stream)
+            batch_items = next_batch_items
+            _tensor_container_record_stream(batch_items, compute_stream)
+            next_batch_items = self._preload(batches_iterator, copy_stream)
+            yield batch_items
+
+    def _preload(self, batches_iterator: Iterator, copy_stream: "torch.cuda.Stream"):
+        try:
+            batch_items = next(batches_iterator)
+        except StopIteration:
+            return None
+        with torch.cuda.stream(copy_stream):
+            return tensor_container_to_device(batch_items, self.device, non_blocking=True)
+
+
 def fuzzy_keys(params: Mapping) -> List[str]:
     """
     Returns params.key() removing leading and trailing white space, lower-casing and dropping symbols.
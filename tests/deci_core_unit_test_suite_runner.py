@@ -21,9 +21,16 @@ from tests.unit_tests import (
     CallTrainAfterTestTest,
     CrashTipTest,
     TestTransforms,
+    DEKRTargetsGeneratorTest,
+    MixupPrePredictionCallbackTest,
+    DevicePrefetcherTest,
+    TorchCompileTest,
+    COCOKeypointsDatasetTest,
 )
 from tests.end_to_end_tests import TestTrainer
 from tests.unit_tests.detection_utils_test import TestDetectionUtils
+from tests.unit_tests.detection_matching_test import TestDetectionMatching
+from tests.unit_tests.detection_metrics_test import TestDetectionMetricsAccumulation
 from tests.unit_tests.detection_dataset_test import DetectionDatasetTest
 from tests.unit_tests.export_onnx_test import TestModelsONNXExport
 from tests.unit_tests.local_ckpt_head_replacement_test import LocalCkptHeadReplacementTest
@@ -89,6 +96,8 @@ class CoreUnitTestSuiteRunner:
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(TestConvBnRelu))
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(FactoriesTest))
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(TestDetectionUtils))
+        self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(TestDetectionMatching))
+        self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(TestDetectionMetricsAccumulation))
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(DiceLossTest))
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(TestViT))
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(KDEMATest))
@@ -123,6 +132,11 @@ class CoreUnitTestSuiteRunner:
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(MaxBatchesLoopBreakTest))
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(TestTrainingUtils))
         self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(TestTransforms))
+        self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(DEKRTargetsGeneratorTest))
+        self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(MixupPrePredictionCallbackTest))
+        self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(DevicePrefetcherTest))
+        self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(TorchCompileTest))
+        self.unit_tests_suite.addTest(self.test_loader.loadTestsFromModule(COCOKeypointsDatasetTest))
 
     def _add_modules_to_end_to_end_tests_suite(self):
         """
@@ -23,6 +23,11 @@ from tests.unit_tests.initialize_with_dataloaders_test import InitializeWithData
 from tests.unit_tests.training_params_factory_test import TrainingParamsTest
 from tests.unit_tests.config_inspector_test import ConfigInspectTest
 from tests.unit_tests.transforms_test import TestTransforms
+from tests.unit_tests.dekr_targets_generator_test import DEKRTargetsGeneratorTest
+from tests.unit_tests.mixup_test import MixupPrePredictionCallbackTest
+from tests.unit_tests.device_prefetcher_test import DevicePrefetcherTest
+from tests.unit_tests.torch_compile_test import TorchCompileTest
+from tests.unit_tests.coco_keypoints_dataset_test import COCOKeypointsDatasetTest
 
 __all__ = [
     "CrashTipTest",
@@ -49,4 +54,9 @@ __all__ = [
     "CallTrainAfterTestTest",
     "ConfigInspectTest",
     "TestTransforms",
+    "DEKRTargetsGeneratorTest",
+    "MixupPrePredictionCallbackTest",
+    "DevicePrefetcherTest",
+    "TorchCompileTest",
+    "COCOKeypointsDatasetTest",
 ]
@@ -1,6 +1,23 @@
+import multiprocessing
+import os
+import tempfile
 import torch
 import unittest
-from super_gradients.training.utils.utils import AverageMeter
+from super_gradients.training.utils.utils import AverageMeter, DeviceAverageMeter
+
+
+def _all_reduce_device_average_meter(rank: int, store_path: str, updated_ranks: tuple, world_size: int = 2):
+    """Update the meter of the updated_ranks only, and all_reduce it over all the ranks."""
+    torch.distributed.init_process_group("gloo", init_method=f"file://{store_path}", rank=rank, world_size=world_size)
+    try:
+        device_avg_meter = DeviceAverageMeter()
+        if rank in updated_ranks:
+            device_avg_meter.update(torch.tensor([1.0, 2.0]), 2)
+            device_avg_meter.update(torch.tensor([4.0, 5.0]), 1)
+        device_avg_meter.all_reduce()
+        return device_avg_meter._count, device_avg_meter.average
+    finally:
+        torch.distributed.destroy_process_group()
 
 
 class TestAverageMeter(unittest.TestCase):
@@ -41,6 +58,52 @@ class TestAverageMeter(unittest.TestCase):
                     self.assertIsInstance(avg_meter.average, tuple)
                     self.assertListEqual(list(avg_meter.average), list(score))
 
+    def test_device_average_meter(self):
+        # SAME AVERAGES AS AverageMeter, INCLUDING FOR TUPLES OF TENSORS, WITHOUT RE-ALLOCATING THE RUNNING SUM
+        score_types = self.score_types + [torch.tensor(2.5), (torch.tensor(1.0), torch.tensor([2.0]), 3.0)]
+        for score in score_types:
+            device_avg_meter = DeviceAverageMeter()
+            self.assertEqual(device_avg_meter.average, 0)
+            self.assertIsNone(device_avg_meter.average_tensor)
+            for repetition in [1, 2, 3]:
+                device_avg_meter.update(score, self.batch_size)
+                if repetition == 1:
+                    sum_data_ptr = device_avg_meter._sum.data_ptr()
+                self.assertEqual(device_avg_meter._sum.data_ptr(), sum_data_ptr)
+                self.assertEqual(device_avg_meter._count, self.batch_size * repetition)
+
+            if isinstance(score, float) or (isinstance(score, torch.Tensor) and score.dim() == 0):
+                self.assertIsInstance(device_avg_meter.average, float)
+                self.assertAlmostEqual(device_avg_meter.average, float(score), places=5)
+            else:
+                expected = [float(value) for value in score]
+                self.assertIsInstance(device_avg_meter.average, tuple)
+                for value, expected_value in zip(device_avg_meter.average, expected):
+                    self.assertAlmostEqual(value, expected_value, places=5)
+                torch.testing.assert_close(device_avg_meter.average_tensor, torch.tensor(expected))
+
+    def test_device_average_meter_all_reduce(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            torch.distributed.init_process_group("gloo", init_method=f"file://{os.path.join(tmp_dir, 'store')}", rank=0, world_size=1)
+            try:
+                device_avg_meter = DeviceAverageMeter()
+                device_avg_meter.update(torch.tensor([1.0, 2.0]), 2)
+                device_avg_meter.update(torch.tensor([4.0, 5.0]), 1)
+                device_avg_meter.all_reduce()
+                self.assertEqual(device_avg_meter._count, 3)
+                self.assertEqual(device_avg_meter.average, (2.0, 3.0))
+            finally:
+                torch.distributed.destroy_process_group()
+
+    def test_device_average_meter_all_reduce_without_update(self):
+        """Ranks that were never updated (e.g. that did not get any batch) take part in the all_reduce with a zero count."""
+        for updated_ranks, expected_result in (((0,), (3, (2.0, 3.0))), ((1,), (3, (2.0, 3.0))), ((0, 1), (6, (2.0, 3.0))), ((), (0, 0))):
+            with tempfile.TemporaryDirectory() as tmp_dir, multiprocessing.get_context("fork").Pool(2) as pool:
+                store_path = os.path.join(tmp_dir, "store")
+                # A RANK FAILING OR SKIPPING THE COLLECTIVE CALLS WOULD MAKE THE OTHER ONE HANG
+                results = pool.starmap_async(_all_reduce_device_average_meter, [(rank, store_path, updated_ranks) for rank in range(2)]).get(timeout=60)
+            self.assertEqual(results, [expected_result] * 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from super_gradients.training.datasets.pose_estimation_datasets.coco_keypoints import COCOKeypointsDataset
+from super_gradients.training.datasets.pose_estimation_datasets.target_generators import DEKRTargetsGenerator
+
+
+class COCOKeypointsDatasetTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mini_coco_data_dir = str(Path(__file__).parent.parent / "data" / "tinycoco")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmp_dir.name, "person_keypoints_train2017.json")
+        self._write_keypoints_json(os.path.join(self.mini_coco_data_dir, "annotations", "instances_train2017.json"), self.json_file)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _write_keypoints_json(instances_json_file: str, keypoints_json_file: str, num_joints: int = 17):
+        """Turn the tinycoco instances into person keypoints, keeping their crowd RLE and polygon segmentations.
+        Random joints are added inside the boxes, and some of the instances do not have any visible joint.
+        """
+        with open(instances_json_file, "r") as f:
+            dataset = json.load(f)
+        random_state = np.random.RandomState(0)
+        for annotation in dataset["annotations"]:
+            x, y, w, h = annotation["bbox"]
+            joints = np.stack([x + random_state.rand(num_joints) * w, y + random_state.rand(num_joints) * h, random_state.randint(0, 3, num_joints)], 1)
+            if random_state.rand() < 0.3:
+                joints[:, 2] = 0
+            annotation["category_id"] = 1
+            annotation["keypoints"] = joints.round(2).reshape(-1).tolist()
+            annotation["num_keypoints"] = int((joints[:, 2] > 0).sum())
+        dataset["categories"] = [
+            {"id": 1, "name": "person", "supercategory": "person", "keypoints": [f"joint_{i}" for i in range(num_joints)], "skeleton": [[1, 2], [2, 3]]}
+        ]
+        with open(keypoints_json_file, "w") as f:
+            json.dump(dataset, f)
+
+    def _get_dataset(self, **kwargs) -> COCOKeypointsDataset:
+        return COCOKeypointsDataset(
+            data_dir=self.mini_coco_data_dir,
+            images_dir="images/train2017",
+            json_file=self.json_file,
+            include_empty_samples=False,
+            target_generator=DEKRTargetsGenerator(output_stride=4, sigma=2, center_sigma=4, bg_weight=0.1, offset_radius=4),
+            transforms=[],
+            min_instance_area=1,
+            **kwargs,
+        )
+
+    def test_lazy_coco_samples(self):
+        """Check that the samples loaded with LazyCOCO, with a cold and with a warm sidecar, are the same as with pycocotools."""
+        expected_dataset = self._get_dataset()
+        with tempfile.TemporaryDirectory() as sidecar_dir:
+            datasets = [self._get_dataset(lazy_coco=True), self._get_dataset(coco_sidecar_dir=sidecar_dir), self._get_dataset(coco_sidecar_dir=sidecar_dir)]
+            for dataset in datasets:
+                self.assertEqual(expected_dataset.ids, dataset.ids)
+                self.assertEqual(expected_dataset.joints, dataset.joints)
+                for index in range(len(expected_dataset)):
+                    expected_image, expected_mask, expected_joints, expected_extras = expected_dataset.load_sample(index)
+                    image, mask, joints, extras = dataset.load_sample(index)
+                    self.assertTrue(np.array_equal(expected_image, image))
+                    self.assertTrue(np.array_equal(expected_mask, mask))
+                    self.assertTrue(np.array_equal(expected_joints, joints))
+                    self.assertEqual(expected_extras, extras)
+                    self.assertTrue(np.array_equal(self._get_mask_of_all_instances(expected_dataset, index), self._get_mask_of_all_instances(dataset, index)))
+            self.assertEqual(len(list(Path(sidecar_dir).iterdir())), 1)
+
+        # THE CROWD RLE AND THE POLYGONS OF THE INSTANCES WITHOUT JOINTS ARE DECODED INTO THE IGNORED REGIONS
+        self.assertTrue(any((self._get_mask_of_all_instances(expected_dataset, index) == 0).any() for index in range(len(expected_dataset))))
+
+    @staticmethod
+    def _get_mask_of_all_instances(dataset: COCOKeypointsDataset, index: int) -> np.ndarray:
+        """load_sample only gives the instances with joints to get_mask, so the mask is computed here from all the instances of the image."""
+        image_info = dataset.coco.loadImgs(dataset.ids[index])[0]
+        return dataset.get_mask(dataset.coco.loadAnns(dataset.coco.getAnnIds(imgIds=dataset.ids[index])), image_info)
+
+
+if __name__ == "__main__":
+    unittest.main()
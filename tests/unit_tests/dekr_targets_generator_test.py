@@ -0,0 +1,150 @@
+import unittest
+
+import cv2
+import numpy as np
+import torch
+
+from super_gradients.training.datasets.pose_estimation_datasets.target_generators import DEKRTargetsGenerator
+
+
+def _encode_with_per_joint_loops(generator: DEKRTargetsGenerator, image: np.ndarray, joints: np.ndarray, mask: np.ndarray):
+    """Reference implementation of DEKRTargetsGenerator.__call__, with the per instance, per joint and per pixel loops of the
+    original implementation (before the vectorization of the center joints, the heatmaps and the offsets)."""
+    num_instances, num_joints, _ = joints.shape
+    num_joints_with_center = num_joints + 1
+
+    joints, area = generator.sort_joints_by_area(joints)
+    augmented_joints = []
+    for keypoints in joints:
+        visible_keypoints = keypoints[:, 2] > 0
+        joints_sum = np.sum(keypoints[:, :2] * np.expand_dims(visible_keypoints, -1), axis=0)
+        keypoints_with_center = np.zeros((num_joints_with_center, 3))
+        keypoints_with_center[0:num_joints] = keypoints
+        keypoints_with_center[-1, :2] = joints_sum / np.count_nonzero(visible_keypoints)
+        keypoints_with_center[-1, 2] = 1
+        augmented_joints.append(keypoints_with_center)
+    joints = np.array(augmented_joints, dtype=np.float32).reshape((-1, num_joints_with_center, 3))
+
+    rows, cols = mask.shape
+    output_rows, output_cols = rows // generator.output_stride, cols // generator.output_stride
+    heatmaps = np.zeros((num_joints_with_center, output_rows, output_cols), dtype=np.float32)
+    ignored_hms = 2 * np.ones((num_joints_with_center, output_rows, output_cols), dtype=np.float32)
+    offset_map = np.zeros((num_joints * 2, output_rows, output_cols), dtype=np.float32)
+    offset_weight = np.zeros((num_joints * 2, output_rows, output_cols), dtype=np.float32)
+
+    joints = joints.copy()
+    joints[:, :, 0] *= output_cols / cols
+    joints[:, :, 1] *= output_rows / rows
+
+    for p in joints:
+        for idx, pt in enumerate(p):
+            sigma = generator.sigma if idx < num_joints else generator.center_sigma
+            if pt[2] > 0:
+                x, y = pt[0], pt[1]
+                if x < 0 or y < 0 or x >= output_cols or y >= output_rows:
+                    continue
+                ul = int(np.floor(x - 3 * sigma - 1)), int(np.floor(y - 3 * sigma - 1))
+                br = int(np.ceil(x + 3 * sigma + 1)), int(np.ceil(y + 3 * sigma + 1))
+                aa, bb = max(0, ul[1]), min(br[1], output_rows)
+                cc, dd = max(0, ul[0]), min(br[0], output_cols)
+                joint_rg = np.zeros((bb - aa, dd - cc), dtype=np.float32)
+                for sy in range(aa, bb):
+                    for sx in range(cc, dd):
+                        joint_rg[sy - aa, sx - cc] = generator.get_heat_val(sigma, sx, sy, int(x), int(y))
+                joint_rg[joint_rg.shape[0] // 2, joint_rg.shape[1] // 2] = 1
+                heatmaps[idx, aa:bb, cc:dd] = np.maximum(heatmaps[idx, aa:bb, cc:dd], joint_rg)
+                ignored_hms[idx, aa:bb, cc:dd] = 1.0
+
+    for person_id, p in enumerate(joints):
+        ct_x, ct_y, ct_v = int(p[-1, 0]), int(p[-1, 1]), int(p[-1, 2])
+        if ct_v < 1 or ct_x < 0 or ct_y < 0 or ct_x >= output_cols or ct_y >= output_rows:
+            continue
+        for idx, pt in enumerate(p[:-1]):
+            if pt[2] > 0:
+                x, y = pt[0], pt[1]
+                if x < 0 or y < 0 or x >= output_cols or y >= output_rows:
+                    continue
+                start_x, start_y = max(int(ct_x - generator.offset_radius), 0), max(int(ct_y - generator.offset_radius), 0)
+                end_x, end_y = min(int(ct_x + generator.offset_radius), output_cols), min(int(ct_y + generator.offset_radius), output_rows)
+                for pos_x in range(start_x, end_x):
+                    for pos_y in range(start_y, end_y):
+                        offset_map[idx * 2, pos_y, pos_x] = pos_x - x
+                        offset_map[idx * 2 + 1, pos_y, pos_x] = pos_y - y
+                        offset_weight[idx * 2, pos_y, pos_x] = 1.0 / np.sqrt(area[person_id])
+                        offset_weight[idx * 2 + 1, pos_y, pos_x] = 1.0 / np.sqrt(area[person_id])
+
+    ignored_hms[ignored_hms == 2] = generator.bg_weight
+    mask = cv2.resize(mask, dsize=(output_cols, output_rows), interpolation=cv2.INTER_LINEAR)
+    mask = (mask > 0).astype(np.float32) * ignored_hms
+    return heatmaps, mask, offset_map, offset_weight
+
+
+class DEKRTargetsGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        self.generator = DEKRTargetsGenerator(output_stride=4, sigma=2, center_sigma=4, bg_weight=0.1, offset_radius=4)
+
+    def _get_sample(self, num_instances: int, seed: int = 0):
+        rs = np.random.RandomState(seed)
+        centers = rs.rand(num_instances, 1, 2) * 640
+        xy = centers + rs.randn(num_instances, 17, 2) * rs.uniform(5, 80, size=(num_instances, 1, 1))
+        joints = np.concatenate([xy, rs.randint(0, 3, size=(num_instances, 17, 1))], axis=-1).astype(np.float32)
+        joints[:, 0, 2] = 2
+        mask = (rs.rand(640, 640) > 0.1).astype(np.float32)
+        return np.zeros((3, 640, 640), dtype=np.float32), joints, mask
+
+    def test_single_instance(self):
+        image, _, mask = self._get_sample(1)
+        joints = np.zeros((1, 17, 3), dtype=np.float32)
+        joints[0, :, 0], joints[0, :, 1], joints[0, :, 2] = np.arange(17) * 20 + 100, np.arange(17) * 2 + 200, 2
+        heatmaps, mask, offset_map, offset_weight = self.generator(image, joints, mask)
+
+        self.assertEqual(heatmaps.shape, (18, 160, 160))
+        self.assertEqual(offset_map.shape, (34, 160, 160))
+        for joint_id in range(17):
+            # Peak at the joint, at the resolution of the target maps
+            self.assertEqual(heatmaps[joint_id, 50 + joint_id // 2, 25 + joint_id * 5], 1)
+            self.assertEqual(heatmaps[joint_id].argmax(), (50 + joint_id // 2) * 160 + 25 + joint_id * 5)
+
+        # Offsets around the center point to the joints, weighted by the area of the instance
+        center_x, center_y = int(np.mean(joints[0, :, 0]) / 4), int(np.mean(joints[0, :, 1]) / 4)
+        np.testing.assert_allclose(offset_map[0::2, center_y, center_x], center_x - joints[0, :, 0] / 4)
+        np.testing.assert_allclose(offset_map[1::2, center_y, center_x], center_y - joints[0, :, 1] / 4)
+        np.testing.assert_allclose(offset_weight[:, center_y, center_x], 1 / np.sqrt(320 * 32))
+        self.assertEqual(np.count_nonzero(offset_weight[0]), 8 * 8)
+
+    def test_smallest_instance_offsets_are_kept(self):
+        image, _, mask = self._get_sample(1)
+        joints = np.zeros((2, 17, 3), dtype=np.float32)
+        # Two instances with the same center, the second one being larger
+        joints[0, :, 0], joints[0, :, 1] = np.linspace(300, 340, 17), np.linspace(300, 340, 17)
+        joints[1, :, 0], joints[1, :, 1] = np.linspace(220, 420, 17), np.linspace(220, 420, 17)
+        joints[:, :, 2] = 2
+        _, _, offset_map, offset_weight = self.generator(image, joints, mask)
+        np.testing.assert_allclose(offset_map[0, 80, 80], 80 - 300 / 4)
+        np.testing.assert_allclose(offset_weight[0, 80, 80], 1 / np.sqrt(40 * 40))
+
+    def test_matches_per_joint_loops(self):
+        """The vectorized heatmaps and offsets are the same, bit for bit, as the ones of the original per joint loops,
+        including with overlapping instances and joints outside of the image."""
+        for seed in range(5):
+            image, joints, mask = self._get_sample(num_instances=12, seed=seed)
+            # Gather the instances in a corner, so that they overlap and some of their joints are outside of the image
+            joints[:, :, :2] = joints[:, :, :2] / 3 - 40
+            joints[:, 0, :2] = np.abs(joints[:, 0, :2])
+            expected_targets = _encode_with_per_joint_loops(self.generator, image, joints.copy(), mask)
+            targets = self.generator(image, joints.copy(), mask)
+            for expected_target, target in zip(expected_targets, targets):
+                self.assertTrue(np.array_equal(expected_target, target))
+
+    def test_torch_backend(self):
+        for seed in range(5):
+            image, joints, mask = self._get_sample(num_instances=10, seed=seed)
+            numpy_targets = self.generator(image, joints.copy(), mask)
+            torch_targets = self.generator(torch.from_numpy(image), torch.from_numpy(joints), torch.from_numpy(mask))
+            for numpy_target, torch_target in zip(numpy_targets, torch_targets):
+                self.assertIsInstance(torch_target, torch.Tensor)
+                np.testing.assert_allclose(torch_target.numpy(), numpy_target, atol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,14 @@ import numpy as np
 from pathlib import Path
 import tempfile
 import os
+import multiprocessing
+
+import cv2
+import torch
 
 from super_gradients.training.datasets import DetectionDataset
+from super_gradients.training.datasets.segmentation_datasets.supervisely_persons_segmentation import SuperviselyPersonsDataset
+from super_gradients.training.datasets.detection_datasets.annotations_cache import ColumnarAnnotations
 from super_gradients.training.utils.detection_utils import DetectionTargetsFormat
 
 
@@ -34,6 +40,25 @@ class DummyDetectionDataset(DetectionDataset):
         return np.random.random((self.image_size[0], self.image_size[1], 3)) * 255
 
 
+def _get_cached_images_checksum(cache_dir: str) -> int:
+    dataset = DummyDetectionDataset(input_dim=(64, 48), ignore_empty_annotations=True, cache=True, cache_dir=cache_dir, cache_num_workers=0, data_dir="/home/")
+    return int(np.asarray(dataset.cached_imgs_padded, dtype=np.int64).sum())
+
+
+def _write_segmentation_samples(data_dir: str, seed: int, n_samples: int = 5):
+    """Write random images, their masks and the list of the samples (in the format of SuperviselyPersonsDataset).
+    The images are BMP files, so their size does not depend on their pixels."""
+    random_state = np.random.RandomState(seed)
+    with open(os.path.join(data_dir, "samples.csv"), "w") as f:
+        f.write("\n".join(f"{index}.bmp,{index}.png" for index in range(n_samples)))
+    for index in range(n_samples):
+        image_path = os.path.join(data_dir, f"{index}.bmp")
+        cv2.imwrite(image_path, random_state.randint(0, 256, (32, 40, 3), dtype=np.uint8))
+        cv2.imwrite(os.path.join(data_dir, f"{index}.png"), random_state.randint(0, 3, (32, 40), dtype=np.uint8))
+        # Make sure that the modification time changes, even on file systems with a coarse resolution
+        os.utime(image_path, ns=(os.stat(image_path).st_atime_ns, os.stat(image_path).st_mtime_ns + seed * 10**9))
+
+
 class TestDetectionDatasetCaching(unittest.TestCase):
     def setUp(self) -> None:
         self.temp_cache_dir = tempfile.TemporaryDirectory(prefix="cache").name
@@ -104,6 +129,156 @@ class TestDetectionDatasetCaching(unittest.TestCase):
 
         self._empty_cache()
 
+    def test_variable_size_cache(self):
+        """Check that the images are the same whether they are cached padded, packed, or not cached, and built by any number of workers."""
+        self._empty_cache()
+        kwargs = dict(input_dim=(64, 48), ignore_empty_annotations=True, class_inclusion_list=["class_0", "class_2"], data_dir="/home/")
+        dataset = DummyDetectionDataset(**kwargs)
+        cached_datasets = [
+            DummyDetectionDataset(cache=True, cache_dir=self.temp_cache_dir, cache_num_workers=0, **kwargs),
+            DummyDetectionDataset(cache=True, cache_dir=self.temp_cache_dir, cache_num_workers=0, cache_variable_size=True, **kwargs),
+        ]
+        self._empty_cache()
+        cached_datasets += [
+            DummyDetectionDataset(cache=True, cache_dir=self.temp_cache_dir, cache_num_workers=2, **kwargs),
+            DummyDetectionDataset(cache=True, cache_dir=self.temp_cache_dir, cache_num_workers=2, cache_variable_size=True, **kwargs),
+        ]
+        self.assertEqual(2, self._count_cached_array())
+        self.assertIsNone(cached_datasets[1].cached_imgs_padded)
+        self.assertEqual(cached_datasets[1].cached_imgs_packed.size, len(dataset) * 64 * 48 * 3)
+
+        for index in range(len(dataset)):
+            image = dataset.get_resized_image(index)
+            for cached_dataset in cached_datasets:
+                self.assertTrue(np.array_equal(image, cached_dataset.get_resized_image(index)))
+        self._empty_cache()
+
+    def test_compressed_cache(self):
+        """Check that the compressed cache returns the same images, and that its RAM tier only keeps the most recently used ones."""
+        kwargs = dict(input_dim=(64, 48), ignore_empty_annotations=True, class_inclusion_list=["class_0", "class_2"], data_dir="/home/")
+        dataset = DummyDetectionDataset(**kwargs)
+        image_nbytes = 64 * 48 * 3
+        cached_dataset = DummyDetectionDataset(
+            cache=True, cache_dir=self.temp_cache_dir, cache_compression="zlib", cache_ram_size_mb=2.5 * image_nbytes / 1024**2, cache_num_workers=2, **kwargs
+        )
+        self.assertEqual(1, len(list(Path(self.temp_cache_dir).glob("*.zlib.cache"))))
+
+        for index in range(len(dataset)):
+            self.assertTrue(np.array_equal(dataset.get_resized_image(index), cached_dataset.get_resized_image(index)))
+        stats = cached_dataset.compressed_imgs_cache.stats
+        self.assertEqual((0, len(dataset), 2), (stats["hits"], stats["misses"], stats["ram_cached_images"]))
+
+        # Images can be modified without altering the cache
+        cached_dataset.get_resized_image(len(dataset) - 1)[:] = 0
+        self.assertTrue(np.array_equal(dataset.get_resized_image(len(dataset) - 1), cached_dataset.get_resized_image(len(dataset) - 1)))
+        self.assertEqual(2, cached_dataset.compressed_imgs_cache.hits)
+
+    def test_segmentation_compressed_cache(self):
+        """Check that SegmentationDataSet returns the same samples with and without the compressed cache,
+        and that the cache is rebuilt when the images are rewritten, even with the same file sizes."""
+        with tempfile.TemporaryDirectory() as data_dir:
+            kwargs = dict(root_dir=data_dir, list_file="samples.csv")
+            for seed in (0, 1):
+                _write_segmentation_samples(data_dir, seed=seed)
+                for numpy_transforms in (False, True):
+                    dataset = SuperviselyPersonsDataset(numpy_transforms=numpy_transforms, **kwargs)
+                    cached_dataset = SuperviselyPersonsDataset(
+                        cache_images=True,
+                        cache_dir=self.temp_cache_dir,
+                        cache_compression="zlib",
+                        cache_num_workers=2,
+                        numpy_transforms=numpy_transforms,
+                        **kwargs,
+                    )
+                    self.assertIsNotNone(cached_dataset.compressed_imgs_cache)
+                    for index in range(len(dataset)):
+                        (image, mask), (cached_image, cached_mask) = dataset[index], cached_dataset[index]
+                        self.assertTrue(torch.equal(image, cached_image))
+                        self.assertTrue(torch.equal(mask, cached_mask))
+                self.assertEqual(seed + 1, len(list(Path(self.temp_cache_dir).glob("*.zlib.cache"))))
+
+            with self.assertRaises(ValueError):
+                SuperviselyPersonsDataset(cache_images=True, cache_compression="zlib", **kwargs)
+
+    def test_cache_built_once_across_processes(self):
+        """Check that when many processes instantiate the same dataset at the same time, the cache is built once and shared."""
+        self._empty_cache()
+        with multiprocessing.get_context("fork").Pool(3) as pool:
+            checksums = pool.map(_get_cached_images_checksum, [self.temp_cache_dir] * 3)
+
+        self.assertEqual(1, len(set(checksums)))
+        self.assertEqual(1, self._count_cached_array())
+        self.assertEqual([], list(Path(self.temp_cache_dir).glob("*.lock")))
+        self._empty_cache()
+
+    def _count_annotations_caches(self):
+        return len(list(Path(self.temp_cache_dir).glob("annotations_cache_*")))
+
+    def test_parallel_annotations_loading(self):
+        kwargs = dict(input_dim=(64, 64), ignore_empty_annotations=True, class_inclusion_list=["class_0", "class_2"], data_dir="/home/")
+        dataset = DummyDetectionDataset(**kwargs)
+        for num_annotation_workers in [1, 4]:
+            parallel_dataset = DummyDetectionDataset(num_annotation_workers=num_annotation_workers, **kwargs)
+            self.assertEqual(len(dataset.annotations), len(parallel_dataset.annotations))
+            for annotation, parallel_annotation in zip(dataset.annotations, parallel_dataset.annotations):
+                self.assertEqual(annotation["seed"], parallel_annotation["seed"])
+                self.assertTrue(np.array_equal(annotation["target"], parallel_annotation["target"]))
+
+    def test_annotations_cache_saved(self):
+        """Check that the annotations are saved once per set of params, and then loaded (memory-mapped) from the cache."""
+        kwargs = dict(input_dim=(64, 64), ignore_empty_annotations=True, annotations_cache_dir=self.temp_cache_dir, data_dir="/home/")
+        self.assertEqual(0, self._count_annotations_caches())
+
+        dataset = DummyDetectionDataset(**kwargs)
+        self.assertEqual(1, self._count_annotations_caches())
+
+        cached_dataset = DummyDetectionDataset(**kwargs)
+        self.assertEqual(1, self._count_annotations_caches())
+        self.assertEqual(len(dataset), len(cached_dataset))
+        for annotation, cached_annotation in zip(dataset.annotations, cached_dataset.annotations):
+            self.assertEqual(annotation.keys(), cached_annotation.keys())
+            self.assertEqual(annotation["img_path"], cached_annotation["img_path"])
+            self.assertTrue(np.array_equal(annotation["target"], cached_annotation["target"]))
+
+        _ = DummyDetectionDataset(class_inclusion_list=["class_1"], **kwargs)
+        self.assertEqual(2, self._count_annotations_caches())
+
+        # Samples are copied, so they can be modified without altering the cache
+        sample = cached_dataset.get_sample(0)
+        sample["target"] += 1
+        self.assertTrue(np.array_equal(dataset.annotations[0]["target"], cached_dataset.annotations[0]["target"]))
+
+    def test_columnar_annotations(self):
+        annotations = [
+            {
+                "target": np.random.random((i % 4, 5)),
+                "img_path": f"images/é_{i}.jpg",
+                "resized_img_shape": (i, 2 * i),
+                "id": i,
+                "info": {"index": i} if i % 2 else None,
+            }
+            for i in range(20)
+        ]
+        columnar_annotations = ColumnarAnnotations.from_annotations(annotations)
+        self.assertEqual(columnar_annotations.columns["target"]["kind"], "ragged")
+        self.assertEqual(columnar_annotations.columns["img_path"]["kind"], "string")
+        self.assertEqual(columnar_annotations.columns["resized_img_shape"]["kind"], "fixed")
+        self.assertEqual(columnar_annotations.columns["id"]["kind"], "scalar")
+        self.assertEqual(columnar_annotations.columns["info"]["kind"], "object")
+
+        columnar_annotations.save(os.path.join(self.temp_cache_dir, "columnar_annotations"))
+        loaded_annotations = ColumnarAnnotations.load(os.path.join(self.temp_cache_dir, "columnar_annotations"))
+
+        for store in (columnar_annotations, loaded_annotations):
+            self.assertEqual(len(annotations), len(store))
+            for annotation, stored_annotation in zip(annotations, store):
+                self.assertEqual(list(annotation.keys()), list(stored_annotation.keys()))
+                self.assertTrue(np.array_equal(annotation["target"], stored_annotation["target"]))
+                for field in ("img_path", "resized_img_shape", "id", "info"):
+                    self.assertEqual(annotation[field], stored_annotation[field])
+                    self.assertEqual(type(annotation[field]), type(stored_annotation[field]))
+            self.assertEqual(store[-1]["id"], 19)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,17 @@
+import contextlib
+import io
+import json
+import tempfile
 import unittest
 from pathlib import Path
 
+import numpy as np
+
+from pycocotools.coco import COCO
+from pycocotools.cocoeval import COCOeval
+
 from super_gradients.training.datasets import COCODetectionDataset
+from super_gradients.training.datasets.lazy_coco import LazyCOCO
 from super_gradients.training.exceptions.dataset_exceptions import DatasetValidationException, ParameterMismatchException
 
 
@@ -44,6 +54,101 @@ class DetectionDatasetTest(unittest.TestCase):
         with self.assertRaises(ParameterMismatchException):
             COCODetectionDataset(**train_dataset_params)
 
+    def test_coco_dataset_targets(self):
+        """Check the targets parsed from the whole json at once against a parsing of every annotation of every image."""
+        dataset = COCODetectionDataset(
+            data_dir=self.mini_coco_data_dir,
+            subdir="images/train2017",
+            json_file="instances_train2017.json",
+            input_dim=[512, 384],
+            ignore_empty_annotations=False,
+        )
+        for sample_id, annotation in enumerate(dataset.annotations):
+            img_id = dataset.sample_id_to_coco_id[sample_id]
+            height, width = annotation["initial_img_shape"]
+            expected_targets = {0: [], 1: []}
+            for coco_annotation in dataset.coco.loadAnns(dataset.coco.getAnnIds(imgIds=[img_id])):
+                x, y, w, h = coco_annotation["bbox"]
+                x1, y1 = max(0, x), max(0, y)
+                x2, y2 = min(width, x1 + max(0, w)), min(height, y1 + max(0, h))
+                if coco_annotation["area"] > 0 and x2 >= x1 and y2 >= y1:
+                    cls_id = dataset.class_ids.index(coco_annotation["category_id"])
+                    expected_targets[coco_annotation["iscrowd"]].append([x1, y1, x2, y2, cls_id])
+
+            r = min(512 / height, 384 / width)
+            for field, is_crowd in (("target", 0), ("crowd_target", 1)):
+                expected_target = np.array(expected_targets[is_crowd], dtype=np.float64).reshape(-1, 5)
+                expected_target[:, :4] *= r
+                self.assertTrue(np.allclose(expected_target, annotation[field]))
+
+    def test_lazy_coco_dataset(self):
+        """Check that the annotations parsed with LazyCOCO, with and without sidecar, are the same as with pycocotools."""
+        dataset_params = dict(
+            data_dir=self.mini_coco_data_dir,
+            subdir="images/train2017",
+            json_file="instances_train2017.json",
+            input_dim=[512, 384],
+            ignore_empty_annotations=False,
+        )
+        expected_annotations = COCODetectionDataset(**dataset_params).annotations
+        with tempfile.TemporaryDirectory() as sidecar_dir:
+            for lazy_params in (dict(lazy_coco=True), dict(coco_sidecar_dir=sidecar_dir), dict(coco_sidecar_dir=sidecar_dir)):
+                annotations = COCODetectionDataset(**dataset_params, **lazy_params).annotations
+                self.assertEqual(len(expected_annotations), len(annotations))
+                for expected_annotation, annotation in zip(expected_annotations, annotations):
+                    for field in ("target", "crowd_target"):
+                        self.assertTrue(np.array_equal(expected_annotation[field], annotation[field]))
+                    self.assertEqual(expected_annotation["img_path"], annotation["img_path"])
+                    self.assertEqual(expected_annotation["initial_img_shape"], annotation["initial_img_shape"])
+            self.assertEqual(len(list(Path(sidecar_dir).iterdir())), 1)
+
+    def test_lazy_coco_api(self):
+        """Check that the indexes of LazyCOCO behave like the ones of pycocotools.COCO."""
+        annotation_file = str(Path(self.mini_coco_data_dir) / "annotations" / "instances_train2017.json")
+        coco = COCO(annotation_file)
+        with tempfile.TemporaryDirectory() as sidecar_dir:
+            for lazy_coco in (LazyCOCO(annotation_file), LazyCOCO(annotation_file, sidecar_dir=sidecar_dir)):
+                self.assertEqual(coco.getImgIds(), lazy_coco.getImgIds())
+                self.assertEqual(coco.getCatIds(), lazy_coco.getCatIds())
+                self.assertEqual(coco.loadCats(coco.getCatIds()), lazy_coco.loadCats(lazy_coco.getCatIds()))
+                for img_id in coco.getImgIds():
+                    self.assertEqual(coco.loadImgs(img_id), lazy_coco.loadImgs(img_id))
+                    ann_ids = coco.getAnnIds(imgIds=[img_id])
+                    self.assertEqual(ann_ids, lazy_coco.getAnnIds(imgIds=[img_id]))
+                    self.assertEqual(coco.loadAnns(ann_ids), lazy_coco.loadAnns(ann_ids))
+                category_id = coco.getCatIds()[0]
+                self.assertEqual(coco.getImgIds(catIds=[category_id]), lazy_coco.getImgIds(catIds=[category_id]))
+
+    def test_lazy_coco_sidecar_dataset(self):
+        """Check that the dataset of LazyCOCO, on a cold and on a warm sidecar, can be used like the one of pycocotools.COCO."""
+        annotation_file = str(Path(self.mini_coco_data_dir) / "annotations" / "instances_train2017.json")
+        coco = COCO(annotation_file)
+        results = [dict(image_id=ann["image_id"], category_id=ann["category_id"], bbox=ann["bbox"], score=0.5) for ann in coco.dataset["annotations"][::3]]
+        # COCOeval adds fields to the annotations of the ground truth, so it gets its own COCO
+        expected_stats = self._evaluate_bboxes(COCO(annotation_file), results)
+
+        with tempfile.TemporaryDirectory() as sidecar_dir:
+            for lazy_coco in (LazyCOCO(annotation_file, sidecar_dir=sidecar_dir), LazyCOCO(annotation_file, sidecar_dir=sidecar_dir)):
+                self.assertEqual(json.dumps(coco.dataset["categories"]), json.dumps(lazy_coco.dataset["categories"]))
+                for key in ("images", "annotations"):
+                    self.assertEqual(coco.dataset[key], list(lazy_coco.dataset[key]))
+                    self.assertEqual(coco.dataset[key][:2], lazy_coco.dataset[key][:2])
+                    self.assertEqual(coco.dataset[key][-5::2], lazy_coco.dataset[key][-5::2])
+                    self.assertEqual(coco.dataset[key][-1], lazy_coco.dataset[key][-1])
+
+                expected_results, lazy_results = coco.loadRes(results), lazy_coco.loadRes(results)
+                self.assertEqual(expected_results.loadAnns(expected_results.getAnnIds()), lazy_results.loadAnns(lazy_results.getAnnIds()))
+                self.assertTrue(np.array_equal(expected_stats, self._evaluate_bboxes(lazy_coco, results)))
+
+    @staticmethod
+    def _evaluate_bboxes(coco: COCO, results: list) -> np.ndarray:
+        with contextlib.redirect_stdout(io.StringIO()):
+            coco_eval = COCOeval(coco, coco.loadRes(results), "bbox")
+            coco_eval.evaluate()
+            coco_eval.accumulate()
+            coco_eval.summarize()
+        return coco_eval.stats
+
 
 if __name__ == "__main__":
     unittest.main()
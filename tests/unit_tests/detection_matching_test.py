@@ -0,0 +1,72 @@
+import unittest
+
+import torch
+
+from super_gradients.training.utils.detection_utils import compute_detection_matching, compute_detection_matching_batched
+
+
+class TestDetectionMatching(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.height, self.width = 320, 480
+
+    def _generate_batch(self, batch_size: int, n_cls: int):
+        """Generate random predictions (x1, y1, x2, y2, confidence, class), targets and crowd targets (index, label, x, y, w, h)."""
+        preds = []
+        for img_i in range(batch_size):
+            n_preds = int(torch.randint(0, 40, (1,)))
+            if n_preds == 0 and img_i % 2:
+                preds.append(None)
+                continue
+            xy = torch.rand(n_preds, 2) * torch.tensor([self.width, self.height])
+            wh = torch.rand(n_preds, 2) * 150
+            scores = torch.rand(n_preds, 1)
+            scores[: n_preds // 4] = 0.5  # Make sure to have ties in the confidence scores
+            preds.append(torch.cat([xy - 10, xy + wh, scores, torch.randint(0, n_cls, (n_preds, 1)).float()], 1))
+
+        def _random_targets(n_targets: int) -> torch.Tensor:
+            img_idx, labels = torch.randint(0, batch_size, (n_targets, 1)).float(), torch.randint(0, n_cls, (n_targets, 1)).float()
+            return torch.cat([img_idx, labels, torch.rand(n_targets, 2), torch.rand(n_targets, 2) * 0.4], 1)
+
+        return preds, _random_targets(int(torch.randint(0, 100, (1,)))), _random_targets(int(torch.randint(0, 10, (1,))))
+
+    def test_batched_matching_is_identical(self):
+        for i in range(50):
+            batch_size = int(torch.randint(1, 8, (1,)))
+            preds, targets, crowd_targets = self._generate_batch(batch_size=batch_size, n_cls=int(torch.randint(1, 6, (1,))))
+            kwargs = dict(
+                height=self.height,
+                width=self.width,
+                iou_thresholds=torch.linspace(0.05, 0.95, 10) if i % 2 else torch.tensor([0.3]),
+                denormalize_targets=True,
+                device="cpu",
+                crowd_targets=crowd_targets if i % 3 else None,
+                top_k=int(torch.randint(1, 20, (1,))),
+            )
+            matching = compute_detection_matching([p if p is None else p.clone() for p in preds], targets.clone(), **kwargs)
+            batched_matching = compute_detection_matching_batched([p if p is None else p.clone() for p in preds], targets.clone(), **kwargs)
+
+            self.assertEqual(len(matching), len(batched_matching))
+            for img_matching, img_batched_matching in zip(matching, batched_matching):
+                for tensor, batched_tensor in zip(img_matching, img_batched_matching):
+                    self.assertEqual(tensor.dtype, batched_tensor.dtype)
+                    self.assertTrue(torch.equal(tensor, batched_tensor))
+
+    def test_batched_matching_empty_batch(self):
+        batched_matching = compute_detection_matching_batched(
+            [None, None],
+            torch.zeros((0, 6)),
+            height=self.height,
+            width=self.width,
+            iou_thresholds=torch.tensor([0.5]),
+            denormalize_targets=True,
+            device="cpu",
+        )
+        self.assertEqual(len(batched_matching), 2)
+        for preds_matched, preds_to_ignore, preds_scores, preds_cls, targets_cls in batched_matching:
+            self.assertEqual(preds_matched.shape, (0, 1))
+            self.assertEqual(len(targets_cls), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
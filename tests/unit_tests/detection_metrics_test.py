@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+import torch
+
+from super_gradients.training.metrics import DetectionMetrics
+from super_gradients.training.utils.detection_utils import DetectionPostPredictionCallback
+
+
+class IdentityPostPredictionCallback(DetectionPostPredictionCallback):
+    """The "model output" used in these tests is already a list of (x1, y1, x2, y2, confidence, class) predictions per image."""
+
+    def forward(self, x, device: str):
+        return x
+
+
+class TestDetectionMetricsAccumulation(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.num_cls, self.batch_size, self.height, self.width = 5, 4, 64, 64
+        self.inputs = torch.zeros(self.batch_size, 3, self.height, self.width)
+        self.batches = [self._generate_batch() for _ in range(10)]
+
+    def _generate_batch(self):
+        """Generate targets (index, label, cx, cy, w, h) and noisy predictions around them, plus some random false positives."""
+        n_targets = 30
+        targets = torch.cat(
+            [
+                torch.randint(0, self.batch_size, (n_targets, 1)).float(),
+                torch.randint(0, self.num_cls, (n_targets, 1)).float(),
+                torch.rand(n_targets, 2) * 0.6 + 0.2,
+                torch.rand(n_targets, 2) * 0.2 + 0.1,
+            ],
+            1,
+        )
+        preds = []
+        for img_i in range(self.batch_size):
+            img_targets = targets[targets[:, 0] == img_i]
+            cx, cy = img_targets[:, 2] * self.width, img_targets[:, 3] * self.height
+            w, h = img_targets[:, 4] * self.width, img_targets[:, 5] * self.height
+            boxes = torch.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], 1) + torch.randn(len(img_targets), 4) * 2
+            boxes = torch.cat([boxes, torch.rand(10, 2).repeat(1, 2) * self.width + torch.tensor([0, 0, 10, 10])], 0)
+            labels = torch.cat([img_targets[:, 1], torch.randint(0, self.num_cls, (10,)).float()])
+            preds.append(torch.cat([boxes, torch.rand(len(boxes), 1), labels.view(-1, 1)], 1))
+        return preds, targets
+
+    def _compute(self, metric: DetectionMetrics):
+        for preds, targets in self.batches:
+            metric.update([p.clone() for p in preds], targets.clone(), device="cpu", inputs=self.inputs)
+        return torch.tensor([float(value) for value in metric.compute().values()])
+
+    def test_histogram_accumulation_matches_exact_metrics(self):
+        exact = self._compute(DetectionMetrics(num_cls=self.num_cls, post_prediction_callback=IdentityPostPredictionCallback()))
+        for n_score_bins, tolerance in ((1000, 0.01), (100, 0.05)):
+            metric = DetectionMetrics(num_cls=self.num_cls, post_prediction_callback=IdentityPostPredictionCallback(), n_score_bins=n_score_bins)
+            histogram = self._compute(metric)
+            self.assertTrue(torch.allclose(exact, histogram, atol=tolerance), (exact, histogram))
+
+    def test_histogram_accumulation_has_constant_memory(self):
+        metric = DetectionMetrics(num_cls=self.num_cls, post_prediction_callback=IdentityPostPredictionCallback(), n_score_bins=100)
+        self._compute(metric)
+        self.assertEqual(getattr(metric, f"tp_histogram{metric._get_range_str()}").shape, (self.num_cls, 10, 100))
+        self.assertFalse(hasattr(metric, f"matching_info{metric._get_range_str()}"))
+
+    def test_tensor_dist_sync_matches_local_metrics(self):
+        metric = DetectionMetrics(num_cls=self.num_cls, post_prediction_callback=IdentityPostPredictionCallback())
+        expected = self._compute(metric)
+
+        metric = DetectionMetrics(num_cls=self.num_cls, post_prediction_callback=IdentityPostPredictionCallback(), tensor_dist_sync=True)
+        for preds, targets in self.batches:
+            metric.update([p.clone() for p in preds], targets.clone(), device="cpu", inputs=self.inputs)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            torch.distributed.init_process_group("gloo", init_method=f"file://{os.path.join(tmp_dir, 'store')}", world_size=1, rank=0)
+            try:
+                metric.is_distributed = True
+                metric._sync_dist()
+                synced = torch.tensor([float(value) for value in metric.compute().values()])
+            finally:
+                torch.distributed.destroy_process_group()
+
+        self.assertEqual(len(getattr(metric, f"matching_info{metric._get_range_str()}")), 1)
+        self.assertTrue(torch.allclose(expected, synced), (expected, synced))
+
+    def test_histogram_all_reduce_matches_local_metrics(self):
+        metric = DetectionMetrics(num_cls=self.num_cls, post_prediction_callback=IdentityPostPredictionCallback(), n_score_bins=100)
+        expected = self._compute(metric)
+
+        metric = DetectionMetrics(num_cls=self.num_cls, post_prediction_callback=IdentityPostPredictionCallback(), n_score_bins=100, tensor_dist_sync=True)
+        for preds, targets in self.batches:
+            metric.update([p.clone() for p in preds], targets.clone(), device="cpu", inputs=self.inputs)
+        local_tp_histogram = getattr(metric, f"tp_histogram{metric._get_range_str()}").clone()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            torch.distributed.init_process_group("gloo", init_method=f"file://{os.path.join(tmp_dir, 'store')}", world_size=1, rank=0)
+            try:
+                metric.is_distributed = True
+                metric._sync_dist()
+                synced = torch.tensor([float(value) for value in metric.compute().values()])
+            finally:
+                torch.distributed.destroy_process_group()
+
+        self.assertTrue(torch.equal(getattr(metric, f"tp_histogram{metric._get_range_str()}"), local_tp_histogram))
+        self.assertTrue(torch.allclose(expected, synced), (expected, synced))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -76,6 +76,29 @@ class TestDetectionDatasetSubclassing(unittest.TestCase):
         with self.assertRaises(DatasetValidationException):
             DummyDetectionDataset(input_dim=(640, 512), class_inclusion_list=["class_0", "non_existing_class"])
 
+    def test_subclass_remap_class_ids(self):
+        """Check that the class ids are remapped to their position in class_inclusion_list, whatever the position of the class id in the target."""
+        test_dataset = DummyDetectionDataset(input_dim=(640, 512), ignore_empty_annotations=False, class_inclusion_list=["class_2", "class_0"])
+        targets = np.array([[0, 0, 10, 10, 0], [0, 5, 10, 15, 1], [0, 5, 15, 20, 2], [1, 5, 15, 20, 0]], dtype=np.float32)
+
+        subclassed_targets = test_dataset._sub_class_target(targets=targets.copy(), cls_posx=-1)
+        expected_targets = np.array([[0, 0, 10, 10, 1], [0, 5, 15, 20, 0], [1, 5, 15, 20, 1]], dtype=np.float32)
+        self.assertTrue(np.array_equal(expected_targets, subclassed_targets))
+
+        subclassed_targets = test_dataset._sub_class_target(targets=targets[:, ::-1].copy(), cls_posx=0)
+        self.assertTrue(np.array_equal(expected_targets[:, ::-1], subclassed_targets))
+
+        self.assertEqual((0, 5), test_dataset._sub_class_target(targets=targets[1:2].copy(), cls_posx=-1).shape)
+        self.assertEqual((0, 5), test_dataset._sub_class_target(targets=np.zeros((0, 5)), cls_posx=-1).shape)
+
+        # Subclassing many target arrays at once gives the same result as subclassing them one by one
+        targets_list = [targets, targets[1:2], np.zeros((0, 5)), targets[::-1], targets.astype(np.float64)]
+        sub_classed_targets_list = test_dataset._sub_class_targets(targets_list=[targets.copy() for targets in targets_list], cls_posx=-1)
+        for targets, sub_classed_targets in zip(targets_list, sub_classed_targets_list):
+            expected_targets = test_dataset._sub_class_target(targets=targets.copy(), cls_posx=-1)
+            self.assertEqual(expected_targets.dtype, sub_classed_targets.dtype)
+            self.assertTrue(np.array_equal(expected_targets, sub_classed_targets))
+
 
 def _count_targets_after_subclass_per_index(test_dataset: DummyDetectionDataset):
     """Iterate through every index of the dataset and count the associated number of targets per index"""
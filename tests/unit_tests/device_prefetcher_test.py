@@ -0,0 +1,42 @@
+import unittest
+
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from super_gradients.training.utils import DevicePrefetcher
+
+
+class DictBatchesDataset(Dataset):
+    def __len__(self):
+        return 10
+
+    def __getitem__(self, index):
+        return {"image": torch.full((3, 8, 8), float(index)), "target": (torch.tensor(index), [torch.tensor([index, 2 * index])])}
+
+
+class DevicePrefetcherTest(unittest.TestCase):
+    def _assert_same_batches(self, device: str):
+        data_loader = DataLoader(DictBatchesDataset(), batch_size=4, pin_memory=torch.cuda.is_available())
+        prefetcher = DevicePrefetcher(data_loader, device)
+        self.assertEqual(len(prefetcher), len(data_loader))
+
+        batches = list(prefetcher)
+        expected_batches = list(data_loader)
+        self.assertEqual(len(batches), len(expected_batches))
+        for batch, expected_batch in zip(batches, expected_batches):
+            self.assertEqual(batch["image"].device.type, torch.device(device).type)
+            torch.testing.assert_close(batch["image"].cpu(), expected_batch["image"])
+            self.assertIsInstance(batch["target"], list)
+            torch.testing.assert_close(batch["target"][0].cpu(), expected_batch["target"][0])
+            torch.testing.assert_close(batch["target"][1][0].cpu(), expected_batch["target"][1][0])
+
+    def test_cpu_prefetcher(self):
+        self._assert_same_batches("cpu")
+
+    @unittest.skipIf(not torch.cuda.is_available(), "No CUDA device")
+    def test_cuda_prefetcher(self):
+        self._assert_same_batches("cuda")
+
+
+if __name__ == "__main__":
+    unittest.main()
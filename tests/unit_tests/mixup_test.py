@@ -0,0 +1,57 @@
+import unittest
+
+import torch
+
+from super_gradients.training.datasets.mixup import MixupPrePredictionCallback
+
+
+class MixupPrePredictionCallbackTest(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.num_classes = 10
+        # Every image has a distinct constant value, so the origin of every pixel of the mixed images is known
+        self.images = torch.arange(1, 9, dtype=torch.float32).view(8, 1, 1, 1).expand(8, 3, 32, 48).contiguous()
+        self.labels = torch.arange(8) % self.num_classes
+
+    def _get_lambdas(self, targets: torch.Tensor, label_smoothing: float) -> torch.Tensor:
+        off_value = label_smoothing / self.num_classes
+        on_value = 1.0 - label_smoothing + off_value
+        own_target = targets[torch.arange(len(targets)), self.labels]
+        return (own_target - off_value) / (on_value - off_value)
+
+    def test_cutmix(self):
+        for mode in ("batch", "pair", "elem"):
+            callback = MixupPrePredictionCallback(mixup_alpha=0.0, cutmix_alpha=1.0, mode=mode, label_smoothing=0.1, num_classes=self.num_classes)
+            mixed, targets = callback(self.images.clone(), self.labels.clone(), batch_idx=0)
+
+            self.assertEqual(targets.shape, (8, self.num_classes))
+            torch.testing.assert_close(targets.sum(dim=1), torch.ones(8))
+            # Every pixel comes from the image itself or from its partner, and lambda is the fraction of pixels of the image itself
+            own_pixels = mixed == self.images
+            self.assertTrue(torch.all(own_pixels | (mixed == self.images.flip(0))))
+            own_fractions = own_pixels[:, 0].float().mean(dim=(1, 2))
+            lam = self._get_lambdas(targets, label_smoothing=0.1)
+            torch.testing.assert_close(lam, own_fractions, atol=1e-5, rtol=0)
+            if mode == "batch":
+                torch.testing.assert_close(lam, lam[:1].expand(8))
+            if mode == "pair":
+                torch.testing.assert_close(lam, lam.flip(0))
+
+    def test_mixup(self):
+        for mode in ("batch", "pair", "elem"):
+            callback = MixupPrePredictionCallback(mixup_alpha=0.2, cutmix_alpha=0.0, mode=mode, label_smoothing=0.0, num_classes=self.num_classes)
+            mixed, targets = callback(self.images.clone(), self.labels.clone(), batch_idx=0)
+
+            lam = self._get_lambdas(targets, label_smoothing=0.0).view(-1, 1, 1, 1)
+            torch.testing.assert_close(mixed, self.images * lam + self.images.flip(0) * (1 - lam))
+
+    def test_disabled(self):
+        callback = MixupPrePredictionCallback(mixup_alpha=0.2, cutmix_alpha=1.0, mode="elem", label_smoothing=0.1, num_classes=self.num_classes)
+        callback.mixup_enabled = False
+        mixed, targets = callback(self.images.clone(), self.labels.clone(), batch_idx=0)
+        torch.testing.assert_close(mixed, self.images)
+        self.assertTrue(torch.all(targets.argmax(dim=1) == self.labels))
+
+
+if __name__ == "__main__":
+    unittest.main()
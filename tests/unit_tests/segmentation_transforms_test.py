@@ -1,8 +1,21 @@
+import random
 import unittest
 
+import numpy as np
 import torch
 from torchvision.transforms import Compose, ToTensor
-from super_gradients.training.transforms.transforms import SegRescale, SegRandomRescale, SegCropImageAndMask, SegPadShortToCropSize
+from super_gradients.training.transforms.transforms import (
+    SegRescale,
+    SegRandomRescale,
+    SegCropImageAndMask,
+    SegPadShortToCropSize,
+    SegResize,
+    SegRandomFlip,
+    SegRandomRotate,
+    SegRandomGaussianBlur,
+    SegColorJitter,
+)
+from super_gradients.training.transforms.batch_transforms import SegmentationBatchNormalize
 from PIL import Image
 from super_gradients.training.datasets.segmentation_datasets.segmentation_dataset import SegmentationDataSet
 
@@ -216,6 +229,49 @@ class SegmentationTransformsTest(unittest.TestCase):
         out = transform(sample)
         self.assertEqual(crop_size, out["image"].size)
 
+    def test_numpy_transforms_match_pil(self):
+        rng = np.random.default_rng(0)
+        image = np.repeat(np.repeat(rng.integers(0, 256, (32, 64, 3), dtype=np.uint8), 8, axis=0), 8, axis=1)
+        mask = np.repeat(np.repeat(rng.integers(0, 20, (32, 64), dtype=np.uint8), 8, axis=0), 8, axis=1)
+
+        transforms = [
+            SegResize(h=200, w=300),
+            SegRandomFlip(prob=1.0),
+            SegRescale(scale_factor=1.5),
+            SegRandomRescale(scales=(0.5, 1.5)),
+            SegRandomRotate(min_deg=-10, max_deg=10, fill_mask=19),
+            SegCropImageAndMask(crop_size=(300, 200), mode="random"),
+            SegCropImageAndMask(crop_size=(600, 300), mode="center"),
+            SegRandomGaussianBlur(prob=1.0),
+            SegPadShortToCropSize(crop_size=(600, 300), fill_mask=19, fill_image=(1, 2, 3)),
+            SegColorJitter(brightness=0.5, contrast=0.5, saturation=0.5, hue=0.1),
+        ]
+        for transform in transforms:
+            random.seed(0)
+            torch.manual_seed(0)
+            pil_out = transform({"image": Image.fromarray(image), "mask": Image.fromarray(mask)})
+            random.seed(0)
+            torch.manual_seed(0)
+            numpy_out = transform({"image": image.copy(), "mask": mask.copy()})
+
+            # Same random parameters, so the same geometry and the same masks, and images differing only by interpolation
+            self.assertIsInstance(numpy_out["image"], np.ndarray)
+            np.testing.assert_array_equal(np.asarray(pil_out["mask"]), numpy_out["mask"], err_msg=repr(transform))
+            pil_image = np.asarray(pil_out["image"]).astype(np.float32)
+            self.assertEqual(pil_image.shape, numpy_out["image"].shape)
+            self.assertLess(np.abs(pil_image - numpy_out["image"]).mean(), 5, repr(transform))
+
+    def test_batch_normalize(self):
+        images = [np.random.randint(0, 256, (16, 32, 3), dtype=np.uint8) for _ in range(4)]
+        uint8_batch = torch.stack([SegmentationDataSet.uint8_sample_transform(image) for image in images])
+        masks = torch.zeros(4, 16, 32, dtype=torch.long)
+        self.assertEqual(uint8_batch.dtype, torch.uint8)
+
+        normalized_batch, out_masks = SegmentationBatchNormalize()(uint8_batch, masks)
+        expected_batch = torch.stack([SegmentationDataSet.sample_transform(image) for image in images])
+        torch.testing.assert_close(normalized_batch, expected_batch)
+        self.assertIs(out_masks, masks)
+
 
 if __name__ == "__main__":
     unittest.main()
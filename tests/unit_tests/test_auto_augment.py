@@ -1,6 +1,8 @@
 import unittest
+import torch
 import torchvision.transforms as transforms
-from super_gradients.training.datasets.auto_augment import RandAugment
+from super_gradients.training.datasets import auto_augment
+from super_gradients.training.datasets.auto_augment import RandAugment, TensorRandAugment, rand_augment_transform
 from super_gradients.training.datasets.datasets_utils import get_color_augmentation
 import numpy as np
 from PIL import Image
@@ -27,6 +29,65 @@ class TestAutoAugment(unittest.TestCase):
         augmented_image = color_augmentation(img)
         self.assertTrue(augmented_image.size == (image_size, image_size))
 
+    def test_tensor_ops_match_pil(self):
+        """
+        tests that every op of the tensor backend gives (almost) the same images as the PIL op with the same arguments
+        """
+        image = np.random.RandomState(0).randint(0, 256, (3, 12, 16, 3)).astype("uint8")
+        images = [Image.fromarray(img).resize((64, 48), Image.BILINEAR) for img in image]
+        tensors = torch.stack([torch.from_numpy(np.array(img)).permute(2, 0, 1) for img in images]).float()
+        fill = (124, 116, 104)
+        cases = {
+            "auto_contrast": [],
+            "equalize": [],
+            "invert": [],
+            "solarize": [0, 100, 256],
+            "solarize_add": [0, 50, 110],
+            "posterize": [0, 3, 8],
+            "contrast": [0.1, 0.6, 1.9],
+            "color": [0.1, 0.6, 1.9],
+            "brightness": [0.1, 0.6, 1.9],
+            "sharpness": [0.1, 0.6, 1.9],
+            "shear_x": [-0.3, 0.0, 0.2],
+            "shear_y": [-0.3, 0.0, 0.2],
+            "translate_x_rel": [-0.3, 0.0, 0.2],
+            "translate_y_abs": [-20, 0, 10],
+            "rotate": [-30, 0, 25],
+        }
+        for name, args in cases.items():
+            op_kwargs = dict(fillcolor=fill, resample=Image.BILINEAR) if name in ("shear_x", "shear_y", "translate_x_rel", "translate_y_abs", "rotate") else {}
+            expected = [getattr(auto_augment, name)(img, *([arg] if args else []), **op_kwargs) for img, arg in zip(images, args or [None] * 3)]
+            expected = np.stack([np.asarray(img) for img in expected]).astype(np.float32)
+            tensor_args = [torch.tensor(args, dtype=torch.float32)] if args else []
+            output = getattr(auto_augment, name + "_tensor")(tensors.clone(), *tensor_args, fill=torch.tensor(fill, dtype=torch.float32))
+            mean_abs_diff = np.abs(output.permute(0, 2, 3, 1).numpy() - expected).mean()
+            self.assertLess(mean_abs_diff, 1.0, name)
+
+    def test_tensor_rand_augment(self):
+        """
+        tests the tensor backend selected through the config string, on uint8 and on normalized images
+        """
+        torch.manual_seed(0)
+        img_mean, img_std = [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]
+        transform = rand_augment_transform("rand-m9-mstd0.5-tensor1", crop_size=32, img_mean=img_mean)
+        self.assertTrue(isinstance(transform, TensorRandAugment))
+        images = torch.randint(0, 256, (16, 3, 32, 32), dtype=torch.uint8)
+        targets = torch.arange(16)
+        augmented_images, augmented_targets = transform(images, targets)
+        self.assertEqual(augmented_images.shape, images.shape)
+        self.assertEqual(augmented_images.dtype, torch.uint8)
+        self.assertTrue(torch.equal(augmented_targets, targets))
+        self.assertFalse(torch.equal(augmented_images, images))
+
+        transform = rand_augment_transform("rand-m9-mstd0.5-w0-tensor1", crop_size=32, img_mean=img_mean, img_std=img_std)
+        transform.ops = [auto_augment.TensorAugmentOp("Invert", prob=1.0)]
+        transform.num_layers = 1
+        transform.choice_weights = None
+        mean, std = torch.tensor(img_mean).view(1, 3, 1, 1), torch.tensor(img_std).view(1, 3, 1, 1)
+        normalized_images = (images.float() / 255 - mean) / std
+        augmented_images, _ = transform(normalized_images, targets)
+        torch.testing.assert_close(augmented_images, ((255 - images.float()) / 255 - mean) / std, atol=1e-4, rtol=0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import unittest
+
+import torch
+
+from super_gradients import Trainer
+from super_gradients.training.dataloaders.dataloaders import classification_test_dataloader
+from super_gradients.training.models import ResNet18
+from super_gradients.training.utils import torch_version_is_greater_or_equal
+from super_gradients.training.utils.checkpoint_utils import remove_torch_compile_prefix
+
+
+class TorchCompileTest(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.experiment_name = "test_torch_compile"
+        cls.train_params = {
+            "max_epochs": 2,
+            "lr_mode": "cosine",
+            "initial_lr": 0.1,
+            "loss": torch.nn.CrossEntropyLoss(),
+            "optimizer": "SGD",
+            "train_metrics_list": [],
+            "valid_metrics_list": [],
+            "metric_to_watch": "CrossEntropyLoss",
+            "greater_metric_to_watch_is_better": False,
+            "ema": True,
+            "torch_compile": True,
+            "torch_compile_loss": True,
+            # THE EAGER BACKEND DOES NOT NEED A COMPILER, SO THE TEST RUNS ANYWHERE
+            "torch_compile_params": {"backend": "eager"},
+        }
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        if os.path.isdir(os.path.join("checkpoints", "test_torch_compile")):
+            shutil.rmtree(os.path.join("checkpoints", "test_torch_compile"))
+
+    @unittest.skipIf(not torch_version_is_greater_or_equal(2, 0), "torch.compile requires torch>=2.0")
+    def test_train_with_torch_compile(self):
+        trainer = Trainer(self.experiment_name)
+        net = ResNet18(num_classes=5, arch_params={})
+
+        # RECORD THE CRITERION GIVEN TO EVERY LOSS COMPUTATION
+        criteria = []
+        get_losses = trainer._get_losses
+
+        def _get_losses_spy(outputs, targets, criterion=None):
+            criteria.append(criterion)
+            return get_losses(outputs, targets, criterion=criterion)
+
+        trainer._get_losses = _get_losses_spy
+        trainer.train(
+            model=net,
+            training_params=self.train_params,
+            train_loader=classification_test_dataloader(batch_size=10),
+            valid_loader=classification_test_dataloader(batch_size=10),
+        )
+        # THE TRAIN LOOP USES THE COMPILED LOSS, THE VALIDATION USES THE UNCOMPILED ONE
+        self.assertTrue(any(hasattr(criterion, "_orig_mod") for criterion in criteria))
+        self.assertIn(None, criteria)
+        self.assertIsNone(trainer._compiled_net)
+        self.assertIsNone(trainer._compiled_criterion)
+        # THE EMA MODEL AND THE CHECKPOINTS ARE THE ONES OF THE UNCOMPILED MODEL
+        self.assertFalse(hasattr(trainer.ema_model.ema, "_orig_mod"))
+        checkpoint = torch.load(os.path.join(trainer.checkpoints_dir_path, "ckpt_latest.pth"), map_location="cpu", weights_only=False)
+        self.assertFalse(any("_orig_mod" in key for key in checkpoint["net"].keys()))
+        self.assertFalse(any("_orig_mod" in key for key in checkpoint["ema_net"].keys()))
+        self.assertEqual(set(checkpoint["net"].keys()), set(trainer.net.state_dict().keys()))
+
+    @unittest.skipIf(not torch_version_is_greater_or_equal(2, 0), "torch.compile requires torch>=2.0")
+    def test_train_compiled_model(self):
+        trainer = Trainer(self.experiment_name)
+        net = torch.compile(ResNet18(num_classes=5, arch_params={}), backend="eager")
+        trainer.train(
+            model=net,
+            training_params={**self.train_params, "torch_compile": False, "ema": False},
+            train_loader=classification_test_dataloader(batch_size=10),
+            valid_loader=classification_test_dataloader(batch_size=10),
+        )
+        self.assertFalse(any("_orig_mod" in key for key in trainer.net.state_dict().keys()))
+
+    def test_remove_torch_compile_prefix(self):
+        net = ResNet18(num_classes=5, arch_params={})
+        state_dict = {f"module._orig_mod.{key}": value for key, value in net.state_dict().items()}
+        net.load_state_dict({key[len("module.") :]: value for key, value in remove_torch_compile_prefix(state_dict).items()})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,26 @@ import os
 import logging
 from super_gradients.common.abstractions.abstract_logger import get_logger
 import shutil
+import torch
+from super_gradients.training.utils.callbacks import Phase, PhaseCallback, PhaseContext
+
+
+class ValidationLossItemsDevicesCollector(PhaseCallback):
+    def __init__(self):
+        super().__init__(phase=Phase.VALIDATION_BATCH_END)
+        self.devices = set()
+
+    def __call__(self, context: PhaseContext):
+        self.devices.add(context.loss_log_items.device.type)
+
+
+class TrainMetricsCollector(PhaseCallback):
+    def __init__(self):
+        super().__init__(phase=Phase.TRAIN_EPOCH_END)
+        self.metrics_dicts = []
+
+    def __call__(self, context: PhaseContext):
+        self.metrics_dicts.append(context.metrics_dict)
 
 
 class SgTrainerLoggingTest(unittest.TestCase):
@@ -58,6 +78,63 @@ class SgTrainerLoggingTest(unittest.TestCase):
         root_logger_handlers = logging.root.handlers
         assert any(isinstance(handler, logging.StreamHandler) and handler.name == "console" for handler in root_logger_handlers)
 
+    def test_log_every_n_steps(self):
+        """
+        tests that the train results of the epochs do not depend on log_every_n_steps
+        """
+        metrics_dicts = {}
+        for log_every_n_steps in (1, 3):
+            torch.manual_seed(0)
+            metrics_collector = TrainMetricsCollector()
+            trainer = Trainer(f"test_log_every_{log_every_n_steps}_steps")
+            train_params = {
+                "max_epochs": 2,
+                "lr_mode": "cosine",
+                "initial_lr": 0.1,
+                "loss": torch.nn.CrossEntropyLoss(),
+                "optimizer": "SGD",
+                "train_metrics_list": [],
+                "valid_metrics_list": [],
+                "metric_to_watch": "CrossEntropyLoss",
+                "greater_metric_to_watch_is_better": False,
+                "phase_callbacks": [metrics_collector],
+                "log_every_n_steps": log_every_n_steps,
+            }
+            trainer.train(
+                model=ResNet18(num_classes=5, arch_params={}),
+                training_params=train_params,
+                train_loader=classification_test_dataloader(dataset_size=40, batch_size=10),
+                valid_loader=classification_test_dataloader(batch_size=10),
+            )
+            metrics_dicts[log_every_n_steps] = metrics_collector.metrics_dicts
+
+        self.assertEqual(len(metrics_dicts[1]), 2)
+        self.assertEqual(metrics_dicts[1], metrics_dicts[3])
+
+    @unittest.skipIf(not torch.cuda.is_available(), "No CUDA device")
+    def test_validation_loss_items_stay_on_device(self):
+        devices_collector = ValidationLossItemsDevicesCollector()
+        trainer = Trainer("test_validation_loss_items_stay_on_device")
+        train_params = {
+            "max_epochs": 1,
+            "lr_mode": "cosine",
+            "initial_lr": 0.1,
+            "loss": torch.nn.CrossEntropyLoss(),
+            "optimizer": "SGD",
+            "train_metrics_list": [],
+            "valid_metrics_list": [],
+            "metric_to_watch": "CrossEntropyLoss",
+            "greater_metric_to_watch_is_better": False,
+            "phase_callbacks": [devices_collector],
+        }
+        trainer.train(
+            model=ResNet18(num_classes=5, arch_params={}),
+            training_params=train_params,
+            train_loader=classification_test_dataloader(batch_size=10),
+            valid_loader=classification_test_dataloader(batch_size=10),
+        )
+        self.assertEqual(devices_collector.devices, {"cuda"})
+
 
 if __name__ == "__main__":
     unittest.main()
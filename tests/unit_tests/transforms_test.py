@@ -1,14 +1,42 @@
+import copy
+import random
 import unittest
 
+import cv2
 import numpy as np
+import torch
 
+from super_gradients.common.factories.list_factory import ListFactory
+from super_gradients.common.factories.transforms_factory import TransformsFactory
 from super_gradients.training.transforms.keypoint_transforms import (
+    KeypointsCompose,
     KeypointsRandomHorizontalFlip,
     KeypointsRandomVerticalFlip,
     KeypointsRandomAffineTransform,
     KeypointsPadIfNeeded,
     KeypointsLongestMaxSize,
 )
+from super_gradients.training.transforms.batch_transforms import (
+    DetectionBatchHorizontalFlip,
+    DetectionBatchHSV,
+    DetectionBatchMixup,
+    DetectionBatchRandomAffine,
+    warp_affine,
+)
+from super_gradients.training.transforms.buffer_pool import BufferPool
+from super_gradients.training.transforms.transforms import (
+    DetectionMosaic,
+    DetectionMixup,
+    DetectionRandomAffine,
+    DetectionMosaicAffine,
+    DetectionPaddedRescale,
+    DetectionHSV,
+    get_affine_matrix,
+    apply_affine_to_bboxes,
+    _apply_affine_to_targets,
+    _filter_box_candidates,
+)
+from super_gradients.training.utils.detection_utils import DetectionCollateFN
 
 
 class TestTransforms(unittest.TestCase):
@@ -83,6 +111,224 @@ class TestTransforms(unittest.TestCase):
         self.assertTrue((aug_joints[..., 0] < aug_image.shape[1]).all())
         self.assertTrue((aug_joints[..., 1] < aug_image.shape[0]).all())
 
+    def test_keypoints_fused_transforms(self):
+        flip_index = [16, 15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1, 0]
+        transforms = [
+            KeypointsLongestMaxSize(max_height=640, max_width=640),
+            KeypointsPadIfNeeded(min_height=640, min_width=640, image_pad_value=[127, 127, 127], mask_pad_value=1),
+            KeypointsRandomHorizontalFlip(flip_index=flip_index, prob=0.5),
+            KeypointsRandomAffineTransform(
+                max_rotation=30, min_scale=0.75, max_scale=1.5, max_translate=0.2, image_pad_value=[127, 127, 127], mask_pad_value=1, prob=0.5
+            ),
+        ]
+        sequential, fused = KeypointsCompose(transforms), KeypointsCompose(transforms, fuse_affine_transforms=True)
+
+        for seed in range(10):
+            height, width = np.random.randint(200, 800, size=2)
+            image = cv2.GaussianBlur(np.random.randint(0, 255, size=(height, width, 3), dtype=np.uint8), (0, 0), 3)
+            mask = (np.random.rand(height, width) > 0.2).astype(np.float32)
+            joints = np.concatenate([np.random.rand(2, 17, 2) * (width, height), np.random.randint(0, 3, size=(2, 17, 1))], axis=-1).astype(np.float32)
+
+            random.seed(seed)
+            expected_image, expected_mask, expected_joints = sequential(image, mask, joints)
+            random.seed(seed)
+            fused_image, fused_mask, fused_joints = fused(image, mask, joints)
+
+            np.testing.assert_allclose(fused_joints, expected_joints, rtol=1e-4, atol=1e-3)
+            self.assertEqual(fused_image.shape, expected_image.shape)
+            self.assertEqual(fused_mask.shape, expected_mask.shape)
+            # The image is interpolated once instead of once per transform
+            self.assertLess(np.abs(fused_image.astype(np.float32) - expected_image).mean(), 1)
+
+    def test_keypoints_fused_transforms_hide_outside_joints(self):
+        """The joints moved outside of the image by an affine warp stay hidden after a following padding or affine warp."""
+        affine = KeypointsRandomAffineTransform(
+            max_rotation=30, min_scale=0.75, max_scale=1.5, max_translate=0.4, image_pad_value=[127, 127, 127], mask_pad_value=1, prob=1
+        )
+        for following_transform in (KeypointsPadIfNeeded(min_height=800, min_width=800, image_pad_value=[127, 127, 127], mask_pad_value=1), affine):
+            transforms = [affine, following_transform]
+            sequential, fused = KeypointsCompose(transforms), KeypointsCompose(transforms, fuse_affine_transforms=True)
+
+            for seed in range(10):
+                image = cv2.GaussianBlur(np.random.randint(0, 255, size=(400, 300, 3), dtype=np.uint8), (0, 0), 3)
+                mask = (np.random.rand(400, 300) > 0.2).astype(np.float32)
+                joints = np.concatenate([np.random.rand(2, 17, 2) * (300, 400), np.ones((2, 17, 1))], axis=-1).astype(np.float32)
+
+                random.seed(seed)
+                expected_image, expected_mask, expected_joints = sequential(image, mask, joints)
+                random.seed(seed)
+                fused_image, fused_mask, fused_joints = fused(image, mask, joints)
+
+                np.testing.assert_array_equal(fused_joints[..., 2], expected_joints[..., 2])
+                np.testing.assert_allclose(fused_joints, expected_joints, rtol=1e-4, atol=1e-3)
+                self.assertEqual(fused_image.shape, expected_image.shape)
+
+    def test_detection_mosaic_affine(self):
+        def get_sample(h, w, n_targets):
+            image = cv2.GaussianBlur(np.random.randint(0, 255, size=(h, w, 3), dtype=np.uint8), (0, 0), 5)
+            xy = np.sort(np.random.rand(n_targets, 2, 2) * (w, h), axis=1).reshape(n_targets, 4)
+            return {"image": image, "target": np.concatenate([xy, np.random.randint(0, 80, size=(n_targets, 1))], axis=1)}
+
+        affine_params = dict(degrees=10.0, translate=0.1, scales=[0.1, 2], shear=2.0, target_size=(640, 640), filter_box_candidates=True)
+        mosaic, affine = DetectionMosaic(input_dim=(640, 640)), DetectionRandomAffine(**affine_params)
+        mosaic_affine = DetectionMosaicAffine(input_dim=(640, 640), **affine_params)
+
+        for seed in range(10):
+            samples = [get_sample(np.random.randint(200, 800), np.random.randint(200, 800), np.random.randint(0, 10)) for _ in range(4)]
+            random.seed(seed)
+            expected_sample = affine(mosaic({**samples[0], "additional_samples": [dict(s) for s in samples[1:]]}))
+            random.seed(seed)
+            sample = mosaic_affine({**samples[0], "additional_samples": [dict(s) for s in samples[1:]]})
+
+            np.testing.assert_allclose(sample["target"], expected_sample["target"])
+            self.assertEqual(sample["image"].shape, expected_sample["image"].shape)
+            # Only the pixels on the edges of the images are interpolated differently
+            self.assertLess(np.abs(sample["image"].astype(np.float32) - expected_sample["image"]).mean(), 1)
+
+    def test_buffer_pool(self):
+        pool = BufferPool(max_buffers_per_shape=2)
+        buffer = pool.full((4, 4, 3), 114)
+        self.assertTrue((buffer == 114).all())
+        # A buffer is not lent again while it is referenced, even through a view
+        view = buffer[1:]
+        self.assertIsNot(pool.empty((4, 4, 3)), buffer)
+        del buffer
+        self.assertIsNot(pool.empty((4, 4, 3)), view.base)
+        buffer_id = id(view.base)
+        del view
+        self.assertEqual(id(pool.empty((4, 4, 3))), buffer_id)
+        self.assertEqual(pool.n_buffers, 2)
+
+        # When all the buffers are borrowed, new arrays are allocated without being kept
+        borrowed = [pool.empty((4, 4, 3)) for _ in range(3)]
+        self.assertEqual(len({id(buffer) for buffer in borrowed}), 3)
+        self.assertEqual(pool.n_buffers, 2)
+        self.assertEqual(pool.empty((4, 4, 3), dtype=np.float32).dtype, np.float32)
+
+    def test_use_buffer_pool(self):
+        """Check that the transforms give the same outputs with and without the buffer pool, also when the pooled buffers are reused."""
+
+        def get_sample():
+            h, w = np.random.randint(200, 500, size=2)
+            xy = np.sort(np.random.rand(5, 2, 2) * (w, h), axis=1).reshape(5, 4)
+            return {"image": np.random.randint(0, 255, size=(h, w, 3), dtype=np.uint8), "target": np.concatenate([xy, np.ones((5, 1))], axis=1)}
+
+        transforms_params = [
+            (DetectionMosaic, dict(input_dim=(320, 320))),
+            (DetectionMixup, dict(input_dim=(320, 320), mixup_scale=[0.5, 1.5])),
+            (DetectionPaddedRescale, dict(input_dim=(320, 320))),
+        ]
+        for seed in range(3):
+            np.random.seed(seed)
+            samples = [get_sample() for _ in range(4)]
+            for transform_class, params in transforms_params:
+                outputs = []
+                for use_buffer_pool in (False, True):
+                    random.seed(seed)
+                    sample = {**copy.deepcopy(samples[0]), "additional_samples": copy.deepcopy(samples[1:])}
+                    outputs.append(transform_class(use_buffer_pool=use_buffer_pool, **params)(sample))
+                np.testing.assert_array_equal(outputs[0]["image"], outputs[1]["image"])
+                np.testing.assert_array_equal(outputs[0]["target"], outputs[1]["target"])
+
+    def test_detection_padded_rescale_keep_uint8(self):
+        image = np.random.randint(0, 255, size=(480, 320, 3), dtype=np.uint8)
+        samples = []
+        for keep_uint8 in (False, True):
+            sample = {"image": image.copy(), "target": np.array([[10, 20, 30, 40, 1]], dtype=np.float32)}
+            samples.append(DetectionPaddedRescale(input_dim=(640, 640), keep_uint8=keep_uint8)(sample))
+
+        self.assertEqual(samples[0]["image"].dtype, np.float32)
+        self.assertEqual(samples[1]["image"].dtype, np.uint8)
+        np.testing.assert_array_equal(samples[0]["image"], samples[1]["image"])
+        np.testing.assert_array_equal(samples[0]["target"], samples[1]["target"])
+
+        # The collate function converts the uint8 images to float once per batch
+        images, _ = DetectionCollateFN()([(sample["image"], np.zeros((50, 5), dtype=np.float32)) for sample in samples])
+        self.assertEqual(images.dtype, torch.float32)
+        self.assertTrue(torch.equal(images[0], images[1]))
+
+    def test_detection_hsv_lut(self):
+        for bgr_channels, n_channels in [((0, 1, 2), 3), ((2, 1, 0), 3), ((0, 1, 2), 4)]:
+            image = np.random.randint(0, 256, size=(64, 80, n_channels), dtype=np.uint8)
+            images = []
+            for use_lut in (False, True):
+                np.random.seed(0)
+                random.seed(0)
+                transform = DetectionHSV(prob=1.0, hgain=5, sgain=30, vgain=30, bgr_channels=bgr_channels, use_lut=use_lut)
+                images.append(transform({"image": image.copy(), "target": np.zeros((0, 5))})["image"])
+            np.testing.assert_array_equal(images[0], images[1])
+
+    def test_detection_random_affine_targets_fast_path(self):
+        xy = np.random.uniform(0, 400, (50, 2))
+        targets = np.concatenate([xy, xy + np.random.uniform(1, 200, (50, 2)), np.random.randint(0, 80, (50, 1))], axis=1).astype(np.float32)
+        for _ in range(20):
+            M, _ = get_affine_matrix((640, 640), degrees=10.0, translate=0.1, scales=(0.1, 2.0), shear=2.0)
+            for filter_box_candidates in (False, True):
+                expected = apply_affine_to_bboxes(targets.copy(), np.zeros((len(targets), 0)), (640, 640), M)
+                if filter_box_candidates:
+                    expected = expected[_filter_box_candidates(targets[:, :4], expected[:, :4])]
+                for targets_seg in (None, np.zeros((len(targets), 0))):
+                    output = _apply_affine_to_targets(targets.copy(), targets_seg, (640, 640), M, filter_box_candidates)
+                    np.testing.assert_array_equal(expected, output)
+
+        # Targets with segmentation points still go through the segmentation branch
+        targets_seg = np.full((len(targets), 4), np.nan)
+        targets_seg[0] = [10, 20, 30, 40]
+        output = _apply_affine_to_targets(targets.copy(), targets_seg, (640, 640), np.array([[1.0, 0, 0], [0, 1.0, 0]]), filter_box_candidates=False)
+        np.testing.assert_array_equal(output[0, :4], [10, 20, 30, 40])
+        np.testing.assert_array_equal(output[1:], targets[1:])
+
+    def test_detection_batch_warp_affine(self):
+        image = cv2.GaussianBlur(np.random.randint(0, 255, size=(64, 80, 3), dtype=np.uint8), (0, 0), 3)
+        M, _ = get_affine_matrix((80, 64), degrees=10.0, translate=0.1, scales=0.2, shear=5.0)
+        expected_image = cv2.warpAffine(image, M, (80, 64), borderValue=(114, 114, 114)).astype(np.float32)
+
+        images = torch.from_numpy(image).permute(2, 0, 1)[None].float()
+        warped_image = warp_affine(images, torch.from_numpy(M)[None].float(), border_value=114)[0].permute(1, 2, 0).numpy()
+        # cv2 rounds the uint8 output
+        self.assertLessEqual(np.abs(warped_image - expected_image).max(), 0.51)
+
+    def test_detection_batch_transforms(self):
+        images = torch.rand(4, 3, 64, 80) * 255
+        targets = torch.tensor([[0, 1, 20, 20, 10, 10], [1, 2, 40, 30, 20, 10], [3, 0, 10, 50, 8, 8]], dtype=torch.float32)
+
+        flipped_images, flipped_targets = DetectionBatchHorizontalFlip(prob=1.0)(images.clone(), targets.clone())
+        self.assertTrue(torch.equal(flipped_images, images.flip(-1)))
+        self.assertTrue(torch.equal(flipped_targets[:, 2], 80 - targets[:, 2]))
+
+        hsv_images, hsv_targets = DetectionBatchHSV(prob=1.0, hgain=5, sgain=30, vgain=30)(images.clone(), targets.clone())
+        self.assertEqual(hsv_images.shape, images.shape)
+        self.assertTrue(((hsv_images >= -1e-3) & (hsv_images <= 255 + 1e-3)).all())
+        self.assertTrue(torch.equal(hsv_targets, targets))
+
+        # An identity affine keeps the images and targets
+        identity = DetectionBatchRandomAffine(degrees=0.0, translate=0.0, scales=0.0, shear=0.0)
+        affine_images, affine_targets = identity(images.clone(), targets.clone())
+        self.assertTrue(torch.allclose(affine_images, images, atol=1e-2))
+        self.assertTrue(torch.allclose(affine_targets, targets, atol=1e-4))
+        identity.close()
+        self.assertIs(identity(images, targets)[0], images)
+
+        affine_images, affine_targets = DetectionBatchRandomAffine()(images.clone(), targets.clone())
+        self.assertEqual(affine_images.shape, images.shape)
+        self.assertTrue(((affine_targets[:, 2:4] >= 0) & (affine_targets[:, 2:4] <= torch.tensor([80, 64]))).all())
+
+        # With a scale of 1 and no flip, every image is averaged with another one of the batch and gets its targets
+        mixup = DetectionBatchMixup(mixup_scale=[1.0, 1.0], prob=1.0, flip_prob=0.0)
+        mixed_images, mixed_targets = mixup(images.clone(), targets.clone())
+        self.assertEqual(len(mixed_targets), 2 * len(targets))
+        self.assertTrue(torch.equal(mixed_targets[:, 0], mixed_targets[:, 0].sort().values))
+        self.assertTrue(torch.allclose(torch.sort(mixed_targets[:, 2:], dim=0).values, torch.sort(targets[:, 2:].repeat(2, 1), dim=0).values))
+        partner = 2 * mixed_images[0] - images[0]
+        self.assertEqual(sum(torch.allclose(partner, image, atol=1e-2) for image in images[1:]), 1)
+        mixup.close()
+        self.assertIs(mixup(images, targets)[1], targets)
+
+    def test_detection_batch_transforms_from_recipe(self):
+        batch_transforms = ListFactory(TransformsFactory()).get([{"DetectionBatchHSV": {"prob": 0.5}}, {"DetectionBatchMixup": {"mixup_scale": [0.5, 1.5]}}])
+        self.assertIsInstance(batch_transforms[0], DetectionBatchHSV)
+        self.assertIsInstance(batch_transforms[1], DetectionBatchMixup)
+
 
 if __name__ == "__main__":
     unittest.main()
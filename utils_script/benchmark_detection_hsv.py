@@ -0,0 +1,50 @@
+import argparse
+import time
+
+import numpy as np
+
+from super_gradients.training.transforms.transforms import augment_hsv, augment_hsv_lut
+
+
+def benchmark_hsv(n_images: int, height: int, width: int, hgain: float, sgain: float, vgain: float):
+    """Compare augment_hsv_lut (used by DetectionHSV on uint8 images) with augment_hsv, on random images.
+    :param n_images:    Number of images to augment
+    :param height:      Height of the images
+    :param width:       Width of the images
+    :param hgain:       Hue gain
+    :param sgain:       Saturation gain
+    :param vgain:       Value gain
+    """
+    images = [np.random.randint(0, 256, size=(height, width, 3), dtype=np.uint8) for _ in range(n_images)]
+
+    int16_time, lut_time = 0.0, 0.0
+    for index, image in enumerate(images):
+        int16_image, lut_image = image.copy(), image.copy()
+
+        np.random.seed(index)
+        start = time.perf_counter()
+        augment_hsv(int16_image, hgain, sgain, vgain)
+        int16_time += time.perf_counter() - start
+
+        np.random.seed(index)
+        start = time.perf_counter()
+        augment_hsv_lut(lut_image, hgain, sgain, vgain)
+        lut_time += time.perf_counter() - start
+
+        if not np.array_equal(int16_image, lut_image):
+            raise RuntimeError("augment_hsv_lut does not give the same image as augment_hsv")
+
+    print(f"augment_hsv: {1000 * int16_time / n_images:.2f}ms | augment_hsv_lut: {1000 * lut_time / n_images:.2f}ms | Speedup: x{int16_time / lut_time:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lookup table HSV augmentation of DetectionHSV against augment_hsv")
+    parser.add_argument("--n_images", help="Number of images to augment", type=int, default=500)
+    parser.add_argument("--height", help="Height of the images", type=int, default=640)
+    parser.add_argument("--width", help="Width of the images", type=int, default=640)
+    # Gains of the YoloX recipes
+    parser.add_argument("--hgain", type=float, default=5)
+    parser.add_argument("--sgain", type=float, default=30)
+    parser.add_argument("--vgain", type=float, default=30)
+    args = parser.parse_args()
+    benchmark_hsv(n_images=args.n_images, height=args.height, width=args.width, hgain=args.hgain, sgain=args.sgain, vgain=args.vgain)
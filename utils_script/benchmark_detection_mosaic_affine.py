@@ -0,0 +1,60 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from super_gradients.training.datasets import COCODetectionDataset
+from super_gradients.training.transforms.transforms import DetectionMosaic, DetectionMosaicAffine, DetectionRandomAffine
+
+
+def benchmark_mosaic_affine(data_dir: str, json_file: str, subdir: str, n_samples: int, input_dim: int = 640):
+    """Compare DetectionMosaicAffine with DetectionMosaic followed by DetectionRandomAffine, with the parameters of the YoloX recipes.
+    :param data_dir:    Where COCO is stored
+    :param json_file:   Name of the annotation file, in data_dir/annotations
+    :param subdir:      Sub directory of data_dir containing the images
+    :param n_samples:   Number of mosaics to build
+    :param input_dim:   Input dimension of the dataset and of the transforms
+    """
+    dataset = COCODetectionDataset(data_dir=data_dir, json_file=json_file, subdir=subdir, input_dim=(input_dim, input_dim), ignore_empty_annotations=False)
+    samples = [dataset.get_random_samples(count=4) for _ in range(n_samples)]
+
+    affine_params = dict(degrees=10.0, translate=0.1, scales=[0.1, 2], shear=2.0, target_size=(input_dim, input_dim), filter_box_candidates=True)
+    mosaic, affine = DetectionMosaic(input_dim=(input_dim, input_dim)), DetectionRandomAffine(**affine_params)
+    mosaic_affine = DetectionMosaicAffine(input_dim=(input_dim, input_dim), **affine_params)
+
+    def get_sample(index: int) -> dict:
+        sample, *additional_samples = samples[index]
+        return {**sample, "target": sample["target"].copy(), "additional_samples": [{**s, "target": s["target"].copy()} for s in additional_samples]}
+
+    pair_time, fused_time, image_diffs = 0.0, 0.0, []
+    for index in range(n_samples):
+        random.seed(index)
+        start = time.perf_counter()
+        pair_output = affine(mosaic(get_sample(index)))
+        pair_time += time.perf_counter() - start
+
+        random.seed(index)
+        start = time.perf_counter()
+        fused_output = mosaic_affine(get_sample(index))
+        fused_time += time.perf_counter() - start
+
+        if not np.allclose(pair_output["target"], fused_output["target"]):
+            raise RuntimeError("DetectionMosaicAffine does not give the same targets as DetectionMosaic + DetectionRandomAffine")
+        image_diffs.append(np.abs(pair_output["image"].astype(np.float32) - fused_output["image"]).mean())
+
+    print(f"Mean absolute difference of the images: {np.mean(image_diffs):.3f} (max {np.max(image_diffs):.3f})")
+    print(
+        f"Mosaic + Affine: {1000 * pair_time / n_samples:.2f}ms | MosaicAffine: {1000 * fused_time / n_samples:.2f}ms | "
+        f"Speedup: x{pair_time / fused_time:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DetectionMosaicAffine against DetectionMosaic + DetectionRandomAffine on COCO")
+    parser.add_argument("--data_dir", help="Where the full coco dataset is stored", default="/data/coco")
+    parser.add_argument("--json_file", help="Name of the annotation file", default="instances_val2017.json")
+    parser.add_argument("--subdir", help="Sub directory containing the images", default="images/val2017")
+    parser.add_argument("--n_samples", help="Number of mosaics to build", type=int, default=500)
+    args = parser.parse_args()
+    benchmark_mosaic_affine(data_dir=args.data_dir, json_file=args.json_file, subdir=args.subdir, n_samples=args.n_samples)
@@ -0,0 +1,70 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from super_gradients.training.transforms.transforms import (
+    DetectionRandomAffine,
+    _apply_affine_to_targets,
+    _filter_box_candidates,
+    apply_affine_to_bboxes,
+    get_affine_matrix,
+)
+
+
+def _apply_affine_to_targets_reference(targets: np.ndarray, target_size, M: np.ndarray) -> np.ndarray:
+    """Previous implementation of _apply_affine_to_targets for targets without segmentation points, with filter_box_candidates."""
+    targets_orig = targets.copy()
+    targets = apply_affine_to_bboxes(targets, np.zeros((targets.shape[0], 0)), target_size, M)
+    return targets[_filter_box_candidates(targets_orig[:, :4], targets[:, :4])]
+
+
+def _get_random_targets(n_boxes: int, input_dim: int) -> np.ndarray:
+    xy = np.random.uniform(0, input_dim * 0.8, (n_boxes, 2))
+    wh = np.random.uniform(2, input_dim * 0.5, (n_boxes, 2))
+    labels = np.random.randint(0, 80, (n_boxes, 1))
+    return np.concatenate([xy, np.minimum(xy + wh, input_dim), labels], axis=1).astype(np.float32)
+
+
+def benchmark_random_affine(n_samples: int, n_boxes: int, input_dim: int = 640):
+    """Compare the targets fast path of DetectionRandomAffine with the previous implementation, on random XYXY_LABEL targets.
+    :param n_samples:   Number of samples to transform
+    :param n_boxes:     Number of boxes of every sample
+    :param input_dim:   Size of the images
+    """
+    target_size = (input_dim, input_dim)
+    samples = [_get_random_targets(n_boxes, input_dim) for _ in range(n_samples)]
+    matrices = [get_affine_matrix(target_size, degrees=10.0, translate=0.1, scales=(0.1, 2.0), shear=2.0)[0] for _ in range(n_samples)]
+
+    start = time.perf_counter()
+    reference_outputs = [_apply_affine_to_targets_reference(targets.copy(), target_size, M) for targets, M in zip(samples, matrices)]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    outputs = [_apply_affine_to_targets(targets.copy(), None, target_size, M, filter_box_candidates=True) for targets, M in zip(samples, matrices)]
+    fast_time = time.perf_counter() - start
+
+    if not all(np.array_equal(reference, output) for reference, output in zip(reference_outputs, outputs)):
+        raise RuntimeError("The fast path does not give the same targets as the previous implementation")
+    print(
+        f"Targets ({n_boxes} boxes): previous {1e6 * reference_time / n_samples:.1f}us | fast path {1e6 * fast_time / n_samples:.1f}us | "
+        f"Speedup: x{reference_time / fast_time:.1f}"
+    )
+
+    # Whole transform, with the warp of the image
+    image = np.random.randint(0, 256, (input_dim, input_dim, 3), dtype=np.uint8)
+    transform = DetectionRandomAffine(degrees=10.0, translate=0.1, scales=[0.1, 2], shear=2.0, target_size=target_size, filter_box_candidates=True)
+    random.seed(0)
+    start = time.perf_counter()
+    for targets in samples:
+        transform({"image": image, "target": targets.copy()})
+    print(f"DetectionRandomAffine: {1000 * (time.perf_counter() - start) / n_samples:.2f}ms per sample")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the targets fast path of DetectionRandomAffine")
+    parser.add_argument("--n_samples", help="Number of samples to transform", type=int, default=2000)
+    parser.add_argument("--n_boxes", help="Number of boxes of every sample", type=int, default=30)
+    args = parser.parse_args()
+    benchmark_random_affine(n_samples=args.n_samples, n_boxes=args.n_boxes)
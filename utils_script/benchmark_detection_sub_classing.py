@@ -0,0 +1,68 @@
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from super_gradients.training.datasets import COCODetectionDataset
+from super_gradients.training.datasets.datasets_conf import COCO_DETECTION_CLASSES_LIST
+from super_gradients.training.utils.detection_utils import get_cls_posx_in_target
+
+
+def _sub_class_target_per_row(targets: np.ndarray, cls_posx: int, all_classes_list: List[str], class_inclusion_list: List[str]) -> np.ndarray:
+    """Reference implementation of DetectionDataset._sub_class_target, iterating over every target row."""
+    targets_kept = []
+    for target in targets:
+        cls_id = int(target[cls_posx])
+        cls_name = all_classes_list[cls_id]
+        if cls_name in class_inclusion_list:
+            target[cls_posx] = class_inclusion_list.index(cls_name)
+            targets_kept.append(target)
+    return np.array(targets_kept) if len(targets_kept) > 0 else np.zeros((0, 5), dtype=np.float32)
+
+
+def benchmark_sub_classing(data_dir: str, json_file: str, subdir: str, n_classes: int, chunk_size: int = 1024):
+    """Compare the vectorized subclassing of DetectionDataset with the per-row reference, on every target field of a COCO split.
+    :param data_dir:    Where COCO is stored
+    :param json_file:   Name of the annotation file, in data_dir/annotations
+    :param subdir:      Sub directory of data_dir containing the images
+    :param n_classes:   Number of classes in class_inclusion_list (the first ones of COCO)
+    :param chunk_size:  Number of target arrays subclassed at once, like DetectionDataset._iterate_sub_classed_annotations
+    """
+    class_inclusion_list = COCO_DETECTION_CLASSES_LIST[:n_classes]
+    dataset_params = dict(data_dir=data_dir, json_file=json_file, subdir=subdir, input_dim=(640, 640), ignore_empty_annotations=False)
+
+    start = time.perf_counter()
+    dataset = COCODetectionDataset(class_inclusion_list=class_inclusion_list, **dataset_params)
+    print(f"Dataset with {n_classes} classes instantiated in {time.perf_counter() - start:.2f}s ({len(dataset)} images)")
+
+    # Subclassing every field of the annotations, as done when caching them
+    all_classes_dataset = COCODetectionDataset(**dataset_params)
+    all_targets = [all_classes_dataset.annotations[i][field].copy() for i in range(len(all_classes_dataset)) for field in dataset.target_fields]
+    cls_posx = get_cls_posx_in_target(dataset.original_target_format)
+    print(f"Subclassing {sum(len(targets) for targets in all_targets)} targets of {len(all_targets)} target arrays")
+
+    start = time.perf_counter()
+    per_row_outputs = [_sub_class_target_per_row(t.copy(), cls_posx, dataset.all_classes_list, class_inclusion_list) for t in all_targets]
+    per_row_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized_outputs = []
+    for chunk_start in range(0, len(all_targets), chunk_size):
+        chunk = [t.copy() for t in all_targets[chunk_start : chunk_start + chunk_size]]
+        vectorized_outputs += dataset._sub_class_targets(targets_list=chunk, cls_posx=cls_posx)
+    vectorized_time = time.perf_counter() - start
+
+    if not all(np.array_equal(per_row, vectorized) for per_row, vectorized in zip(per_row_outputs, vectorized_outputs)):
+        raise RuntimeError("The vectorized subclassing does not match the per-row reference")
+    print(f"Per-row: {per_row_time:.3f}s | Vectorized: {vectorized_time:.3f}s | Speedup: x{per_row_time / vectorized_time:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the class subsetting of DetectionDataset on COCO")
+    parser.add_argument("--data_dir", help="Where the full coco dataset is stored", default="/data/coco")
+    parser.add_argument("--json_file", help="Name of the annotation file", default="instances_train2017.json")
+    parser.add_argument("--subdir", help="Sub directory containing the images", default="images/train2017")
+    parser.add_argument("--n_classes", help="Number of classes to include", type=int, default=10)
+    args = parser.parse_args()
+    benchmark_sub_classing(data_dir=args.data_dir, json_file=args.json_file, subdir=args.subdir, n_classes=args.n_classes)
@@ -0,0 +1,79 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from super_gradients.training.datasets import COCOKeypointsDataset
+from super_gradients.training.transforms.keypoint_transforms import (
+    KeypointsCompose,
+    KeypointsLongestMaxSize,
+    KeypointsPadIfNeeded,
+    KeypointsRandomAffineTransform,
+    KeypointsRandomHorizontalFlip,
+)
+
+COCO_FLIP_INDEX = [0, 2, 1, 4, 3, 6, 5, 8, 7, 10, 9, 12, 11, 14, 13, 16, 15]
+
+
+def benchmark_keypoint_transforms(data_dir: str, images_dir: str, json_file: str, n_samples: int, input_dim: int = 640):
+    """Compare the fused keypoint transforms (KeypointsCompose with fuse_affine_transforms=True) with the transforms applied one by one,
+    with the training transforms of the COCO pose estimation recipe.
+    :param data_dir:    Where COCO is stored
+    :param images_dir:  Sub directory of data_dir containing the images
+    :param json_file:   Annotation file, in data_dir
+    :param n_samples:   Number of samples to transform
+    :param input_dim:   Size of the transformed images
+    """
+    transforms = [
+        KeypointsLongestMaxSize(max_height=input_dim, max_width=input_dim),
+        KeypointsPadIfNeeded(min_height=input_dim, min_width=input_dim, image_pad_value=[127, 127, 127], mask_pad_value=1),
+        KeypointsRandomHorizontalFlip(flip_index=COCO_FLIP_INDEX, prob=0.5),
+        KeypointsRandomAffineTransform(
+            max_rotation=30, min_scale=0.75, max_scale=1.5, max_translate=0.2, image_pad_value=[127, 127, 127], mask_pad_value=1, prob=0.5
+        ),
+    ]
+    dataset = COCOKeypointsDataset(
+        data_dir=data_dir,
+        images_dir=images_dir,
+        json_file=json_file,
+        include_empty_samples=False,
+        target_generator=None,
+        transforms=[],
+        min_instance_area=128,
+        lazy_coco=True,
+    )
+    samples = [dataset.load_sample(index)[:3] for index in range(min(n_samples, len(dataset)))]
+
+    sequential, fused = KeypointsCompose(transforms), KeypointsCompose(transforms, fuse_affine_transforms=True)
+    sequential_time, fused_time, image_diffs = 0.0, 0.0, []
+    for index, (image, mask, joints) in enumerate(samples):
+        random.seed(index)
+        start = time.perf_counter()
+        sequential_image, _, sequential_joints = sequential(image, mask, joints)
+        sequential_time += time.perf_counter() - start
+
+        random.seed(index)
+        start = time.perf_counter()
+        fused_image, _, fused_joints = fused(image, mask, joints)
+        fused_time += time.perf_counter() - start
+
+        if not np.allclose(sequential_joints, fused_joints, rtol=1e-4, atol=1e-3):
+            raise RuntimeError("The fused keypoint transforms do not give the same joints as the sequential ones")
+        image_diffs.append(np.abs(sequential_image.astype(np.float32) - fused_image).mean())
+
+    print(f"Mean absolute difference of the images: {np.mean(image_diffs):.3f} (max {np.max(image_diffs):.3f})")
+    print(
+        f"Sequential: {1000 * sequential_time / len(samples):.2f}ms | Fused: {1000 * fused_time / len(samples):.2f}ms | "
+        f"Speedup: x{sequential_time / fused_time:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fused keypoint transforms against the sequential ones on COCO keypoints")
+    parser.add_argument("--data_dir", help="Where the full coco dataset is stored", default="/data/coco")
+    parser.add_argument("--images_dir", help="Sub directory containing the images", default="images/val2017")
+    parser.add_argument("--json_file", help="Annotation file", default="annotations/person_keypoints_val2017.json")
+    parser.add_argument("--n_samples", help="Number of samples to transform", type=int, default=500)
+    args = parser.parse_args()
+    benchmark_keypoint_transforms(data_dir=args.data_dir, images_dir=args.images_dir, json_file=args.json_file, n_samples=args.n_samples)
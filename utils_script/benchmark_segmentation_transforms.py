@@ -0,0 +1,52 @@
+import argparse
+import random
+import time
+
+from super_gradients.training.datasets import CityscapesDataset
+from super_gradients.training.transforms.transforms import SegColorJitter, SegCropImageAndMask, SegPadShortToCropSize, SegRandomFlip, SegRandomRescale
+
+
+def benchmark_segmentation_transforms(root_dir: str, list_file: str, labels_csv_path: str, n_samples: int):
+    """Compare the throughput of CityscapesDataset with the PIL transforms, the numpy/OpenCV transforms, and the numpy/OpenCV transforms
+     returning uint8 images, with the transforms of the STDC recipes.
+    :param root_dir:        Where Cityscapes is stored
+    :param list_file:       List file of the split, relative to root_dir
+    :param labels_csv_path: Labels csv file, relative to root_dir
+    :param n_samples:       Number of samples to load for every setting
+    """
+
+    def get_transforms():
+        return [
+            SegColorJitter(brightness=0.5, contrast=0.5, saturation=0.5),
+            SegRandomFlip(prob=0.5),
+            SegRandomRescale(scales=[0.125, 1.5]),
+            SegPadShortToCropSize(crop_size=[1024, 512], fill_mask=19),
+            SegCropImageAndMask(crop_size=[1024, 512], mode="random"),
+        ]
+
+    settings = {
+        "PIL": dict(),
+        "OpenCV": dict(numpy_transforms=True),
+        "OpenCV + uint8": dict(numpy_transforms=True, normalize_images=False),
+    }
+    times = {}
+    for name, dataset_params in settings.items():
+        dataset = CityscapesDataset(root_dir=root_dir, list_file=list_file, labels_csv_path=labels_csv_path, transforms=get_transforms(), **dataset_params)
+        random.seed(0)
+        start = time.perf_counter()
+        for index in range(min(n_samples, len(dataset))):
+            dataset[index]
+        times[name] = time.perf_counter() - start
+
+    print(" | ".join(f"{name}: {1000 * total_time / n_samples:.1f}ms" for name, total_time in times.items()))
+    print(" | ".join(f"Speedup {name}: x{times['PIL'] / total_time:.2f}" for name, total_time in times.items() if name != "PIL"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the PIL and numpy/OpenCV segmentation transforms on Cityscapes")
+    parser.add_argument("--root_dir", help="Where the cityscapes dataset is stored", default="/data/cityscapes")
+    parser.add_argument("--list_file", help="List file of the split", default="lists/train.lst")
+    parser.add_argument("--labels_csv_path", help="Labels csv file", default="lists/labels.csv")
+    parser.add_argument("--n_samples", help="Number of samples to load", type=int, default=200)
+    args = parser.parse_args()
+    benchmark_segmentation_transforms(root_dir=args.root_dir, list_file=args.list_file, labels_csv_path=args.labels_csv_path, n_samples=args.n_samples)